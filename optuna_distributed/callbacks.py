@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable
+from collections.abc import Sequence
+import threading
+from threading import Thread
+from typing import Literal
+
+from optuna.study import Study
+from optuna.trial import FrozenTrial
+
+
+CallbackFuncType = Callable[[Study, FrozenTrial], None]
+OverflowPolicy = Literal["block", "drop_oldest", "coalesce"]
+
+
+class CallbackExecutor:
+    """Runs study callbacks in a dedicated thread.
+
+    Finished trials are queued and callbacks are invoked for each of them in order,
+    so that slow callbacks, e.g. writing checkpoints, do not hold up processing of
+    messages from workers. Callbacks can call :func:`optuna.study.Study.stop`.
+
+    Args:
+        callbacks:
+            Callables invoked with study and finished trial.
+        max_queue_size:
+            Maximum number of finished trials waiting for callbacks.
+        overflow:
+            What to do when the queue is full. With ``"block"``, event loop waits for
+            callbacks to catch up. With ``"drop_oldest"``, the longest waiting trial is
+            discarded. With ``"coalesce"``, all waiting trials are discarded, so that
+            callbacks are invoked only with the latest one.
+    """
+
+    def __init__(
+        self,
+        callbacks: Sequence[CallbackFuncType],
+        max_queue_size: int = 100,
+        overflow: OverflowPolicy = "block",
+    ) -> None:
+        if max_queue_size <= 0:
+            raise ValueError("Callback queue has to hold at least one trial.")
+
+        if overflow not in ("block", "drop_oldest", "coalesce"):
+            raise ValueError(f"Unknown overflow policy {overflow}.")
+
+        self._callbacks = list(callbacks)
+        self._max_queue_size = max_queue_size
+        self._overflow = overflow
+        self._pending: deque[FrozenTrial] = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._exception: BaseException | None = None
+        self._thread: Thread | None = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether there are any callbacks to run."""
+        return bool(self._callbacks)
+
+    def start(self, study: Study) -> None:
+        """Starts thread running callbacks.
+
+        Args:
+            study:
+                An instance of Optuna study passed to callbacks.
+        """
+        if self._callbacks and self._thread is None:
+            self._thread = Thread(target=self._run, args=(study,), daemon=True)
+            self._thread.start()
+
+    def submit(self, trial: FrozenTrial) -> None:
+        """Queues a finished trial for callbacks.
+
+        Args:
+            trial:
+                A finished trial.
+        """
+        if not self._callbacks:
+            return
+
+        with self._condition:
+            self._raise_if_failed()
+            if len(self._pending) >= self._max_queue_size:
+                if self._overflow == "block":
+                    self._condition.wait_for(self._has_room)
+                    self._raise_if_failed()
+                elif self._overflow == "drop_oldest":
+                    self._pending.popleft()
+                else:
+                    self._pending.clear()
+
+            self._pending.append(trial)
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        """Waits for queued callbacks to finish and stops the thread.
+
+        Exception raised by any of callbacks is re-raised here.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        with self._condition:
+            self._raise_if_failed()
+
+    def _has_room(self) -> bool:
+        return len(self._pending) < self._max_queue_size or self._exception is not None
+
+    def _raise_if_failed(self) -> None:
+        if self._exception is not None:
+            exception, self._exception = self._exception, None
+            raise exception
+
+    def _run(self, study: Study) -> None:
+        # Allows callbacks to stop the study.
+        thread_local = getattr(study, "_thread_local", None)
+        if thread_local is not None:
+            thread_local.in_optimize_loop = True
+
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: bool(self._pending) or self._closed)
+                if not self._pending:
+                    return
+                trial = self._pending.popleft()
+                self._condition.notify_all()
+
+            try:
+                for callback in self._callbacks:
+                    callback(study, trial)
+
+            except BaseException as e:
+                with self._condition:
+                    self._exception = e
+                    self._pending.clear()
+                    self._condition.notify_all()
+                return
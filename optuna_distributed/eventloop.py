@@ -1,12 +1,37 @@
 from __future__ import annotations
 
-from datetime import datetime
+import asyncio
+from collections.abc import AsyncGenerator
+from collections.abc import Generator
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from contextlib import contextmanager
+import threading
+import time
+from typing import Any
+from typing import Callable
 
+from optuna.distributions import BaseDistribution
+from optuna.samplers import BaseSampler
+from optuna.storages import BaseStorage
 from optuna.study import Study
+from optuna.trial import FrozenTrial
+from optuna.trial import Trial
 from optuna.trial import TrialState
 
+from optuna_distributed.callbacks import CallbackExecutor
+from optuna_distributed.instrumentation import EventLoopStats
+from optuna_distributed.ipc import IPCPrimitive
 from optuna_distributed.managers import ObjectiveFuncType
 from optuna_distributed.managers import OptimizationManager
+from optuna_distributed.messages import HeartbeatMessage
+from optuna_distributed.messages import Message
+from optuna_distributed.storage import BestTrialStorage
+from optuna_distributed.storage import CachedHistoryStorage
+from optuna_distributed.storage import WriteBehindStorage
+from optuna_distributed.storage import fail_trials
+from optuna_distributed.storage import supports_batched_writes
 from optuna_distributed.terminal import Terminal
 
 
@@ -18,6 +43,11 @@ class EventLoop:
     made by workers (e.g. to suggest a hyperparameter value) and act upon them using local
     resources. This ensures sequential access to storages, samplers etc.
 
+    Event loop is built on top of :mod:`asyncio`, so it does not block while waiting
+    for messages, and timeouts are scheduled as timers. It can be started from
+    synchronous code with :func:`run`, or awaited within a running event loop
+    with :func:`run_async`.
+
     Args:
         study:
             An instance of Optuna study.
@@ -27,6 +57,28 @@ class EventLoop:
             An objective function to optimize.
         interrupt_patience:
             Specifies how many seconds to wait for trials to exit ater interrupt has been emitted.
+        message_threads:
+            Number of threads processing messages. With more than one, messages from
+            different trials are processed in parallel, so e.g. storage writes of one trial
+            do not wait for a slow suggestion in another. Messages from each trial are still
+            processed in order they were sent, and access to sampler is serialized.
+        stats:
+            An instance of :class:`~optuna_distributed.instrumentation.EventLoopStats`
+            to record message processing in. If :obj:`None`, a new one is created.
+        callbacks:
+            An instance of :class:`~optuna_distributed.callbacks.CallbackExecutor` running
+            callbacks after each trial finishes. If :obj:`None`, no callbacks are run.
+        max_pending_writes:
+            Maximum number of intermediate values and trial attributes held back by
+            :class:`~optuna_distributed.storage.WriteBehindStorage` before they are
+            written to the storage in a batch. Writes of a trial are always flushed
+            before its state is read. Writes are deferred only with storages backed by
+            a relational database. If 0, writes are not deferred.
+        cache_finished_trials:
+            If :obj:`True`, finished trials are kept in memory by
+            :class:`~optuna_distributed.storage.CachedHistoryStorage` while optimization
+            runs, so that samplers do not read whole history from the storage on every
+            suggestion. Study must not be optimized by other processes at the same time.
     """
 
     def __init__(
@@ -35,11 +87,29 @@ class EventLoop:
         manager: OptimizationManager,
         objective: ObjectiveFuncType,
         interrupt_patience: float,
+        message_threads: int = 1,
+        stats: EventLoopStats | None = None,
+        callbacks: CallbackExecutor | None = None,
+        max_pending_writes: int = 100,
+        cache_finished_trials: bool = False,
     ) -> None:
+        if message_threads < 1:
+            raise ValueError("At least one thread is required to process messages.")
+
+        if max_pending_writes < 0:
+            raise ValueError("Number of pending writes can't be negative.")
+
         self.study = study
         self.manager = manager
         self.objective = objective
         self._interrupt_patience = interrupt_patience
+        self._message_threads = message_threads
+        self.stats = stats if stats is not None else EventLoopStats()
+        self._callbacks = callbacks if callbacks is not None else CallbackExecutor([])
+        self._dispatching = True
+        self._max_pending_writes = max_pending_writes
+        self._write_behind: WriteBehindStorage | None = None
+        self._cache_finished_trials = cache_finished_trials
 
     def run(
         self,
@@ -47,7 +117,7 @@ class EventLoop:
         timeout: float | None = None,
         catch: tuple[type[Exception], ...] = (),
     ) -> None:
-        """Starts the event loop.
+        """Starts the event loop and blocks until optimization is finished.
 
         Args:
             terminal:
@@ -57,37 +127,377 @@ class EventLoop:
             catch:
                 A tuple of exceptions to ignore if any is raised while optimizing a function.
         """
-        time_start = datetime.now()
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self.run_async(terminal, timeout, catch))
+            return
+
+        # Caller already runs an event loop (e.g. in Jupyter), which we can't block
+        # nor reenter. Optimization gets a loop of its own in a separate thread instead.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(asyncio.run, self.run_async(terminal, timeout, catch)).result()
+
+    async def run_async(
+        self,
+        terminal: Terminal,
+        timeout: float | None = None,
+        catch: tuple[type[Exception], ...] = (),
+    ) -> None:
+        """Runs optimization within already running event loop.
+
+        Args:
+            terminal:
+                An instance of :obj:`optuna_distributed.terminal.Terminal`.
+            timeout:
+                Stops study after the given number of second(s).
+            catch:
+                A tuple of exceptions to ignore if any is raised while optimizing a function.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        self.study._stop_flag = False
+        self._callbacks.start(self.study)
+        try:
+            with ExitStack() as storages:
+                self._write_behind = storages.enter_context(
+                    _write_behind_storage(self.study, self._max_pending_writes)
+                )
+                if self._cache_finished_trials:
+                    storages.enter_context(_wrapped_storage(self.study, CachedHistoryStorage))
+                # Best trials are tracked as trials complete, e.g. for logging.
+                storages.enter_context(_wrapped_storage(self.study, BestTrialStorage))
+                if self._message_threads > 1:
+                    with _serialized_sampler(self.study):
+                        await self._run_concurrently(terminal, deadline, catch)
+                else:
+                    await self._run_sequentially(terminal, deadline, catch)
+
+        finally:
+            # Optimization ends only after callbacks for all finished trials have run.
+            await loop.run_in_executor(None, self._callbacks.close)
+
+    async def _run_sequentially(
+        self,
+        terminal: Terminal,
+        deadline: float | None,
+        catch: tuple[type[Exception], ...],
+    ) -> None:
+        loop = asyncio.get_running_loop()
         self.manager.create_futures(self.study, self.objective)
-        for message in self.manager.get_message():
+        messages = self.manager.get_message_async()
+        try:
+            while True:
+                remaining = None if deadline is None else max(deadline - loop.time(), 0.0)
+                idle_since = time.perf_counter()
+                try:
+                    message = await asyncio.wait_for(messages.__anext__(), remaining)
+                except asyncio.TimeoutError:
+                    self._stop(terminal)
+                    break
+                finally:
+                    self.stats.record_idle(time.perf_counter() - idle_since)
+
+                try:
+                    self._process(message, self.manager)
+
+                except Exception as e:
+                    self._handle_exception(e, terminal, catch)
+
+                if self._after_message(message, terminal):
+                    break
+
+        finally:
+            await messages.aclose()
+
+    async def _run_concurrently(
+        self,
+        terminal: Terminal,
+        deadline: float | None,
+        catch: tuple[type[Exception], ...],
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        manager = _LoopBoundManager(self.manager, loop)
+        processing: dict[asyncio.Future[None], Message] = {}
+        latest: dict[int, asyncio.Future[None]] = {}
+
+        self.manager.create_futures(self.study, self.objective)
+        messages = self.manager.get_message_async()
+        receiving: asyncio.Future[Any] = asyncio.ensure_future(messages.__anext__())
+        with ThreadPoolExecutor(self._message_threads) as executor:
             try:
-                message.process(self.study, self.manager)
-                self.manager.after_message(self)
-
-            except Exception as e:
-                if not isinstance(e, catch):
-                    with terminal.spin_while_trials_interrupted():
-                        self.manager.stop_optimization(patience=self._interrupt_patience)
-                        self._fail_unfinished_trials()
-                    raise
-
-            elapsed = (datetime.now() - time_start).total_seconds()
-            if timeout is not None and elapsed > timeout:
-                with terminal.spin_while_trials_interrupted():
-                    self.manager.stop_optimization(patience=self._interrupt_patience)
-                break
-
-            if message.closing:
-                terminal.update_progress_bar()
-
-            # TODO(xadrianzetx): Call callbacks here.
-            if self.manager.should_end_optimization():
-                terminal.close_progress_bar()
-                break
+                while True:
+                    remaining = None if deadline is None else max(deadline - loop.time(), 0.0)
+                    waiting: set[asyncio.Future[Any]] = {receiving, *processing}
+                    idle_since = time.perf_counter()
+                    done, _ = await asyncio.wait(
+                        waiting,
+                        timeout=remaining,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if not processing:
+                        self.stats.record_idle(time.perf_counter() - idle_since)
+                    if not done:
+                        self._stop(terminal)
+                        break
+
+                    if receiving in done:
+                        message = receiving.result()
+                        trial_id = _trial_id_of(message)
+                        previous = latest.get(trial_id) if trial_id is not None else None
+                        task = asyncio.ensure_future(
+                            self._process_after(previous, message, manager, executor)
+                        )
+                        processing[task] = message
+                        if trial_id is not None:
+                            latest[trial_id] = task
+                        receiving = asyncio.ensure_future(messages.__anext__())
+
+                    if self._after_processed(done, processing, latest, terminal, catch):
+                        break
+
+            finally:
+                receiving.cancel()
+                await asyncio.wait([receiving, *processing])
+                await messages.aclose()
+
+    def _after_processed(
+        self,
+        done: set[asyncio.Future[Any]],
+        processing: dict[asyncio.Future[None], Message],
+        latest: dict[int, asyncio.Future[None]],
+        terminal: Terminal,
+        catch: tuple[type[Exception], ...],
+    ) -> bool:
+        for task in done:
+            message = processing.pop(task, None)
+            if message is None:
+                continue
+
+            trial_id = _trial_id_of(message)
+            if trial_id is not None and latest.get(trial_id) is task:
+                del latest[trial_id]
+
+            exception = task.exception()
+            if isinstance(exception, Exception):
+                self._handle_exception(exception, terminal, catch)
+
+            if self._after_message(message, terminal):
+                return True
+        return False
+
+    async def _process_after(
+        self,
+        previous: asyncio.Future[None] | None,
+        message: Message,
+        manager: OptimizationManager,
+        executor: ThreadPoolExecutor,
+    ) -> None:
+        # Messages from a single trial are processed in order they were sent.
+        if previous is not None:
+            await asyncio.wait({previous})
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, self._process, message, manager)
+
+    def _process(self, message: Message, manager: OptimizationManager) -> None:
+        started_at = time.perf_counter()
+        try:
+            message.process(self.study, manager)
+        finally:
+            self.stats.record_message(message, started_at, time.perf_counter())
+
+    def _after_message(self, message: Message, terminal: Terminal) -> bool:
+        if isinstance(message, HeartbeatMessage) and self._write_behind is not None:
+            # Nothing happened for a while, so deferred writes are not held back any longer.
+            self._write_behind.flush()
+
+        if message.closing:
+            terminal.update_progress_bar()
+            trial_id = _trial_id_of(message)
+            if trial_id is not None:
+                self._submit_callbacks(trial_id, terminal)
+
+        if self.study._stop_flag and self._dispatching:
+            # Study has been stopped by one of callbacks.
+            self._dispatching = False
+            self.manager.stop_dispatching(self.study)
+
+        self.manager.after_message(self)
+        if self.manager.should_end_optimization():
+            terminal.close_progress_bar()
+            return True
+        return False
+
+    def _submit_callbacks(self, trial_id: int, terminal: Terminal) -> None:
+        if not self._callbacks.enabled:
+            # Finished trial is not fetched from storage for nothing.
+            return
+
+        try:
+            self._callbacks.submit(self.study._storage.get_trial(trial_id))
+        except Exception as e:
+            self._handle_exception(e, terminal, catch=())
+
+    def _handle_exception(
+        self, exception: Exception, terminal: Terminal, catch: tuple[type[Exception], ...]
+    ) -> None:
+        if not isinstance(exception, catch):
+            with terminal.spin_while_trials_interrupted():
+                self.manager.stop_optimization(patience=self._interrupt_patience)
+                self._fail_unfinished_trials()
+            raise exception
+
+    def _stop(self, terminal: Terminal) -> None:
+        with terminal.spin_while_trials_interrupted():
+            self.manager.stop_optimization(patience=self._interrupt_patience)
+            self._fail_unfinished_trials()
 
     def _fail_unfinished_trials(self) -> None:
-        # TODO(xadrianzetx) Is there a better way to do this in Optuna?
         states = (TrialState.RUNNING, TrialState.WAITING)
         trials = self.study.get_trials(deepcopy=False, states=states)
-        for trial in trials:
-            self.study._storage.set_trial_state_values(trial._trial_id, TrialState.FAIL)
+        fail_trials(self.study._storage, [trial._trial_id for trial in trials])
+
+
+def _trial_id_of(message: Message) -> int | None:
+    trial_id = getattr(message, "_trial_id", None)
+    return trial_id if isinstance(trial_id, int) else None
+
+
+class _LoopBoundManager(OptimizationManager):
+    """Gives messages processed in threads access to the manager.
+
+    Connections are fetched directly, but changes in manager state are scheduled to be
+    applied from the event loop thread, as manager is not safe to modify concurrently.
+    """
+
+    def __init__(self, manager: OptimizationManager, loop: asyncio.AbstractEventLoop) -> None:
+        super().__init__()
+        self._manager = manager
+        self._loop = loop
+
+    def create_futures(self, study: Study, objective: ObjectiveFuncType) -> None:
+        raise RuntimeError("Futures can only be created by the event loop.")
+
+    def get_message(self) -> Generator[Message, None, None]:
+        raise RuntimeError("Messages can only be fetched by the event loop.")
+
+    async def get_message_async(self) -> AsyncGenerator[Message, None]:
+        raise RuntimeError("Messages can only be fetched by the event loop.")
+        yield
+
+    def after_message(self, event_loop: "EventLoop") -> None:
+        raise RuntimeError("Hooks can only be run by the event loop.")
+
+    def get_connection(self, trial_id: int) -> IPCPrimitive:
+        return self._manager.get_connection(trial_id)
+
+    def get_trial(self, study: Study, trial_id: int) -> Trial:
+        # Messages of a trial are never processed concurrently.
+        return self._manager.get_trial(study, trial_id)
+
+    def stop_optimization(self, patience: float) -> None:
+        raise RuntimeError("Optimization can only be stopped by the event loop.")
+
+    def stop_dispatching(self, study: Study) -> None:
+        self._loop.call_soon_threadsafe(self._manager.stop_dispatching, study)
+
+    def should_end_optimization(self) -> bool:
+        return self._manager.should_end_optimization()
+
+    def register_trial_exit(self, trial_id: int) -> None:
+        # Scheduled before the event loop learns processing is finished,
+        # so manager state is up to date when loop checks it.
+        self._loop.call_soon_threadsafe(self._manager.register_trial_exit, trial_id)
+
+
+class _SerializedSampler(BaseSampler):
+    """Wraps a sampler, so that it is used by one thread at a time."""
+
+    def __init__(self, sampler: BaseSampler) -> None:
+        self._sampler = sampler
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._sampler, name)
+
+    def infer_relative_search_space(
+        self, study: Study, trial: FrozenTrial
+    ) -> dict[str, BaseDistribution]:
+        with self._lock:
+            return self._sampler.infer_relative_search_space(study, trial)
+
+    def sample_relative(
+        self, study: Study, trial: FrozenTrial, search_space: dict[str, BaseDistribution]
+    ) -> dict[str, Any]:
+        with self._lock:
+            return self._sampler.sample_relative(study, trial, search_space)
+
+    def sample_independent(
+        self,
+        study: Study,
+        trial: FrozenTrial,
+        param_name: str,
+        param_distribution: BaseDistribution,
+    ) -> Any:
+        with self._lock:
+            return self._sampler.sample_independent(study, trial, param_name, param_distribution)
+
+    def before_trial(self, study: Study, trial: FrozenTrial) -> None:
+        with self._lock:
+            self._sampler.before_trial(study, trial)
+
+    def after_trial(
+        self,
+        study: Study,
+        trial: FrozenTrial,
+        state: TrialState,
+        values: Sequence[float] | None,
+    ) -> None:
+        with self._lock:
+            self._sampler.after_trial(study, trial, state, values)
+
+    def reseed_rng(self) -> None:
+        with self._lock:
+            self._sampler.reseed_rng()
+
+
+@contextmanager
+def _write_behind_storage(
+    study: Study, max_pending_writes: int
+) -> Generator[WriteBehindStorage | None, None, None]:
+    # Deferring writes pays off only if they can be batched.
+    if max_pending_writes == 0 or not supports_batched_writes(study._storage):
+        yield None
+        return
+
+    storage = study._storage
+    write_behind = WriteBehindStorage(storage, max_pending_writes)
+    study._storage = write_behind
+    try:
+        yield write_behind
+    finally:
+        study._storage = storage
+        write_behind.flush()
+
+
+@contextmanager
+def _wrapped_storage(
+    study: Study, wrapper: Callable[[BaseStorage], BaseStorage]
+) -> Generator[None, None, None]:
+    storage = study._storage
+    study._storage = wrapper(storage)
+    try:
+        yield
+    finally:
+        study._storage = storage
+
+
+@contextmanager
+def _serialized_sampler(study: Study) -> Generator[None, None, None]:
+    sampler = study.sampler
+    study.sampler = _SerializedSampler(sampler)
+    try:
+        yield
+    finally:
+        study.sampler = sampler
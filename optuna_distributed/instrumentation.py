@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import json
+import math
+import threading
+from typing import Any
+
+from optuna_distributed.messages import Message
+
+
+class Histogram:
+    """Distribution of durations in exponentially growing buckets.
+
+    Each bucket counts durations shorter than a power of two microseconds, so recording
+    a value is cheap regardless of how many values have been recorded so far.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._buckets: dict[int, int] = {}
+
+    def record(self, seconds: float) -> None:
+        """Adds a single duration to the histogram.
+
+        Args:
+            seconds:
+                Recorded duration.
+        """
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        # Exponent of the smallest power of two greater than duration in microseconds.
+        _, exponent = math.frexp(seconds * 1e6)
+        bucket = max(exponent, 0)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+    def to_dict(self) -> dict[str, Any]:
+        """Returns JSON serializable summary of the histogram.
+
+        Buckets are listed as pairs of upper bound (in seconds) and count.
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "buckets": [
+                [2**bucket / 1e6, self._buckets[bucket]] for bucket in sorted(self._buckets)
+            ],
+        }
+
+
+class EventLoopStats:
+    """Measures where time goes in the event loop.
+
+    For every message type, event loop counts processed messages and records how long
+    processing took, as well as how long messages waited in queue since they were received
+    by the manager. For messages which workers wait on, such as suggestions, time from
+    receiving the request until response is sent is recorded as worker wait time. Time event
+    loop spends idle while waiting for new messages is accumulated separately.
+
+    Stats are updated as optimization runs, and can be read at any time.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._messages: dict[str, int] = {}
+        self._processing_time: dict[str, Histogram] = {}
+        self._queue_wait: dict[str, Histogram] = {}
+        self._worker_wait: dict[str, Histogram] = {}
+        self._idle_time = 0.0
+
+    def record_message(self, message: Message, started_at: float, finished_at: float) -> None:
+        """Records processing of a single message.
+
+        Args:
+            message:
+                Processed message.
+            started_at:
+                Time (as given by :func:`time.perf_counter`) processing started at.
+            finished_at:
+                Time (as given by :func:`time.perf_counter`) processing finished at.
+        """
+        name = type(message).__name__
+        enqueued_at = message._enqueued_at
+        with self._lock:
+            self._messages[name] = self._messages.get(name, 0) + 1
+            _histogram(self._processing_time, name).record(finished_at - started_at)
+            if enqueued_at is not None:
+                _histogram(self._queue_wait, name).record(started_at - enqueued_at)
+                if message.blocking:
+                    _histogram(self._worker_wait, name).record(finished_at - enqueued_at)
+
+    def record_idle(self, seconds: float) -> None:
+        """Records time spent waiting for new messages.
+
+        Args:
+            seconds:
+                Time spent idle.
+        """
+        with self._lock:
+            self._idle_time += seconds
+
+    def to_dict(self) -> dict[str, Any]:
+        """Returns a JSON serializable snapshot of stats."""
+        with self._lock:
+            return {
+                "messages": dict(self._messages),
+                "processing_time": _summarize(self._processing_time),
+                "queue_wait": _summarize(self._queue_wait),
+                "worker_wait": _summarize(self._worker_wait),
+                "idle_time": self._idle_time,
+            }
+
+    def to_json(self, **kwargs: Any) -> str:
+        """Returns a snapshot of stats encoded as JSON.
+
+        Args:
+            kwargs:
+                Keyword arguments passed to :func:`json.dumps`.
+        """
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+def _histogram(histograms: dict[str, Histogram], name: str) -> Histogram:
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = Histogram()
+    return histogram
+
+
+def _summarize(histograms: dict[str, Histogram]) -> dict[str, Any]:
+    return {name: histogram.to_dict() for name, histogram in histograms.items()}
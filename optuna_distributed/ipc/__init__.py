@@ -1,6 +1,24 @@
 from optuna_distributed.ipc.base import IPCPrimitive
+from optuna_distributed.ipc.base import IPCServer
 from optuna_distributed.ipc.pipe import Pipe
+from optuna_distributed.ipc.pubsub import PubSub
+from optuna_distributed.ipc.pubsub import PubSubServer
 from optuna_distributed.ipc.queue import Queue
+from optuna_distributed.ipc.queue import QueueServer
+from optuna_distributed.ipc.sharedmemory import SharedMemoryPipe
+from optuna_distributed.ipc.stream import Stream
+from optuna_distributed.ipc.stream import StreamServer
 
 
-__all__ = ["IPCPrimitive", "Queue", "Pipe"]
+__all__ = [
+    "IPCPrimitive",
+    "IPCServer",
+    "Queue",
+    "QueueServer",
+    "Pipe",
+    "PubSub",
+    "PubSubServer",
+    "SharedMemoryPipe",
+    "Stream",
+    "StreamServer",
+]
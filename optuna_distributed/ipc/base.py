@@ -1,5 +1,6 @@
 import abc
 from abc import ABC
+from typing import List
 
 from optuna_distributed.messages.base import Message
 
@@ -30,3 +31,59 @@ class IPCPrimitive(ABC):
     def close(self) -> None:
         """Closes communication channel."""
         raise NotImplementedError
+
+
+class IPCServer(IPCPrimitive):
+    """A master side of inter process communication.
+
+    Server gathers messages sent by all workers into a single stream, which can be read
+    with :func:`~optuna_distributed.ipc.IPCServer.get`. Messages published with
+    :func:`~optuna_distributed.ipc.IPCServer.put` are looped back to the same stream,
+    which allows to pump it from the main process e.g. with heartbeats. On timeout, reads
+    raise :obj:`asyncio.TimeoutError`.
+    """
+
+    @abc.abstractmethod
+    def assign(self, trial_id: int) -> IPCPrimitive:
+        """Creates a worker side connection for a trial.
+
+        Args:
+            trial_id:
+                Id of a trial which will use the connection.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_available(self) -> List[Message]:
+        """Retrieves all messages that have already arrived, without waiting for more."""
+        raise NotImplementedError
+
+    def get_batch(self) -> List[Message]:
+        """Retrieves at least one message, along with others that have already arrived.
+
+        Waits for a message first and then drains whatever is buffered, which is cheap
+        for servers receiving messages locally. Servers for which each read is a remote
+        call override it, so that a message is fetched with as few calls as possible.
+        """
+        messages = [self.get()]
+        messages.extend(self.get_available())
+        return messages
+
+    @abc.abstractmethod
+    def get_connection(self, trial_id: int) -> IPCPrimitive:
+        """Fetches private connection to worker.
+
+        Args:
+            trial_id:
+                A connection to worker running trial with specified
+                id will be fetched.
+        """
+        raise NotImplementedError
+
+    def release(self, trial_id: int) -> None:
+        """Drops resources kept for a trial, once it has exited.
+
+        Args:
+            trial_id:
+                Id of a trial which has exited.
+        """
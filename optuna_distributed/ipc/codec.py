@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+import pickle
+import struct
+from typing import Any
+import zlib
+
+from optuna.distributions import FloatDistribution
+from optuna.distributions import IntDistribution
+
+from optuna_distributed.messages import Message
+from optuna_distributed.messages import ReportMessage
+from optuna_distributed.messages import ResponseMessage
+from optuna_distributed.messages import ShouldPruneMessage
+from optuna_distributed.messages import SuggestMessage
+
+
+# Every encoded message starts with a tag identifying its layout, followed by trial id.
+# Highest bit of the tag marks messages with zlib compressed body.
+_HEADER = struct.Struct("<Bq")
+_FLOAT = struct.Struct("<d")
+_INT = struct.Struct("<q")
+_BOOL = struct.Struct("<?")
+_REPORT = struct.Struct("<dq")
+_FLOAT_DISTRIBUTION = struct.Struct("<dd??d")
+_INT_DISTRIBUTION = struct.Struct("<qq?q")
+
+_COMPRESSED = 0x80
+_COMPRESSION_LEVEL = 1
+
+# Network transports compress messages larger than this (in bytes) by default.
+DEFAULT_COMPRESSION_THRESHOLD = 64 * 1024
+
+# Strings are arbitrary Python objects, which may hold lone surrogates that UTF-8 rejects.
+_ERRORS = "surrogatepass"
+
+_INT_MIN = -(2**63)
+_INT_MAX = 2**63 - 1
+
+_PICKLED = 0
+_SHOULD_PRUNE = 1
+_REPORT_TAG = 2
+_RESPONSE_NONE = 3
+_RESPONSE_BOOL = 4
+_RESPONSE_INT = 5
+_RESPONSE_FLOAT = 6
+_RESPONSE_STR = 7
+_SUGGEST_FLOAT = 8
+_SUGGEST_INT = 9
+
+
+def _is_int(value: Any) -> bool:
+    return type(value) is int and _INT_MIN <= value <= _INT_MAX
+
+
+def _encode_should_prune(message: ShouldPruneMessage) -> bytes | None:
+    return _HEADER.pack(_SHOULD_PRUNE, message._trial_id)
+
+
+def _encode_report(message: ReportMessage) -> bytes | None:
+    if type(message._value) is not float or not _is_int(message._step):
+        return None
+    header = _HEADER.pack(_REPORT_TAG, message._trial_id)
+    return header + _REPORT.pack(message._value, message._step)
+
+
+def _encode_response(message: ResponseMessage) -> bytes | None:
+    data = message.data
+    if data is None:
+        return _HEADER.pack(_RESPONSE_NONE, message.trial_id)
+    if type(data) is bool:
+        return _HEADER.pack(_RESPONSE_BOOL, message.trial_id) + _BOOL.pack(data)
+    if _is_int(data):
+        return _HEADER.pack(_RESPONSE_INT, message.trial_id) + _INT.pack(data)
+    if type(data) is float:
+        return _HEADER.pack(_RESPONSE_FLOAT, message.trial_id) + _FLOAT.pack(data)
+    if type(data) is str:
+        return _HEADER.pack(_RESPONSE_STR, message.trial_id) + data.encode(errors=_ERRORS)
+    return None
+
+
+def _encode_suggest(message: SuggestMessage) -> bytes | None:
+    distribution = message._distribution
+    if type(distribution) is FloatDistribution:
+        has_step = distribution.step is not None
+        step = distribution.step if distribution.step is not None else 0.0
+        header = _HEADER.pack(_SUGGEST_FLOAT, message._trial_id)
+        layout = _FLOAT_DISTRIBUTION.pack(
+            distribution.low, distribution.high, distribution.log, has_step, step
+        )
+        return header + layout + message._name.encode(errors=_ERRORS)
+
+    if type(distribution) is IntDistribution:
+        bounds = (distribution.low, distribution.high, distribution.step)
+        if not all(_is_int(bound) for bound in bounds):
+            return None
+        header = _HEADER.pack(_SUGGEST_INT, message._trial_id)
+        layout = _INT_DISTRIBUTION.pack(
+            distribution.low, distribution.high, distribution.log, distribution.step
+        )
+        return header + layout + message._name.encode(errors=_ERRORS)
+
+    return None
+
+
+def _decode_str(payload: memoryview, offset: int = 0) -> str:
+    return bytes(payload[offset:]).decode(errors=_ERRORS)
+
+
+def _decode_suggest_float(trial_id: int, payload: memoryview) -> Message:
+    low, high, log, has_step, step = _FLOAT_DISTRIBUTION.unpack_from(payload)
+    name = _decode_str(payload, offset=_FLOAT_DISTRIBUTION.size)
+    distribution = FloatDistribution(low, high, log=log, step=step if has_step else None)
+    return SuggestMessage(trial_id, name, distribution)
+
+
+def _decode_suggest_int(trial_id: int, payload: memoryview) -> Message:
+    low, high, log, step = _INT_DISTRIBUTION.unpack_from(payload)
+    name = _decode_str(payload, offset=_INT_DISTRIBUTION.size)
+    return SuggestMessage(trial_id, name, IntDistribution(low, high, log=log, step=step))
+
+
+_ENCODERS: dict[type[Message], Callable[[Any], bytes | None]] = {
+    ShouldPruneMessage: _encode_should_prune,
+    ReportMessage: _encode_report,
+    ResponseMessage: _encode_response,
+    SuggestMessage: _encode_suggest,
+}
+
+_DECODERS: dict[int, Callable[[int, memoryview], Message]] = {
+    _SHOULD_PRUNE: lambda trial_id, _: ShouldPruneMessage(trial_id),
+    _REPORT_TAG: lambda trial_id, payload: ReportMessage(trial_id, *_REPORT.unpack(payload)),
+    _RESPONSE_NONE: lambda trial_id, _: ResponseMessage(trial_id, None),
+    _RESPONSE_BOOL: lambda trial_id, payload: ResponseMessage(trial_id, *_BOOL.unpack(payload)),
+    _RESPONSE_INT: lambda trial_id, payload: ResponseMessage(trial_id, *_INT.unpack(payload)),
+    _RESPONSE_FLOAT: lambda trial_id, payload: ResponseMessage(trial_id, *_FLOAT.unpack(payload)),
+    _RESPONSE_STR: lambda trial_id, payload: ResponseMessage(trial_id, _decode_str(payload)),
+    _SUGGEST_FLOAT: _decode_suggest_float,
+    _SUGGEST_INT: _decode_suggest_int,
+}
+
+
+def _encode(message: Message) -> bytes:
+    encoder = _ENCODERS.get(type(message))
+    if encoder is not None:
+        encoded = encoder(message)
+        if encoded is not None:
+            return encoded
+    return bytes([_PICKLED]) + pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def encode(message: Message, compression_threshold: int | None = None) -> bytes:
+    """Serializes a message.
+
+    Most frequently sent messages, such as suggestions, reports and responses carrying
+    simple values, are packed into compact binary layouts. Everything else is pickled.
+
+    Args:
+        message:
+            An instance of :class:'~optuna_distributed.messages.Message'.
+        compression_threshold:
+            Size (in bytes) of encoded message above which it is compressed with zlib.
+            Message is sent as is if compression does not make it smaller. If :obj:`None`,
+            messages are never compressed.
+    """
+    encoded = _encode(message)
+    if compression_threshold is not None and len(encoded) > compression_threshold:
+        compressed = zlib.compress(memoryview(encoded)[1:], _COMPRESSION_LEVEL)
+        if len(compressed) + 1 < len(encoded):
+            return bytes([encoded[0] | _COMPRESSED]) + compressed
+    return encoded
+
+
+def decode(data: bytes) -> Message:
+    """Deserializes a message encoded with :func:`~optuna_distributed.ipc.codec.encode`.
+
+    Args:
+        data:
+            Encoded message.
+    """
+    view = memoryview(data)
+    if view[0] & _COMPRESSED:
+        view = memoryview(bytes([view[0] & ~_COMPRESSED]) + zlib.decompress(view[1:]))
+
+    if view[0] == _PICKLED:
+        return pickle.loads(view[1:])
+
+    tag, trial_id = _HEADER.unpack_from(view)
+    offset = _HEADER.size
+    return _DECODERS[tag](trial_id, view[offset:])
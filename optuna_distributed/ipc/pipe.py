@@ -1,6 +1,10 @@
+from __future__ import annotations
+
 from multiprocessing.connection import Connection
 
 from optuna_distributed.ipc import IPCPrimitive
+from optuna_distributed.ipc.codec import decode
+from optuna_distributed.ipc.codec import encode
 from optuna_distributed.messages import Message
 
 
@@ -8,22 +12,28 @@ class Pipe(IPCPrimitive):
     """IPC primitive based on multiprocessing Pipe.
 
     Forms a thin layer of abstraction over one end of multiprocessing
-    pipe connection, with get/put semantics.
+    pipe connection, with get/put semantics. Messages are serialized with
+    :func:`~optuna_distributed.ipc.codec.encode`.
 
     Args:
         connection:
             One of the ends of multiprocessing pipe.
             https://docs.python.org/3/library/multiprocessing.html#multiprocessing.Pipe
+        compression_threshold:
+            Size (in bytes) of encoded message above which it is compressed.
+            If :obj:`None`, messages are never compressed, which is the default
+            for pipes between local processes.
     """
 
-    def __init__(self, connection: Connection) -> None:
+    def __init__(self, connection: Connection, compression_threshold: int | None = None) -> None:
         self._connection = connection
+        self._compression_threshold = compression_threshold
 
     def get(self) -> Message:
-        return self._connection.recv()
+        return decode(self._connection.recv_bytes())
 
     def put(self, message: Message) -> None:
-        return self._connection.send(message)
+        return self._connection.send_bytes(encode(message, self._compression_threshold))
 
     def close(self) -> None:
         return self._connection.close()
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+import uuid
+
+from optuna_distributed.ipc import IPCPrimitive
+from optuna_distributed.ipc import IPCServer
+from optuna_distributed.ipc.codec import DEFAULT_COMPRESSION_THRESHOLD
+from optuna_distributed.ipc.codec import decode
+from optuna_distributed.ipc.codec import encode
+from optuna_distributed.messages import Message
+
+
+try:
+    from dask.distributed import Pub
+    from dask.distributed import Sub
+
+    _imported = True
+except ImportError:
+    # Pub/Sub has been removed from distributed 2025.5.0.
+    _imported = False
+
+
+class PubSub(IPCPrimitive):
+    """IPC primitive based on dask distributed Pub/Sub.
+
+    Messages are pushed to subscribers as soon as they are published, so there is
+    no need to wait on scheduler for them. All messages are encoded to bytes before
+    sending and decoded after recieving to ensure data is msgpack-encodable.
+
+    .. note::
+        Pub/Sub is not available in distributed 2025.5.0 and newer.
+
+    Args:
+        publishing:
+            A name of the topic used to publish messages to.
+        recieving:
+            A name of the topic used to recieve messages from.
+        timeout:
+            Time (in seconds) to wait for message to be fetched
+            before raising an exception. If :obj:`None`, waits indefinitely.
+        compression_threshold:
+            Size (in bytes) of encoded message above which it is compressed.
+            If :obj:`None`, messages are never compressed.
+    """
+
+    def __init__(
+        self,
+        publishing: str,
+        recieving: str | None = None,
+        timeout: float | None = None,
+        compression_threshold: int | None = DEFAULT_COMPRESSION_THRESHOLD,
+    ) -> None:
+        if not _imported:
+            raise ImportError(
+                "Pub/Sub is not available in installed version of distributed. "
+                "Please use distributed<2025.5.0 or other transport."
+            )
+
+        self._publishing = publishing
+        self._recieving = recieving
+        self._timeout = timeout
+        self._compression_threshold = compression_threshold
+        self._publisher: Any = None
+        self._subscriber: Any = None
+        self._initialized = False
+
+    def _initialize(self) -> None:
+        if not self._initialized:
+            # Lazy initialization, since we have to make sure topics are joined on target
+            # machine. Subscription is made before anything is published, so that it reaches
+            # scheduler before any response to our messages can be sent.
+            if self._recieving is not None:
+                self._subscriber = Sub(self._recieving)
+            self._publisher = Pub(self._publishing)
+            self._initialized = True
+
+    def get(self) -> Message:
+        self._initialize()
+        if self._subscriber is None:
+            raise RuntimeError("Trying to get message with publish-only connection.")
+
+        try:
+            return decode(self._subscriber.get(self._timeout))
+
+        except (asyncio.TimeoutError, TimeoutError):
+            raise asyncio.TimeoutError
+
+    def put(self, message: Message) -> None:
+        self._initialize()
+        self._publisher.put(encode(message, self._compression_threshold))
+
+    def close(self) -> None:
+        # Topics are cleaned up by dask once there are
+        # no more publishers and subscribers using them.
+        if self._subscriber is not None and self._subscriber.client is not None:
+            _unsubscribe(self._subscriber)
+
+        self._publisher = None
+        self._subscriber = None
+        self._initialized = False
+
+
+class PubSubServer(IPCServer):
+    """IPC server based on dask distributed Pub/Sub.
+
+    All workers publish messages to a single topic subscribed by the client, and each
+    trial subscribes its own topic to recieve responses. In contrast to
+    :class:`~optuna_distributed.ipc.QueueServer`, messages are pushed to recipients,
+    and topics are removed from scheduler as soon as trials using them exit.
+
+    .. note::
+        Pub/Sub is not available in distributed 2025.5.0 and newer.
+
+    Args:
+        timeout:
+            Time (in seconds) to wait for message to be fetched
+            before raising an exception.
+        compression_threshold:
+            Size (in bytes) of encoded message above which it is compressed.
+            If :obj:`None`, messages are never compressed.
+    """
+
+    def __init__(
+        self,
+        timeout: float | None = None,
+        compression_threshold: int | None = DEFAULT_COMPRESSION_THRESHOLD,
+    ) -> None:
+        self._public_channel = str(uuid.uuid4())
+        self._private_channels: dict[int, str] = {}
+        self._connections: dict[int, PubSub] = {}
+        self._compression_threshold = compression_threshold
+        self._topic = PubSub(
+            publishing=self._public_channel,
+            recieving=self._public_channel,
+            timeout=timeout,
+            compression_threshold=compression_threshold,
+        )
+
+        # Joining topic eagerly, so that workers see our subscription from the start.
+        self._topic._initialize()
+
+    def assign(self, trial_id: int) -> IPCPrimitive:
+        private_channel = str(uuid.uuid4())
+        self._private_channels[trial_id] = private_channel
+        return PubSub(
+            self._public_channel,
+            private_channel,
+            compression_threshold=self._compression_threshold,
+        )
+
+    def get_connection(self, trial_id: int) -> IPCPrimitive:
+        # Each publisher is registered on the scheduler, so a single one
+        # is used for all responses to a trial.
+        connection = self._connections.get(trial_id)
+        if connection is None:
+            connection = self._connections[trial_id] = PubSub(
+                self._private_channels[trial_id],
+                compression_threshold=self._compression_threshold,
+            )
+        return connection
+
+    def release(self, trial_id: int) -> None:
+        self._private_channels.pop(trial_id, None)
+        connection = self._connections.pop(trial_id, None)
+        if connection is not None:
+            connection.close()
+
+    def get(self) -> Message:
+        return self._topic.get()
+
+    def get_available(self) -> list[Message]:
+        # Messages are pushed to subscriber's buffer as they arrive.
+        buffer = self._topic._subscriber.buffer
+        messages: list[Message] = []
+        while buffer:
+            messages.append(decode(buffer.popleft()))
+        return messages
+
+    def put(self, message: Message) -> None:
+        self._topic.put(message)
+
+    def close(self) -> None:
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+        self._topic.close()
+
+
+def _unsubscribe(subscriber: Any) -> None:
+    # Client side Pub/Sub extension never forgets topics, and asks scheduler to remove
+    # every topic left without subscribers on each cleanup. Removing a topic twice fails
+    # on scheduler and breaks connection with the client, so topic is forgotten by the
+    # extension first, and scheduler is asked to remove it exactly once.
+    client = subscriber.client
+    extension = client.extensions["pubsub"]
+    subscriber.buffer.clear()
+
+    def _remove() -> None:
+        subscribers = extension.subscribers.get(subscriber.name)
+        if subscribers is None:
+            return
+
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del extension.subscribers[subscriber.name]
+            client.scheduler_comm.send({"op": "pubsub-remove-subscriber", "name": subscriber.name})
+
+    # Extension is modified only from the client's event loop.
+    client.loop.add_callback(_remove)
@@ -1,18 +1,22 @@
 from __future__ import annotations
 
 import asyncio
-import pickle
+import uuid
 
 from dask.distributed import Queue as DaskQueue
 
 from optuna_distributed.ipc import IPCPrimitive
+from optuna_distributed.ipc import IPCServer
+from optuna_distributed.ipc.codec import DEFAULT_COMPRESSION_THRESHOLD
+from optuna_distributed.ipc.codec import decode
+from optuna_distributed.ipc.codec import encode
 from optuna_distributed.messages import Message
 
 
 class Queue(IPCPrimitive):
     """IPC primitive based on dask distributed queue.
 
-    All messages are pickled before sending and unpickled
+    All messages are encoded to bytes before sending and decoded
     after recieving to ensure data is msgpack-encodable.
 
     Args:
@@ -27,6 +31,9 @@ class Queue(IPCPrimitive):
         max_retries:
             Specifies maximum number of attempts to fetch a message.
             After each attempt, timeout is extended exponentially.
+        compression_threshold:
+            Size (in bytes) of encoded message above which it is compressed.
+            If :obj:`None`, messages are never compressed.
     """
 
     def __init__(
@@ -35,6 +42,7 @@ class Queue(IPCPrimitive):
         recieving: str | None = None,
         timeout: int | None = None,
         max_retries: int | None = None,
+        compression_threshold: int | None = DEFAULT_COMPRESSION_THRESHOLD,
     ) -> None:
         self._publishing = publishing
         self._recieving = recieving
@@ -44,6 +52,7 @@ class Queue(IPCPrimitive):
 
         self._timeout = timeout
         self._max_retries = max_retries
+        self._compression_threshold = compression_threshold
         self._publisher: DaskQueue | None = None
         self._subscriber: DaskQueue | None = None
         self._initialized = False
@@ -66,7 +75,7 @@ class Queue(IPCPrimitive):
         while True:
             try:
                 timeout = self._timeout if self._max_retries is None else 2**attempt
-                return pickle.loads(self._subscriber.get(timeout))
+                return decode(self._subscriber.get(timeout))
 
             except asyncio.TimeoutError:
                 attempt += 1
@@ -76,9 +85,76 @@ class Queue(IPCPrimitive):
     def put(self, message: Message) -> None:
         self._initialize()
         assert self._publisher is not None
-        self._publisher.put(pickle.dumps(message))
+        self._publisher.put(encode(message, self._compression_threshold))
 
     def close(self) -> None:
         # Cleanup is handled by dask.
         # For us it's enough to just drop references to queue objects.
         ...
+
+
+class QueueServer(IPCServer):
+    """IPC server based on dask distributed queues.
+
+    All workers publish messages to a single public queue, and each trial
+    gets a private queue used to send responses back to it. Every message
+    travels through the Dask scheduler.
+
+    Args:
+        timeout:
+            Time (in seconds) to wait for message to be fetched
+            before raising an exception.
+        compression_threshold:
+            Size (in bytes) of encoded message above which it is compressed.
+            If :obj:`None`, messages are never compressed.
+    """
+
+    def __init__(
+        self,
+        timeout: int | None = None,
+        compression_threshold: int | None = DEFAULT_COMPRESSION_THRESHOLD,
+    ) -> None:
+        self._public_channel = str(uuid.uuid4())
+        self._private_channels: dict[int, str] = {}
+        self._compression_threshold = compression_threshold
+        self._queue = Queue(
+            publishing=self._public_channel,
+            recieving=self._public_channel,
+            timeout=timeout,
+            compression_threshold=compression_threshold,
+        )
+
+    def assign(self, trial_id: int) -> IPCPrimitive:
+        private_channel = str(uuid.uuid4())
+        self._private_channels[trial_id] = private_channel
+        return Queue(
+            self._public_channel,
+            private_channel,
+            max_retries=5,
+            compression_threshold=self._compression_threshold,
+        )
+
+    def get_connection(self, trial_id: int) -> IPCPrimitive:
+        return Queue(
+            self._private_channels[trial_id],
+            compression_threshold=self._compression_threshold,
+        )
+
+    def get(self) -> Message:
+        return self._queue.get()
+
+    def get_available(self) -> list[Message]:
+        self._queue._initialize()
+        assert self._queue._subscriber is not None
+        return [decode(data) for data in self._queue._subscriber.get(batch=True)]
+
+    def get_batch(self) -> list[Message]:
+        # Each read is a round trip to the scheduler, so whatever is queued is fetched
+        # in one call, and a message is waited for only if there was nothing there.
+        return self.get_available() or [self.get()]
+
+    def put(self, message: Message) -> None:
+        self._queue.put(message)
+
+    def close(self) -> None:
+        self._queue.close()
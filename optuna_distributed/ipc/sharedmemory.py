@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+import struct
+import sys
+import threading
+from typing import Any
+
+from optuna_distributed.ipc import IPCPrimitive
+from optuna_distributed.ipc.codec import decode
+from optuna_distributed.ipc.codec import encode
+from optuna_distributed.messages import Message
+
+
+_COUNTER = struct.Struct("Q")
+_HEADER_SIZE = 2 * _COUNTER.size
+
+_attach_lock = threading.Lock()
+
+
+def _attach(name: str) -> SharedMemory:
+    # Block is already tracked by the process which allocated it. Tracking it again
+    # from a spawned child is at best redundant, and at worst has child's resource tracker
+    # unlink it (warning about a leak) while the other side still uses it. Unregistering
+    # after attaching is not an option either, since tracker shared with the parent would
+    # then forget the block altogether.
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name, track=False)
+
+    with _attach_lock:
+        register = resource_tracker.register
+        setattr(resource_tracker, "register", lambda name, rtype: None)
+        try:
+            return SharedMemory(name)
+        finally:
+            setattr(resource_tracker, "register", register)
+
+
+class _RingBuffer:
+    """Single producer, single consumer ring buffer of length-prefixed frames.
+
+    Header holds two monotonic counters: total number of bytes written (head), updated only
+    by producer, and total number of bytes read (tail), updated only by consumer.
+    """
+
+    def __init__(self, buffer: memoryview, capacity: int) -> None:
+        self._header = buffer[:_HEADER_SIZE]
+        self._data = buffer[_HEADER_SIZE:]
+        self._capacity = capacity
+
+    @property
+    def _head(self) -> int:
+        return _COUNTER.unpack_from(self._header, 0)[0]
+
+    @property
+    def _tail(self) -> int:
+        return _COUNTER.unpack_from(self._header, _COUNTER.size)[0]
+
+    def _copy_in(self, position: int, data: memoryview) -> None:
+        start = position % self._capacity
+        first = min(len(data), self._capacity - start)
+        end = start + first
+        self._data[start:end] = data[:first]
+        self._data[: len(data) - first] = data[first:]
+
+    def _copy_out(self, position: int, size: int) -> bytes:
+        start = position % self._capacity
+        first = min(size, self._capacity - start)
+        end = start + first
+        return bytes(self._data[start:end]) + bytes(self._data[: size - first])
+
+    def write(self, data: bytes) -> bool:
+        head = self._head
+        size = _COUNTER.size + len(data)
+        if size > self._capacity - (head - self._tail):
+            return False
+
+        self._copy_in(head, memoryview(_COUNTER.pack(len(data))))
+        self._copy_in(head + _COUNTER.size, memoryview(data))
+        _COUNTER.pack_into(self._header, 0, head + size)
+        return True
+
+    def read(self) -> bytes:
+        tail = self._tail
+        (size,) = _COUNTER.unpack(self._copy_out(tail, _COUNTER.size))
+        data = self._copy_out(tail + _COUNTER.size, size)
+        _COUNTER.pack_into(self._header, _COUNTER.size, tail + _COUNTER.size + size)
+        return data
+
+    def release(self) -> None:
+        self._header.release()
+        self._data.release()
+
+
+class SharedMemoryPipe(IPCPrimitive):
+    """IPC primitive based on shared memory ring buffers.
+
+    Messages are written to a ring buffer in shared memory block, one for each direction,
+    and the other side is woken up with an empty message sent over multiprocessing pipe.
+    This saves copying payloads through the kernel, while pipe connection can still be
+    waited on together with others. Messages that do not fit in the ring buffer are sent
+    over pipe instead.
+
+    Args:
+        connection:
+            One of the ends of multiprocessing pipe.
+            https://docs.python.org/3/library/multiprocessing.html#multiprocessing.Pipe
+        memory:
+            Shared memory block allocated with
+            :func:`~optuna_distributed.ipc.SharedMemoryPipe.allocate`.
+        capacity:
+            Size (in bytes) of a ring buffer for each direction.
+        master:
+            Specifies which side of the pipe this primitive is. Master side owns shared
+            memory block and releases it on close.
+    """
+
+    def __init__(
+        self, connection: Connection, memory: SharedMemory, capacity: int, master: bool
+    ) -> None:
+        self._connection = connection
+        self._memory = memory
+        self._capacity = capacity
+        self._master = master
+        self._rings: tuple[_RingBuffer, _RingBuffer] | None = None
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_memory"] = self._memory.name
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._memory = _attach(state["_memory"])
+
+    @staticmethod
+    def allocate(capacity: int) -> SharedMemory:
+        """Allocates shared memory block for ring buffers of given capacity.
+
+        Args:
+            capacity:
+                Size (in bytes) of a ring buffer for each direction.
+        """
+        # Newly created block is zero filled, so both ring buffers start empty.
+        return SharedMemory(create=True, size=2 * (_HEADER_SIZE + capacity))
+
+    def _initialize(self) -> tuple[_RingBuffer, _RingBuffer]:
+        # Lazy initialization, since memory views can't be sent to spawned processes.
+        if self._rings is None:
+            buffer = self._memory.buf
+            assert buffer is not None
+            size = _HEADER_SIZE + self._capacity
+            to_master = _RingBuffer(buffer[:size], self._capacity)
+            to_worker = _RingBuffer(buffer[size:], self._capacity)
+            self._rings = (to_worker, to_master) if self._master else (to_master, to_worker)
+        return self._rings
+
+    def get(self) -> Message:
+        _, incoming = self._initialize()
+        data = self._connection.recv_bytes()
+        return decode(data if data else incoming.read())
+
+    def put(self, message: Message) -> None:
+        outgoing, _ = self._initialize()
+        data = encode(message)
+        if outgoing.write(data):
+            self._connection.send_bytes(b"")
+        else:
+            self._connection.send_bytes(data)
+
+    def close(self) -> None:
+        self._connection.close()
+        if self._rings is not None:
+            for ring in self._rings:
+                ring.release()
+            self._rings = None
+
+        self._memory.close()
+        if self._master:
+            self._memory.unlink()
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from multiprocessing import AuthenticationError
+from multiprocessing import Pipe as MultiprocessingPipe
+from multiprocessing.connection import Client
+from multiprocessing.connection import Connection
+from multiprocessing.connection import Listener
+from multiprocessing.connection import answer_challenge
+from multiprocessing.connection import deliver_challenge
+from multiprocessing.connection import wait
+import secrets
+import threading
+from threading import Thread
+import time
+
+from distributed.utils import get_ip
+
+from optuna_distributed.ipc import IPCPrimitive
+from optuna_distributed.ipc import IPCServer
+from optuna_distributed.ipc import Pipe
+from optuna_distributed.ipc.codec import DEFAULT_COMPRESSION_THRESHOLD
+from optuna_distributed.ipc.codec import decode
+from optuna_distributed.ipc.codec import encode
+from optuna_distributed.messages import Message
+
+
+# Time (in seconds) a connecting trial has to introduce itself.
+_HANDSHAKE_TIMEOUT = 10.0
+
+
+class Stream(IPCPrimitive):
+    """IPC primitive based on TCP stream.
+
+    Worker side of a direct connection to :class:`~optuna_distributed.ipc.StreamServer`.
+    Connection is opened lazily on first use, so this object can be serialized and
+    shipped to the worker before that. After connecting, trial introduces itself with
+    its id, so that server can route responses back.
+
+    Args:
+        address:
+            Host and port of the server.
+        authkey:
+            A secret used to authenticate connection with the server.
+        trial_id:
+            Id of a trial using the connection.
+        compression_threshold:
+            Size (in bytes) of encoded message above which it is compressed.
+            If :obj:`None`, messages are never compressed.
+    """
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        authkey: bytes,
+        trial_id: int,
+        compression_threshold: int | None = DEFAULT_COMPRESSION_THRESHOLD,
+    ) -> None:
+        self._address = address
+        self._authkey = authkey
+        self._trial_id = trial_id
+        self._compression_threshold = compression_threshold
+        self._connection: Connection | None = None
+
+    def _initialize(self) -> Connection:
+        if self._connection is None:
+            self._connection = Client(self._address, authkey=self._authkey)
+            self._connection.send(self._trial_id)
+        return self._connection
+
+    def get(self) -> Message:
+        return decode(self._initialize().recv_bytes())
+
+    def put(self, message: Message) -> None:
+        self._initialize().send_bytes(encode(message, self._compression_threshold))
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class StreamServer(IPCServer):
+    """IPC server based on direct TCP streams.
+
+    Server listens for connections from workers, and each trial opens its own
+    stream. All streams are multiplexed into a single stream of messages, so
+    trial traffic never goes through the Dask scheduler. The scheduler is used
+    only to ship server address to workers along with the tasks.
+
+    Args:
+        host:
+            Address to listen on. Must be reachable by workers. If :obj:`None`,
+            address of the default network interface is used.
+        timeout:
+            Time (in seconds) to wait for message to be fetched
+            before raising an exception.
+        compression_threshold:
+            Size (in bytes) of encoded message above which it is compressed.
+            If :obj:`None`, messages are never compressed.
+    """
+
+    def __init__(
+        self,
+        host: str | None = None,
+        timeout: float | None = None,
+        compression_threshold: int | None = DEFAULT_COMPRESSION_THRESHOLD,
+    ) -> None:
+        self._timeout = timeout
+        self._compression_threshold = compression_threshold
+        self._authkey = secrets.token_bytes(32)
+        # Connections are authenticated off the accepting thread, so that
+        # a stalled client does not hold up others.
+        self._listener = Listener((host or get_ip(), 0))
+        self._connections: dict[int, Connection] = {}
+        self._accepted: list[tuple[int, Connection]] = []
+        self._handshaking: set[Connection] = set()
+        self._inbox: deque[Message] = deque()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Loopback pipe wakes up the reader when new connection is accepted,
+        # and carries messages published by the server itself.
+        self._loopback_reader, self._loopback_writer = MultiprocessingPipe(duplex=False)
+        Thread(target=self._accept, daemon=True).start()
+
+    @property
+    def address(self) -> tuple[str, int]:
+        """Address workers connect to."""
+        return self._listener.address
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                connection = self._listener.accept()
+
+            except OSError:
+                break
+
+            with self._lock:
+                if self._closed:
+                    connection.close()
+                    break
+                self._handshaking.add(connection)
+            Thread(target=self._handshake, args=(connection,), daemon=True).start()
+
+    def _handshake(self, connection: Connection) -> None:
+        try:
+            deliver_challenge(connection, self._authkey)
+            answer_challenge(connection, self._authkey)
+            if not connection.poll(_HANDSHAKE_TIMEOUT):
+                raise EOFError
+            trial_id = connection.recv()
+
+        except (AuthenticationError, EOFError, OSError):
+            with self._lock:
+                self._handshaking.discard(connection)
+            connection.close()
+            return
+
+        with self._lock:
+            self._handshaking.discard(connection)
+            if self._closed:
+                connection.close()
+                return
+            self._accepted.append((trial_id, connection))
+            self._loopback_writer.send_bytes(b"")
+
+    def _register_accepted(self) -> None:
+        with self._lock:
+            for trial_id, connection in self._accepted:
+                self._connections[trial_id] = connection
+            self._accepted.clear()
+
+    def _receive(self, timeout: float | None) -> None:
+        self._register_accepted()
+        connections = [self._loopback_reader, *self._connections.values()]
+        for incoming in wait(connections, timeout):
+            assert isinstance(incoming, Connection)
+            try:
+                data = incoming.recv_bytes()
+                if data:
+                    self._inbox.append(decode(data))
+
+            except EOFError:
+                # Trial has finished and closed its stream.
+                for trial_id, connection in self._connections.items():
+                    if incoming == connection:
+                        break
+                self._connections.pop(trial_id).close()
+
+    def assign(self, trial_id: int) -> IPCPrimitive:
+        return Stream(self.address, self._authkey, trial_id, self._compression_threshold)
+
+    def get_connection(self, trial_id: int) -> IPCPrimitive:
+        return Pipe(self._connections[trial_id], self._compression_threshold)
+
+    def get(self) -> Message:
+        started_at = time.monotonic()
+        while not self._inbox:
+            timeout = None
+            if self._timeout is not None:
+                timeout = self._timeout - (time.monotonic() - started_at)
+                if timeout <= 0:
+                    raise asyncio.TimeoutError
+
+            self._receive(timeout)
+        return self._inbox.popleft()
+
+    def get_available(self) -> list[Message]:
+        self._receive(timeout=0)
+        messages = list(self._inbox)
+        self._inbox.clear()
+        return messages
+
+    def put(self, message: Message) -> None:
+        with self._lock:
+            if not self._closed:
+                self._loopback_writer.send_bytes(encode(message))
+
+    def close(self) -> None:
+        # Closing listening socket does not interrupt pending accept,
+        # so accepting thread is woken up with a dummy connection.
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        try:
+            Client(self.address).close()
+        except OSError:
+            pass
+
+        self._listener.close()
+        with self._lock:
+            pending = [*self._handshaking, *(c for _, c in self._accepted)]
+            self._handshaking.clear()
+            self._accepted.clear()
+            self._loopback_reader.close()
+            self._loopback_writer.close()
+
+        for connection in [*pending, *self._connections.values()]:
+            connection.close()
+        self._connections.clear()
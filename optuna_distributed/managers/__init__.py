@@ -2,6 +2,7 @@ from optuna_distributed.managers.base import DistributableFuncType
 from optuna_distributed.managers.base import ObjectiveFuncType
 from optuna_distributed.managers.base import OptimizationManager
 from optuna_distributed.managers.distributed import DistributedOptimizationManager
+from optuna_distributed.managers.distributed import Transport
 from optuna_distributed.managers.local import LocalOptimizationManager
 
 
@@ -11,4 +12,5 @@ __all__ = [
     "LocalOptimizationManager",
     "DistributableFuncType",
     "ObjectiveFuncType",
+    "Transport",
 ]
@@ -2,13 +2,20 @@ from __future__ import annotations
 
 import abc
 from abc import ABC
+import asyncio
+from collections import deque
+from collections.abc import AsyncGenerator
 from collections.abc import Generator
+import threading
+from threading import Thread
+import time
 from typing import Callable
 from typing import Sequence
 from typing import TYPE_CHECKING
 from typing import Union
 
 from optuna.study import Study
+from optuna.trial import Trial
 
 from optuna_distributed.ipc import IPCPrimitive
 from optuna_distributed.messages import Message
@@ -23,6 +30,14 @@ ObjectiveFuncType = Callable[[DistributedTrial], Union[float, Sequence[float]]]
 DistributableFuncType = Callable[[DistributedTrial], None]
 
 
+class TrialTimedOut(BaseException):
+    """Raised in objective function running longer than allowed.
+
+    Derives from :class:`BaseException`, so that it's not swallowed by objective functions
+    catching :class:`Exception`.
+    """
+
+
 class OptimizationManager(ABC):
     """Controls and provides context in event loop.
 
@@ -31,6 +46,10 @@ class OptimizationManager(ABC):
     to do the job, and pump event loop with messages to process.
     """
 
+    def __init__(self) -> None:
+        # Messages pumped by a background thread, but not yet fetched by the event loop.
+        self._pumped: deque[Message] = deque()
+
     @abc.abstractmethod
     def create_futures(self, study: Study, objective: ObjectiveFuncType) -> None:
         """Spawns a set of workers to run objective function.
@@ -50,6 +69,34 @@ class OptimizationManager(ABC):
         """Fetches incoming messages from workers."""
         raise NotImplementedError
 
+    async def get_message_async(self) -> AsyncGenerator[Message, None]:
+        """Fetches incoming messages from workers without blocking the event loop.
+
+        By default, messages from :func:`get_message` are pumped into the event loop
+        by a background thread. Managers which can wait on workers asynchronously,
+        or which modify their state while fetching messages, should override this.
+        """
+        loop = asyncio.get_running_loop()
+        pumped = asyncio.Event()
+        stopped = threading.Event()
+        outcome: list[BaseException | None] = []
+        args = (self.get_message(), loop, self._pumped, pumped, stopped, outcome)
+        Thread(target=_pump_messages, args=args, daemon=True).start()
+        try:
+            while True:
+                pumped.clear()
+                finished = bool(outcome)
+                while self._pumped:
+                    yield self._pumped.popleft()
+                if finished:
+                    if outcome[0] is not None:
+                        raise outcome[0]
+                    return
+                await pumped.wait()
+
+        finally:
+            stopped.set()
+
     @abc.abstractmethod
     def after_message(self, event_loop: "EventLoop") -> None:
         """A hook allowing to run additional operations after recieved
@@ -73,6 +120,21 @@ class OptimizationManager(ABC):
         """
         raise NotImplementedError
 
+    def get_trial(self, study: Study, trial_id: int) -> Trial:
+        """Fetches trial object used to process messages from worker.
+
+        Creating a trial reads it from storage and runs sampler hooks, including relative
+        sampling, so managers should keep trial objects around while trials are running.
+        By default, a new trial object is created on every call.
+
+        Args:
+            study:
+                An instance of Optuna study.
+            trial_id:
+                Id of a trial to fetch.
+        """
+        return Trial(study, trial_id)
+
     @abc.abstractmethod
     def stop_optimization(self, patience: float) -> None:
         """Stops all running trials and sets thier statuses to failed.
@@ -84,6 +146,18 @@ class OptimizationManager(ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def stop_dispatching(self, study: Study) -> None:
+        """Stops dispatching new trials, while running ones are allowed to finish.
+
+        Trials created in advance, which did not start yet, are failed.
+
+        Args:
+            study:
+                An instance of Optuna study.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def should_end_optimization(self) -> bool:
         """Indicates whether optimization process can be finished.
@@ -105,3 +179,113 @@ class OptimizationManager(ABC):
                 Id of a trial that was being run on exiting worker.
         """
         raise NotImplementedError
+
+
+class TrialCache:
+    """Keeps trial objects of running trials.
+
+    Messages of a trial are processed with the same trial object, just like Optuna uses
+    a single one for the whole evaluation of objective function. Trials should be evicted
+    once they are finished.
+    """
+
+    def __init__(self) -> None:
+        self._trials: dict[int, Trial] = {}
+
+    def add(self, trial: Trial) -> Trial:
+        """Keeps an already created trial object, e.g. one returned by ask.
+
+        Args:
+            trial:
+                A trial object to keep.
+        """
+        self._trials[trial._trial_id] = trial
+        return trial
+
+    def get(self, study: Study, trial_id: int) -> Trial:
+        """Fetches trial object, creating it on first use.
+
+        Args:
+            study:
+                An instance of Optuna study.
+            trial_id:
+                Id of a trial to fetch.
+        """
+        trial = self._trials.get(trial_id)
+        if trial is None:
+            trial = self._trials[trial_id] = Trial(study, trial_id)
+        return trial
+
+    def evict(self, trial_id: int) -> None:
+        """Drops trial object of a finished trial.
+
+        Args:
+            trial_id:
+                Id of a finished trial.
+        """
+        self._trials.pop(trial_id, None)
+
+    def clear(self) -> None:
+        """Drops all trial objects."""
+        self._trials.clear()
+
+    def __len__(self) -> int:
+        return len(self._trials)
+
+
+def prioritize(messages: Sequence[Message]) -> list[Message]:
+    """Orders a batch of messages, so that workers waiting for responses are served first.
+
+    Messages of each trial keep their relative order, so everything a trial has sent
+    before a blocking message is moved ahead along with it. Messages are also stamped
+    with time they were queued at, which is used to measure queue wait times.
+
+    Args:
+        messages:
+            Messages in order they were received.
+    """
+    enqueued_at = time.perf_counter()
+    for message in messages:
+        message._enqueued_at = enqueued_at
+
+    trial_ids = [getattr(message, "_trial_id", None) for message in messages]
+    served_until: dict[int | None, int] = {}
+    for position, message in enumerate(messages):
+        if message.blocking:
+            served_until[trial_ids[position]] = position
+
+    def priority(position: int) -> int:
+        return 0 if position <= served_until.get(trial_ids[position], -1) else 1
+
+    return [messages[position] for position in sorted(range(len(messages)), key=priority)]
+
+
+def _pump_messages(
+    messages: Generator[Message, None, None],
+    loop: asyncio.AbstractEventLoop,
+    pumped: deque[Message],
+    notify: asyncio.Event,
+    stopped: threading.Event,
+    outcome: list[BaseException | None],
+) -> None:
+    # Messages are handed over through a queue owned by the manager, so that whatever is
+    # pumped after the event loop stopped listening is left for the next one to fetch.
+    try:
+        while not stopped.is_set():
+            message = next(messages, None)
+            if message is None:
+                outcome.append(None)
+                break
+            pumped.append(message)
+            loop.call_soon_threadsafe(notify.set)
+        else:
+            return
+
+    except BaseException as e:
+        outcome.append(e)
+
+    try:
+        loop.call_soon_threadsafe(notify.set)
+    except RuntimeError:
+        # Event loop has already been closed.
+        pass
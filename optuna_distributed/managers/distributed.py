@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import asyncio
+from collections import deque
 from collections.abc import Generator
+from collections.abc import Hashable
+from collections.abc import Iterable
 import ctypes
 from dataclasses import dataclass
 from enum import IntEnum
@@ -10,24 +13,35 @@ import threading
 from threading import Thread
 import time
 from typing import Callable
+from typing import Literal
 from typing import TYPE_CHECKING
-import uuid
 
+from dask.distributed import Actor
 from dask.distributed import Client
+from dask.distributed import Event
 from dask.distributed import Future
-from dask.distributed import Variable
 from optuna.exceptions import TrialPruned
 from optuna.study import Study
+from optuna.trial import FrozenTrial
+from optuna.trial import Trial
 
 from optuna_distributed.ipc import IPCPrimitive
-from optuna_distributed.ipc import Queue
+from optuna_distributed.ipc import IPCServer
+from optuna_distributed.ipc import PubSubServer
+from optuna_distributed.ipc import QueueServer
+from optuna_distributed.ipc import StreamServer
 from optuna_distributed.managers import ObjectiveFuncType
 from optuna_distributed.managers import OptimizationManager
+from optuna_distributed.managers.base import TrialCache
+from optuna_distributed.managers.base import TrialTimedOut
+from optuna_distributed.managers.base import prioritize
 from optuna_distributed.messages import CompletedMessage
 from optuna_distributed.messages import FailedMessage
 from optuna_distributed.messages import HeartbeatMessage
 from optuna_distributed.messages import Message
 from optuna_distributed.messages import PrunedMessage
+from optuna_distributed.messages import TimedOutMessage
+from optuna_distributed.storage import fail_trials
 from optuna_distributed.trial import DistributedTrial
 
 
@@ -36,6 +50,12 @@ if TYPE_CHECKING:
 
 
 DistributableWithContext = Callable[["_TaskContext"], None]
+Transport = Literal["queue", "pubsub", "stream"]
+
+# Number of exited trials after which their tasks are removed from shared state.
+_MAX_EXITED_TASKS = 100
+# Maximum time (in seconds) a listener waits for optimization to stop in a single call.
+_LISTEN_TIMEOUT = 1.0
 
 
 class WorkerInterrupted(Exception):
@@ -43,7 +63,6 @@ class WorkerInterrupted(Exception):
 
 
 class _TaskState(IntEnum):
-    WAITING = 0
     RUNNING = 1
     FINISHED = 2
 
@@ -52,33 +71,135 @@ class _TaskState(IntEnum):
 class _TaskContext:
     trial: DistributedTrial
     stop_flag: str
-    state_id: str
+    task_states: Actor
+    trial_timeout: float | None = None
 
 
-class _StateSynchronizer:
+class _TaskStates:
+    """Keeps states of tasks of a single optimization.
+
+    Lives on one of the workers as a Dask actor, so that each request updates states
+    of tasks atomically under a local lock, and states of all tasks are read with a single
+    call. Once closed, no task is allowed to start. Actor is deleted by Dask when neither
+    the client nor any of the tasks refer to it anymore.
+    """
+
     def __init__(self) -> None:
-        self._optimization_enabled = Variable()
-        self._optimization_enabled.set(True)
-        self._task_states: list[Variable] = []
+        self._lock = threading.Lock()
+        self._states: dict[int, _TaskState] | None = {}
+
+    def get(self) -> dict[int, _TaskState] | None:
+        with self._lock:
+            return None if self._states is None else dict(self._states)
+
+    def start(self, trial_id: int) -> bool:
+        with self._lock:
+            if self._states is None or trial_id in self._states:
+                return False
+            self._states[trial_id] = _TaskState.RUNNING
+            return True
+
+    def finish(self, trial_id: int) -> None:
+        with self._lock:
+            if self._states is not None:
+                self._states[trial_id] = _TaskState.FINISHED
+
+    def skip(self, trial_ids: list[int]) -> list[int]:
+        with self._lock:
+            if self._states is None:
+                return []
+            skipped = [trial_id for trial_id in trial_ids if trial_id not in self._states]
+            self._states.update((trial_id, _TaskState.FINISHED) for trial_id in skipped)
+            return skipped
+
+    def remove(self, trial_ids: list[int]) -> None:
+        with self._lock:
+            if self._states is None:
+                return
+            for trial_id in trial_ids:
+                self._states.pop(trial_id, None)
+
+    def close(self) -> None:
+        with self._lock:
+            self._states = None
+
+
+class _StateSynchronizer:
+    """Shares state of optimization and its tasks with workers.
+
+    States of tasks are kept by an actor, which updates each of them atomically.
+    Tasks are added once they start and removed some time after their trials exit, so that
+    only tasks which are running or have recently finished are kept. Tasks which are not
+    there did not start yet. Each task is started at most once, even if Dask runs it again,
+    e.g. after a worker failure.
+    """
+
+    def __init__(self, client: Client) -> None:
+        self._optimization_stopped = Event(client=client)
+        self._task_states: Actor | None = client.submit(
+            _TaskStates, actor=True, pure=False
+        ).result()
+        self._lock = threading.Lock()
+        self._exited: list[int] = []
+        self._closed = False
 
     @property
     def stop_flag(self) -> str:
-        return self._optimization_enabled.name
+        return self._optimization_stopped.name
 
-    def set_initial_state(self) -> str:
-        task_state = Variable()
-        task_state.set(_TaskState.WAITING)
-        self._task_states.append(task_state)
-        return task_state.name
+    @property
+    def task_states(self) -> Actor:
+        assert self._task_states is not None
+        return self._task_states
 
     def emit_stop_and_wait(self, patience: float) -> None:
-        self._optimization_enabled.set(False)
+        self._optimization_stopped.set()
         disabled_at = time.time()
-        while any(_TaskState(state.get()) is _TaskState.RUNNING for state in self._task_states):
+        while _TaskState.RUNNING in self._get_task_states().values():
             if time.time() - disabled_at > patience:
                 raise TimeoutError("Timed out while trying to interrupt running tasks.")
             time.sleep(0.1)
 
+    def _get_task_states(self) -> dict[int, _TaskState]:
+        with self._lock:
+            # Shared state is released once optimization is over.
+            if self._task_states is None:
+                return {}
+            return self._task_states.get().result() or {}
+
+    def skip_waiting(self, trial_ids: Iterable[int]) -> list[int]:
+        """Marks tasks which did not start yet as finished, so that they never start.
+
+        Returns ids of trials whose tasks were skipped.
+        """
+        with self._lock:
+            if self._closed:
+                return []
+            return self.task_states.skip(list(trial_ids)).result()
+
+    def register_exit(self, trial_id: int) -> None:
+        """Schedules removal of a task from shared state once its trial exits."""
+        with self._lock:
+            if self._closed:
+                return
+            self._exited.append(trial_id)
+            if len(self._exited) < _MAX_EXITED_TASKS:
+                return
+
+            exited, self._exited = self._exited, []
+            self.task_states.remove(exited).result()
+
+    def close(self) -> None:
+        """Releases shared state, so that no more tasks are started."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self.task_states.close().result()
+                # Actor is deleted once tasks holding a reference to it are gone too.
+                self._task_states = None
+                # Events are deleted by the scheduler once they are cleared.
+                self._optimization_stopped.clear()
+
 
 class DistributedOptimizationManager(OptimizationManager):
     """Controls optimization process spanning multiple physical machines.
@@ -89,48 +210,134 @@ class DistributedOptimizationManager(OptimizationManager):
         client:
             An instance of dask client.
         n_trials:
-            Number of trials to run.
+            Number of trials to run. If :obj:`None`, trials are run until optimization
+            is stopped or times out.
         heartbeat_interval:
             Delay (in seconds) before
             :func:`optuna_distributed.managers.DistributedOptimizationManager.get_message`
             produces a heartbeat message if no other message is sent by the worker.
+        message_buffer_size:
+            Maximum number of reports and attribute writes buffered by a trial before
+            they are sent to the study in a single batch. Buffering is disabled by default.
+        message_buffer_timeout:
+            Time (in seconds) after which buffered messages are considered stale and flushed.
+            There is no timer, so stale messages are held back until the trial buffers
+            another one, sends a request waiting for response or exits.
+        trial_timeout:
+            Time (in seconds) after which a running trial is interrupted and failed, without
+            stopping the optimization. Time spent by a task waiting for a free worker is not
+            counted. Objective function is interrupted between Python instructions, so
+            a long blocking call, e.g. to a C extension, delays it until the call returns.
+            If :obj:`None`, trials can run for any amount of time.
+        transport:
+            Communication channel between workers and the client. With ``"queue"``, messages
+            are passed through Dask queues hosted on the scheduler. With ``"pubsub"``, messages
+            are pushed to recipients with Dask Pub/Sub, which is not available in
+            distributed 2025.5.0 and newer. With ``"stream"``, each trial opens a direct TCP
+            connection to the client, and scheduler is bypassed. The latter requires workers
+            to be able to reach client machine over network.
+        max_concurrent_trials:
+            Maximum number of trials dispatched to the cluster at the same time. Each trial
+            is created only when it is dispatched, so that sampler can learn from trials
+            finished so far. If :obj:`None` and number of trials is finite, all trials are
+            created and dispatched upfront. Otherwise, defaults to the number of worker
+            threads in the cluster.
     """
 
-    def __init__(self, client: Client, n_trials: int, heartbeat_interval: int = 60) -> None:
+    def __init__(
+        self,
+        client: Client,
+        n_trials: int | None,
+        heartbeat_interval: int = 60,
+        message_buffer_size: int = 0,
+        message_buffer_timeout: float = 1.0,
+        transport: Transport = "queue",
+        trial_timeout: float | None = None,
+        max_concurrent_trials: int | None = None,
+    ) -> None:
+        if trial_timeout is not None and trial_timeout <= 0:
+            raise ValueError("Trial timeout has to be positive.")
+
+        if max_concurrent_trials is not None and max_concurrent_trials <= 0:
+            raise ValueError("At least one trial has to be allowed to run at a time.")
+
+        if n_trials is None and max_concurrent_trials is None:
+            max_concurrent_trials = max(sum(client.nthreads().values()), 1)
+
+        super().__init__()
         self._client = client
         self._n_trials = n_trials
-        self._completed_trials = 0
-        self._public_channel = str(uuid.uuid4())
-        self._synchronizer = _StateSynchronizer()
-
-        # Manager has write access to its own message queue as a sort of health check.
+        self._max_concurrent_trials = max_concurrent_trials
+        self._dispatched_trials = 0
+        self._message_buffer_size = message_buffer_size
+        self._message_buffer_timeout = message_buffer_timeout
+        self._trial_timeout = trial_timeout
+        self._dispatching = True
+        self._synchronizer = _StateSynchronizer(client)
+
+        # Manager has write access to its own message stream as a sort of health check.
         # Basically that means we can pump event loop from callbacks running in
         # main process with e.g. HeartbeatMessage.
-        self._message_queue = Queue(
-            publishing=self._public_channel,
-            recieving=self._public_channel,
-            timeout=heartbeat_interval,
-        )
-        self._private_channels: dict[int, str] = {}
-        self._futures: list[Future] = []
+        self._server: IPCServer
+        if transport == "queue":
+            self._server = QueueServer(timeout=heartbeat_interval)
+        elif transport == "pubsub":
+            self._server = PubSubServer(timeout=heartbeat_interval)
+        elif transport == "stream":
+            self._server = StreamServer(timeout=heartbeat_interval)
+        else:
+            raise ValueError(f"Unknown transport {transport}.")
+
+        # Tasks of trials which did not exit yet, by trial id.
+        self._futures: dict[int, Future] = {}
+        self._trial_ids: dict[Hashable, int] = {}
+        self._done_futures: deque[Future] = deque()
+        self._trials = TrialCache()
 
     def _ensure_safe_exit(self, future: Future) -> None:
+        # Called from a thread owned by Dask, so the task is only queued here,
+        # and its exit is registered by the event loop in `after_message`.
+        self._done_futures.append(future)
         if future.status in ["error", "cancelled"]:
-            # FIXME: I'm not sure if there is a way to get
-            # id of a trial that failed this way.
-            self.register_trial_exit(-1)
-            self._message_queue.put(HeartbeatMessage())
-
-    def _assign_private_channel(self, trial_id: int) -> "Queue":
-        private_channel = str(uuid.uuid4())
-        self._private_channels[trial_id] = private_channel
-        return Queue(self._public_channel, private_channel, max_retries=5)
-
-    def _create_trials(self, study: Study) -> list[DistributedTrial]:
-        # HACK: It's kinda naughty to access _trial_id, but this is gonna make
-        # our lifes much easier in messaging system.
-        trial_ids = [study.ask()._trial_id for _ in range(self._n_trials)]
-        return [DistributedTrial(tid, self._assign_private_channel(tid)) for tid in trial_ids]
+            self._server.put(HeartbeatMessage())
+
+    def _register_done_futures(self) -> None:
+        while self._done_futures:
+            future = self._done_futures.popleft()
+            trial_id = self._trial_ids.pop(future.key)
+            if future.status in ["error", "cancelled"]:
+                self.register_trial_exit(trial_id)
+
+    def _trials_to_dispatch(self) -> int:
+        if not self._dispatching:
+            return 0
+
+        remaining = None
+        if self._n_trials is not None:
+            remaining = self._n_trials - self._dispatched_trials
+
+        if self._max_concurrent_trials is None:
+            assert remaining is not None
+            return remaining
+
+        free = self._max_concurrent_trials - len(self._futures)
+        return free if remaining is None else min(free, remaining)
+
+    def _create_trials(self, study: Study, n_trials: int) -> list[DistributedTrial]:
+        # Trial objects run sampler hooks and infer relative search space when created.
+        # They are created on first message from a trial, instead of upfront with ask,
+        # so that sampling accounts for trials finished in the meantime.
+        frozen_trials = [_create_trial(study) for _ in range(n_trials)]
+        return [
+            DistributedTrial(
+                frozen_trial._trial_id,
+                self._server.assign(frozen_trial._trial_id),
+                self._message_buffer_size,
+                self._message_buffer_timeout,
+                frozen_trial=frozen_trial,
+            )
+            for frozen_trial in frozen_trials
+        ]
 
     def _add_task_context(self, trials: list[DistributedTrial]) -> list[_TaskContext]:
         trials_with_context: list[_TaskContext] = []
@@ -139,17 +346,26 @@ class DistributedOptimizationManager(OptimizationManager):
                 _TaskContext(
                     trial,
                     stop_flag=self._synchronizer.stop_flag,
-                    state_id=self._synchronizer.set_initial_state(),
+                    task_states=self._synchronizer.task_states,
+                    trial_timeout=self._trial_timeout,
                 )
             )
 
         return trials_with_context
 
     def create_futures(self, study: Study, objective: ObjectiveFuncType) -> None:
+        n_trials = self._trials_to_dispatch()
+        if n_trials <= 0:
+            return
+
         distributable = _distributable(objective)
-        trials = self._add_task_context(self._create_trials(study))
-        self._futures = self._client.map(distributable, trials, pure=False)
-        for future in self._futures:
+        contexts = self._add_task_context(self._create_trials(study, n_trials))
+        futures = self._client.map(distributable, contexts, pure=False)
+        self._dispatched_trials += n_trials
+        for future, context in zip(futures, contexts):
+            trial_id = context.trial.trial_id
+            self._futures[trial_id] = future
+            self._trial_ids[future.key] = trial_id
             future.add_done_callback(self._ensure_safe_exit)
 
     def get_message(self) -> Generator[Message, None, None]:
@@ -158,44 +374,97 @@ class DistributedOptimizationManager(OptimizationManager):
                 # TODO(xadrianzetx) At some point we might need a mechanism
                 # that allows workers to repeat messages to master.
                 # A deduplication algorithm would go here then.
-                yield self._message_queue.get()
+                messages = self._server.get_batch()
 
             except asyncio.TimeoutError:
                 # Pumping event loop with heartbeat messages on timeout
                 # allows us to handle potential problems gracefully
                 # e.g. in `after_message`.
                 yield HeartbeatMessage()
+                continue
+
+            # Messages which have arrived together are ordered by priority.
+            yield from prioritize(messages)
 
     def after_message(self, event_loop: "EventLoop") -> None:
-        ...
+        self._register_done_futures()
+        # Trials are created as others finish, when number of concurrent trials is limited.
+        self.create_futures(event_loop.study, event_loop.objective)
 
     def get_connection(self, trial_id: int) -> IPCPrimitive:
-        return Queue(self._private_channels[trial_id])
+        return self._server.get_connection(trial_id)
+
+    def get_trial(self, study: Study, trial_id: int) -> Trial:
+        return self._trials.get(study, trial_id)
 
     def stop_optimization(self, patience: float) -> None:
-        self._client.cancel(self._futures)
-        self._synchronizer.emit_stop_and_wait(patience)
+        self._dispatching = False
+        self._client.cancel(list(self._futures.values()))
+        self._trials.clear()
+        try:
+            self._synchronizer.emit_stop_and_wait(patience)
+        finally:
+            self._server.close()
+            self._synchronizer.close()
+
+    def stop_dispatching(self, study: Study) -> None:
+        if not self._dispatching:
+            return
+
+        self._dispatching = False
+        # Tasks check their state before starting, so these are skipped
+        # even if scheduler has already sent them to workers.
+        skipped = self._synchronizer.skip_waiting(list(self._futures))
+        self._client.cancel([self._futures[trial_id] for trial_id in skipped])
+        for trial_id in skipped:
+            self.register_trial_exit(trial_id)
+        fail_trials(study._storage, skipped)
 
     def should_end_optimization(self) -> bool:
-        return self._completed_trials == self._n_trials
+        return not self._futures and self._trials_to_dispatch() == 0
 
     def register_trial_exit(self, trial_id: int) -> None:
-        self._completed_trials += 1
+        # Exit of a trial can be registered more than once, e.g. if its task got cancelled.
+        self._trials.evict(trial_id)
+        if self._futures.pop(trial_id, None) is None:
+            return
+
+        self._server.release(trial_id)
+        self._synchronizer.register_exit(trial_id)
+        if self.should_end_optimization():
+            self._server.close()
+            self._synchronizer.close()
+
+
+def _create_trial(study: Study) -> FrozenTrial:
+    # Same as Study.ask, only without creating a trial object.
+    trial_id = study._pop_waiting_trial_id()
+    if trial_id is None:
+        trial_id = study._storage.create_new_trial(study._study_id)
+    return study._storage.get_trial(trial_id)
 
 
 def _distributable(func: ObjectiveFuncType) -> DistributableWithContext:
     def _wrapper(context: _TaskContext) -> None:
-        task_state = Variable(context.state_id)
-        if _TaskState(task_state.get()) is not _TaskState.WAITING:
+        trial_id = context.trial.trial_id
+        if not context.task_states.start(trial_id).result():
             return
 
-        task_state.set(_TaskState.RUNNING)
         message: Message
 
         try:
-            args = (threading.get_ident(), context)
-            Thread(target=_task_supervisor, args=args, daemon=True).start()
-            value_or_values = func(context.trial)
+            try:
+                _InterruptListener.register(context)
+                try:
+                    value_or_values = func(context.trial)
+                finally:
+                    # Trial is not interrupted anymore once objective function is done,
+                    # so that it's never reported as timed out after it has finished.
+                    _InterruptListener.unregister(context)
+            finally:
+                # Buffered messages have to reach the study before trial exits.
+                context.trial.flush()
+
             message = CompletedMessage(context.trial.trial_id, value_or_values)
             context.trial.connection.put(message)
 
@@ -203,6 +472,11 @@ def _distributable(func: ObjectiveFuncType) -> DistributableWithContext:
             message = PrunedMessage(context.trial.trial_id, e)
             context.trial.connection.put(message)
 
+        except TrialTimedOut:
+            assert context.trial_timeout is not None
+            message = TimedOutMessage(context.trial.trial_id, context.trial_timeout)
+            context.trial.connection.put(message)
+
         except WorkerInterrupted:
             ...
 
@@ -213,23 +487,89 @@ def _distributable(func: ObjectiveFuncType) -> DistributableWithContext:
 
         finally:
             context.trial.connection.close()
-            task_state.set(_TaskState.FINISHED)
+            context.task_states.finish(trial_id).result()
 
     return _wrapper
 
 
-def _task_supervisor(thread_id: int, context: _TaskContext) -> None:
-    optimization_enabled = Variable(context.stop_flag)
-    task_state = Variable(context.state_id)
-    while True:
-        time.sleep(0.1)
-        if _TaskState(task_state.get()) is _TaskState.FINISHED:
-            break
+class _InterruptListener:
+    """Delivers interrupts to tasks running in a worker process.
 
-        if not optimization_enabled.get():
-            # https://gist.github.com/liuw/2407154
-            # https://distributed.dask.org/en/stable/worker-state.html#task-cancellation
-            ctypes.pythonapi.PyThreadState_SetAsyncExc(
-                ctypes.c_long(thread_id), ctypes.py_object(WorkerInterrupted)
-            )
-            break
+    A single thread per process waits for optimization to be stopped and then interrupts
+    all tasks running there, so that tasks do not have to poll the scheduler themselves.
+    Tasks running longer than allowed are interrupted by the same thread. Listener exits
+    once there are no tasks to watch, and is started again with the next one.
+
+    Args:
+        stop_flag:
+            Name of Dask event set when optimization is stopped.
+    """
+
+    def __init__(self, stop_flag: str) -> None:
+        self._stop_flag = stop_flag
+        # Deadlines of running tasks, by ids of threads running them.
+        self._tasks: dict[int, float | None] = {}
+
+    @staticmethod
+    def register(context: _TaskContext) -> None:
+        deadline = None
+        if context.trial_timeout is not None:
+            deadline = time.monotonic() + context.trial_timeout
+
+        with _listeners_lock:
+            listener = _listeners.get(context.stop_flag)
+            if listener is None:
+                listener = _listeners[context.stop_flag] = _InterruptListener(context.stop_flag)
+                Thread(target=listener._listen, daemon=True).start()
+            listener._tasks[threading.get_ident()] = deadline
+
+    @staticmethod
+    def unregister(context: _TaskContext) -> None:
+        thread_id = threading.get_ident()
+        with _listeners_lock:
+            listener = _listeners.get(context.stop_flag)
+            if listener is not None:
+                listener._tasks.pop(thread_id, None)
+            # Interrupt sent right before task was unregistered is still pending,
+            # and would be raised later on, e.g. while task reports its result.
+            _cancel_interrupt(thread_id)
+
+    def _listen(self) -> None:
+        optimization_stopped = Event(self._stop_flag)
+        while True:
+            with _listeners_lock:
+                if not self._tasks:
+                    del _listeners[self._stop_flag]
+                    return
+
+                now = time.monotonic()
+                for thread_id, deadline in list(self._tasks.items()):
+                    if deadline is not None and deadline <= now:
+                        del self._tasks[thread_id]
+                        _interrupt(thread_id, TrialTimedOut)
+
+                deadlines = [d for d in self._tasks.values() if d is not None]
+                timeout = min([_LISTEN_TIMEOUT, *(deadline - now for deadline in deadlines)])
+
+            if optimization_stopped.wait(max(timeout, 0.0)):
+                with _listeners_lock:
+                    # https://distributed.dask.org/en/stable/worker-state.html#task-cancellation
+                    for thread_id in self._tasks:
+                        _interrupt(thread_id, WorkerInterrupted)
+                    self._tasks.clear()
+
+
+def _interrupt(thread_id: int, exception: type[BaseException]) -> None:
+    # https://gist.github.com/liuw/2407154
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_long(thread_id), ctypes.py_object(exception)
+    )
+
+
+def _cancel_interrupt(thread_id: int) -> None:
+    # Passing NULL instead of an exception clears one pending for the thread.
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_long(thread_id), None)
+
+
+_listeners: dict[str, _InterruptListener] = {}
+_listeners_lock = threading.Lock()
@@ -1,26 +1,40 @@
 from __future__ import annotations
 
+import asyncio
+from collections.abc import AsyncGenerator
 from collections.abc import Generator
+from collections.abc import Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
 import multiprocessing
-from multiprocessing import Pipe as MultiprocessingPipe
-from multiprocessing import Process
 from multiprocessing.connection import Connection
 from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+import signal
 import sys
+import time
+from types import FrameType
 from typing import TYPE_CHECKING
 
 from optuna import Study
 from optuna.exceptions import TrialPruned
+from optuna.trial import Trial
 
 from optuna_distributed.ipc import IPCPrimitive
 from optuna_distributed.ipc import Pipe
+from optuna_distributed.ipc import SharedMemoryPipe
 from optuna_distributed.managers import ObjectiveFuncType
 from optuna_distributed.managers import OptimizationManager
+from optuna_distributed.managers.base import TrialCache
+from optuna_distributed.managers.base import TrialTimedOut
+from optuna_distributed.managers.base import prioritize
 from optuna_distributed.messages import CompletedMessage
 from optuna_distributed.messages import FailedMessage
 from optuna_distributed.messages import HeartbeatMessage
 from optuna_distributed.messages import Message
 from optuna_distributed.messages import PrunedMessage
+from optuna_distributed.messages import ResponseMessage
+from optuna_distributed.messages import TimedOutMessage
 from optuna_distributed.trial import DistributedTrial
 
 
@@ -28,73 +42,300 @@ if TYPE_CHECKING:
     from optuna_distributed.eventloop import EventLoop
 
 
+# Assignment telling worker process to exit.
+_SHUTDOWN = ResponseMessage(-1, data=None)
+# Time (in seconds) to wait for retired worker process to exit before it's killed.
+_SHUTDOWN_TIMEOUT = 5.0
+
+
+@dataclass
+class _Worker:
+    process: BaseProcess
+    connection: Connection
+    channel: IPCPrimitive
+    trials_run: int = 0
+    timed_out: bool = False
+
+
 class LocalOptimizationManager(OptimizationManager):
     """Controls optimization process on local machine.
 
     In contrast to Optuna, this implementation uses process based parallelism.
+    Trials are dispatched to a pool of worker processes, each of which can evaluate
+    many trials in sequence before being replaced with a fresh one.
 
     Args:
         n_trials:
-            Number of trials to run.
+            Number of trials to run. If :obj:`None`, trials are run until optimization
+            is stopped or times out.
         n_jobs:
             Maximum number of processes allowed to run trials at the same time.
             If less or equal to 0, then this argument is overridden with CPU count.
+        max_trials_per_worker:
+            Number of trials a worker process evaluates before it is recycled. Defaults to
+            one, so that every trial runs in a fresh process. If :obj:`None`, workers are
+            kept alive for the whole optimization.
+        max_worker_memory:
+            Resident memory size (in bytes) above which worker process is recycled after
+            finishing a trial. If :obj:`None`, memory usage of workers is not checked.
+        start_method:
+            Method used to start worker processes. One of ``"fork"``, ``"forkserver"`` or
+            ``"spawn"``. If :obj:`None`, platform default is used. See
+            https://docs.python.org/3/library/multiprocessing.html#contexts-and-start-methods
+        preload_modules:
+            Names of modules imported by the fork server process, so that workers forked
+            from it start with these already loaded. Only valid with ``"forkserver"``
+            start method.
+        message_buffer_size:
+            Maximum number of reports and attribute writes buffered by a trial before
+            they are sent to the study in a single batch. Buffering is disabled by default.
+        message_buffer_timeout:
+            Time (in seconds) after which buffered messages are considered stale and flushed.
+            There is no timer, so stale messages are held back until the trial buffers
+            another one, sends a request waiting for response or exits.
+        shared_memory_size:
+            Size (in bytes) of shared memory ring buffers used to pass messages to and from
+            each worker process. Pipes are used only to wake up the other side, and to carry
+            messages too large to fit in the ring buffer. If :obj:`None`, all messages are
+            sent over pipes.
+        trial_timeout:
+            Time (in seconds) after which a running trial is interrupted and failed, without
+            stopping the optimization. Worker process running such trial is always replaced
+            with a fresh one. If :obj:`None`, trials can run for any amount of time.
     """
 
-    def __init__(self, n_trials: int, n_jobs: int) -> None:
+    def __init__(
+        self,
+        n_trials: int | None,
+        n_jobs: int,
+        max_trials_per_worker: int | None = 1,
+        max_worker_memory: int | None = None,
+        start_method: str | None = None,
+        preload_modules: Sequence[str] | None = None,
+        message_buffer_size: int = 0,
+        message_buffer_timeout: float = 1.0,
+        shared_memory_size: int | None = None,
+        trial_timeout: float | None = None,
+    ) -> None:
+        super().__init__()
         if n_jobs <= 0 or n_jobs > multiprocessing.cpu_count():
             self._n_jobs = multiprocessing.cpu_count()
         else:
             self._n_jobs = n_jobs
 
-        self._workers_to_spawn = min(self._n_jobs, n_trials)
-        self._trials_remaining = n_trials - self._workers_to_spawn
+        if max_trials_per_worker is not None and max_trials_per_worker <= 0:
+            raise ValueError("Workers have to be allowed to run at least one trial.")
+
+        if preload_modules is not None and start_method != "forkserver":
+            raise ValueError("Modules can be preloaded only with 'forkserver' start method.")
+
+        if shared_memory_size is not None and shared_memory_size <= 0:
+            raise ValueError("Shared memory size has to be positive.")
+
+        if trial_timeout is not None and trial_timeout <= 0:
+            raise ValueError("Trial timeout has to be positive.")
+
+        self._context = multiprocessing.get_context(start_method)
+        if preload_modules is not None:
+            self._context.set_forkserver_preload(list(preload_modules))
+
+        self._max_trials_per_worker = max_trials_per_worker
+        self._message_buffer_size = message_buffer_size
+        self._message_buffer_timeout = message_buffer_timeout
+        self._max_worker_memory = max_worker_memory
+        self._shared_memory_size = shared_memory_size
+        self._trial_timeout = trial_timeout
+        self._heartbeat_interval = 10.0
+        self._pool_changed: asyncio.Future[None] | None = None
+        self._trials = TrialCache()
+        # Number of trials left to dispatch is not tracked in streaming mode.
+        self._workers_to_spawn = self._n_jobs if n_trials is None else min(self._n_jobs, n_trials)
+        self._trials_remaining = None if n_trials is None else n_trials - self._workers_to_spawn
         self._pool: dict[int, Connection] = {}
-        self._processes: list[Process] = []
+        self._processes: list[BaseProcess] = []
+        # Processes of retired workers which were not joined yet, with time of retirement.
+        self._retired: list[tuple[BaseProcess, float]] = []
+        self._running: dict[int, _Worker] = {}
+        self._idle: list[_Worker] = []
+
+    def _spawn_worker(self, objective: ObjectiveFuncType) -> _Worker:
+        master, worker = self._context.Pipe()
+        channel: IPCPrimitive
+        worker_channel: IPCPrimitive
+        if self._shared_memory_size is not None:
+            memory = SharedMemoryPipe.allocate(self._shared_memory_size)
+            channel = SharedMemoryPipe(master, memory, self._shared_memory_size, master=True)
+            worker_channel = SharedMemoryPipe(
+                worker, memory, self._shared_memory_size, master=False
+            )
+        else:
+            channel, worker_channel = Pipe(master), Pipe(worker)
+
+        args = (
+            objective,
+            worker_channel,
+            self._message_buffer_size,
+            self._message_buffer_timeout,
+            self._trial_timeout,
+        )
+        p = self._context.Process(  # type: ignore[attr-defined]
+            target=_worker_runtime, args=args, daemon=True
+        )
+        p.start()
+        self._processes.append(p)
+        worker.close()
+        return _Worker(p, master, channel)
+
+    def _should_recycle(self, worker: _Worker) -> bool:
+        if self._max_trials_per_worker is not None:
+            if worker.trials_run >= self._max_trials_per_worker:
+                return True
+
+        if self._max_worker_memory is not None:
+            # Imported only when needed, since memory of workers is not checked by default.
+            import psutil
+
+            try:
+                rss = psutil.Process(worker.process.pid).memory_info().rss
+            except psutil.NoSuchProcess:
+                return True
+            return rss > self._max_worker_memory
+
+        return False
+
+    def _retire_worker(self, worker: _Worker) -> None:
+        # Workers forked later inherit master ends of earlier pipes, so closing
+        # the pipe is not enough for worker to see it's no longer needed.
+        try:
+            worker.channel.put(_SHUTDOWN)
+        except OSError:
+            # Worker is already gone.
+            pass
+        worker.channel.close()
+        # Worker is not waited for here, as that would hold up messages from other trials.
+        self._retired.append((worker.process, time.monotonic()))
+
+    def _reap_workers(self, block: bool = False) -> None:
+        retired: list[tuple[BaseProcess, float]] = []
+        for process, retired_at in self._retired:
+            remaining = retired_at + _SHUTDOWN_TIMEOUT - time.monotonic()
+            process.join(timeout=max(remaining, 0.0) if block else 0.0)
+            if process.is_alive():
+                if remaining > 0.0 and not block:
+                    retired.append((process, retired_at))
+                    continue
+                process.kill()
+                process.join()
+            self._processes.remove(process)
+        self._retired = retired
+
+    def _retire_idle_workers(self) -> None:
+        for worker in self._idle:
+            self._retire_worker(worker)
+        self._idle.clear()
 
     def create_futures(self, study: Study, objective: ObjectiveFuncType) -> None:
-        trial_ids = [study.ask()._trial_id for _ in range(self._workers_to_spawn)]
-        for trial_id in trial_ids:
-            master, worker = MultiprocessingPipe()
-            trial = DistributedTrial(trial_id, Pipe(worker))
-            p = Process(target=_trial_runtime, args=(objective, trial), daemon=True)
-            p.start()
-            self._processes.append(p)
-            self._pool[trial_id] = master
-            worker.close()
+        trials = [self._trials.add(study.ask()) for _ in range(self._workers_to_spawn)]
+        for trial in trials:
+            trial_id = trial._trial_id
+            worker = self._idle.pop() if self._idle else self._spawn_worker(objective)
+            frozen_trial = trial._cached_frozen_trial
+            worker.channel.put(ResponseMessage(trial_id, data=frozen_trial))
+            self._running[trial_id] = worker
+            self._pool[trial_id] = worker.connection
+        self._notify_pool_changed()
+
+    def _receive(self, timeout: float) -> list[Message]:
+        messages: list[Message] = []
+        owners = {connection: trial_id for trial_id, connection in self._pool.items()}
+        for incoming in wait(self._pool.values(), timeout=timeout):
+            # FIXME: This assertion is true only for Unix systems.
+            # Some refactoring is needed to support Windows as well.
+            # https://docs.python.org/3/library/multiprocessing.html#multiprocessing.connection.wait
+            assert isinstance(incoming, Connection)
+            trial_id = owners[incoming]
+            worker = self._running[trial_id]
+            try:
+                # Everything worker has sent so far is drained,
+                # so that messages can be ordered by priority.
+                messages.append(worker.channel.get())
+                while incoming.poll():
+                    messages.append(worker.channel.get())
+                if isinstance(messages[-1], TimedOutMessage):
+                    # Worker quits after trial timed out, so it can't be reused.
+                    worker.timed_out = True
+
+            except EOFError:
+                if worker.timed_out:
+                    # Worker quit after reporting timeout. It's retired once
+                    # its messages are processed and trial exits.
+                    continue
+
+                # Worker died while running a trial.
+                self._pool.pop(trial_id)
+                self._retire_worker(self._running.pop(trial_id))
+
+        return prioritize(messages)
 
     def get_message(self) -> Generator[Message, None, None]:
         while True:
-            messages: list[Message] = []
-            for incoming in wait(self._pool.values(), timeout=10):
-                # FIXME: This assertion is true only for Unix systems.
-                # Some refactoring is needed to support Windows as well.
-                # https://docs.python.org/3/library/multiprocessing.html#multiprocessing.connection.wait
-                assert isinstance(incoming, Connection)
-                try:
-                    message = incoming.recv()
-                    messages.append(message)
-
-                except EOFError:
-                    for trial_id, connection in self._pool.items():
-                        if incoming == connection:
-                            break
-                    self._pool.pop(trial_id)
-
-            self._workers_to_spawn = min(self._n_jobs - len(self._pool), self._trials_remaining)
+            messages = self._receive(timeout=self._heartbeat_interval)
             if messages:
                 yield from messages
             else:
                 yield HeartbeatMessage()
 
+    async def get_message_async(self) -> AsyncGenerator[Message, None]:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Event loop watches worker pipes, so that it's free to run timers
+            # and other tasks until one of the workers sends something. Waiting
+            # starts over when workers are added or removed in the meantime.
+            readable = loop.create_future()
+            self._pool_changed = readable
+            descriptors = [connection.fileno() for connection in self._pool.values()]
+            for descriptor in descriptors:
+                loop.add_reader(descriptor, _resolve, readable)
+
+            timed_out = False
+            try:
+                await asyncio.wait_for(readable, timeout=self._heartbeat_interval)
+            except asyncio.TimeoutError:
+                timed_out = True
+            finally:
+                self._pool_changed = None
+                for descriptor in descriptors:
+                    loop.remove_reader(descriptor)
+
+            for message in self._receive(timeout=0):
+                timed_out = False
+                yield message
+
+            if timed_out:
+                yield HeartbeatMessage()
+
     def after_message(self, event_loop: "EventLoop") -> None:
+        self._workers_to_spawn = self._n_jobs - len(self._pool)
+        if self._trials_remaining is not None:
+            self._workers_to_spawn = min(self._workers_to_spawn, self._trials_remaining)
+
         if self._workers_to_spawn > 0:
             self.create_futures(event_loop.study, event_loop.objective)
-            self._trials_remaining -= self._workers_to_spawn
+            if self._trials_remaining is not None:
+                self._trials_remaining -= self._workers_to_spawn
             self._workers_to_spawn = 0
 
+        if self._trials_remaining == 0:
+            self._retire_idle_workers()
+
+        # Retired workers are waited for only once optimization is about to end.
+        self._reap_workers(block=self.should_end_optimization())
+
     def get_connection(self, trial_id: int) -> IPCPrimitive:
-        return Pipe(self._pool[trial_id])
+        return self._running[trial_id].channel
+
+    def get_trial(self, study: Study, trial_id: int) -> Trial:
+        return self._trials.get(study, trial_id)
 
     def stop_optimization(self, patience: float) -> None:
         for process in self._processes:
@@ -102,18 +343,156 @@ class LocalOptimizationManager(OptimizationManager):
                 process.kill()
                 process.join(timeout=patience)
 
+        for worker in [*self._running.values(), *self._idle]:
+            worker.channel.close()
+        self._retired.clear()
+        self._running.clear()
+        self._idle.clear()
+        self._trials.clear()
+
+    def stop_dispatching(self, study: Study) -> None:
+        # Trials are created only when dispatched, so there is nothing to clean up.
+        self._workers_to_spawn = 0
+        self._trials_remaining = 0
+
     def should_end_optimization(self) -> bool:
         return len(self._pool) == 0 and self._trials_remaining == 0
 
+    def _notify_pool_changed(self) -> None:
+        if self._pool_changed is not None:
+            _resolve(self._pool_changed)
+
     def register_trial_exit(self, trial_id: int) -> None:
-        # Noop, as worker informs us about exit by closing connection.
-        ...
+        self._trials.evict(trial_id)
+        self._pool.pop(trial_id, None)
+        self._notify_pool_changed()
+        worker = self._running.pop(trial_id, None)
+        if worker is None:
+            return
+
+        worker.trials_run += 1
+        if worker.timed_out or self._should_recycle(worker):
+            self._retire_worker(worker)
+        else:
+            self._idle.append(worker)
+
+
+def _resolve(future: asyncio.Future[None]) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _worker_runtime(
+    func: ObjectiveFuncType,
+    connection: IPCPrimitive,
+    buffer_size: int,
+    buffer_timeout: float,
+    trial_timeout: float | None,
+) -> None:
+    if trial_timeout is not None:
+        connection = _AlarmDeferringChannel(connection)
+
+    try:
+        while True:
+            try:
+                assignment = connection.get()
+            except EOFError:
+                # Master is gone.
+                break
+
+            assert isinstance(assignment, ResponseMessage)
+            if assignment.trial_id == _SHUTDOWN.trial_id:
+                break
+
+            trial = DistributedTrial(
+                assignment.trial_id,
+                connection,
+                buffer_size,
+                buffer_timeout,
+                frozen_trial=assignment.data,
+            )
+            if isinstance(_trial_runtime(func, trial, trial_timeout), TimedOutMessage):
+                # Trial could have been interrupted anywhere, so worker is not reused.
+                break
+
+    finally:
+        connection.close()
+
+
+class _AlarmDeferringChannel(IPCPrimitive):
+    # Trial timeout must not interrupt worker while it's in the middle of exchanging
+    # messages with master. Otherwise, a partially written message, or a late response
+    # read as the next one, would leave the channel in a broken state. Alarm is also held
+    # back between a blocking message and its response, so that worker never quits
+    # while master is still about to respond.
+    def __init__(self, channel: IPCPrimitive) -> None:
+        self._channel = channel
+        self._previous_mask: set[int | signal.Signals] | None = None
 
+    def get(self) -> Message:
+        self._defer()
+        try:
+            return self._channel.get()
+        finally:
+            self._restore()
 
-def _trial_runtime(func: ObjectiveFuncType, trial: DistributedTrial) -> None:
+    def put(self, message: Message) -> None:
+        self._defer()
+        try:
+            self._channel.put(message)
+        except BaseException:
+            self._restore()
+            raise
+
+        if not message.blocking:
+            self._restore()
+
+    def _defer(self) -> None:
+        # Alarm going off in the meantime stays pending, and is delivered once unblocked.
+        if self._previous_mask is None:
+            self._previous_mask = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+
+    def _restore(self) -> None:
+        if self._previous_mask is not None:
+            previous, self._previous_mask = self._previous_mask, None
+            signal.pthread_sigmask(signal.SIG_SETMASK, previous)
+
+    def close(self) -> None:
+        self._channel.close()
+
+
+def _raise_timed_out(signum: int, frame: FrameType | None) -> None:
+    raise TrialTimedOut
+
+
+@contextmanager
+def _deadline(timeout: float | None) -> Generator[None, None, None]:
+    # Alarm interrupts objective function even if it's blocked, e.g. in sleep or I/O.
+    if timeout is None:
+        yield
+        return
+
+    handler = signal.signal(signal.SIGALRM, _raise_timed_out)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, handler)
+
+
+def _trial_runtime(
+    func: ObjectiveFuncType, trial: DistributedTrial, timeout: float | None = None
+) -> Message:
     message: Message
     try:
-        value_or_values = func(trial)
+        try:
+            with _deadline(timeout):
+                value_or_values = func(trial)
+        finally:
+            # Buffered messages have to reach the study before trial exits.
+            trial.flush()
+
         message = CompletedMessage(trial.trial_id, value_or_values)
         trial.connection.put(message)
 
@@ -121,10 +500,14 @@ def _trial_runtime(func: ObjectiveFuncType, trial: DistributedTrial) -> None:
         message = PrunedMessage(trial.trial_id, e)
         trial.connection.put(message)
 
+    except TrialTimedOut:
+        assert timeout is not None
+        message = TimedOutMessage(trial.trial_id, timeout)
+        trial.connection.put(message)
+
     except Exception as e:
         exc_info = sys.exc_info()
         message = FailedMessage(trial.trial_id, e, exc_info)
         trial.connection.put(message)
 
-    finally:
-        trial.connection.close()
+    return message
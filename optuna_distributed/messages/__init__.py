@@ -1,4 +1,5 @@
 from optuna_distributed.messages.base import Message
+from optuna_distributed.messages.batch import BatchMessage
 from optuna_distributed.messages.completed import CompletedMessage
 from optuna_distributed.messages.failed import FailedMessage
 from optuna_distributed.messages.heartbeat import HeartbeatMessage
@@ -10,19 +11,26 @@ from optuna_distributed.messages.response import ResponseMessage
 from optuna_distributed.messages.setattr import AttributeType
 from optuna_distributed.messages.setattr import SetAttributeMessage
 from optuna_distributed.messages.shouldprune import ShouldPruneMessage
+from optuna_distributed.messages.stop import StopMessage
 from optuna_distributed.messages.suggest import SuggestMessage
+from optuna_distributed.messages.suggestall import SuggestAllMessage
+from optuna_distributed.messages.timedout import TimedOutMessage
 
 
 __all__ = [
     "Message",
+    "BatchMessage",
     "HeartbeatMessage",
     "ResponseMessage",
     "SuggestMessage",
+    "SuggestAllMessage",
     "CompletedMessage",
     "FailedMessage",
     "PrunedMessage",
+    "TimedOutMessage",
     "ReportMessage",
     "ShouldPruneMessage",
+    "StopMessage",
     "SetAttributeMessage",
     "AttributeType",
     "TrialPropertyMessage",
@@ -1,5 +1,6 @@
 import abc
 from abc import ABC
+from typing import Optional
 from typing import TYPE_CHECKING
 
 from optuna.study import Study
@@ -15,12 +16,24 @@ class Message(ABC):
     These messages are used to pass data and code between client and workers.
     """
 
+    # Time (as given by `time.perf_counter`) message was queued at in main process.
+    _enqueued_at: Optional[float] = None
+
     @property
     @abc.abstractmethod
     def closing(self) -> bool:
         """Indicates last message generated by particular trial."""
         raise NotImplementedError
 
+    @property
+    def blocking(self) -> bool:
+        """Indicates that worker waits for a response to this message.
+
+        Event loop serves such messages ahead of others, since worker
+        stays idle until they are processed.
+        """
+        return False
+
     @abc.abstractmethod
     def process(self, study: Study, manager: "OptimizationManager") -> None:
         """Process a message data with context available in main process.
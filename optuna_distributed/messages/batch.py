@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from optuna.study import Study
+
+from optuna_distributed.messages.base import Message
+
+
+if TYPE_CHECKING:
+    from optuna_distributed.managers import OptimizationManager
+
+
+class BatchMessage(Message):
+    """A batch of fire-and-forget messages.
+
+    This message is sent by :class:`~optuna_distributed.trial.DistributedTrial` when
+    message buffering is enabled, and carries messages that do not require response
+    from main process, such as reports and attribute writes. All of them are applied
+    in order they were issued by the worker.
+
+    Args:
+        trial_id:
+            Id of a trial to which the message is referring.
+        messages:
+            A list of buffered messages.
+    """
+
+    closing = False
+
+    def __init__(self, trial_id: int, messages: list[Message]) -> None:
+        self._trial_id = trial_id
+        self._messages = messages
+
+    def process(self, study: Study, manager: "OptimizationManager") -> None:
+        for message in self._messages:
+            message.process(study, manager)
@@ -7,7 +7,6 @@ from typing import TYPE_CHECKING
 
 from optuna.study import Study
 from optuna.trial import FrozenTrial
-from optuna.trial import Trial
 from optuna.trial import TrialState
 
 from optuna_distributed.messages import Message
@@ -41,7 +40,7 @@ class CompletedMessage(Message):
         self._value_or_values = value_or_values
 
     def process(self, study: Study, manager: "OptimizationManager") -> None:
-        trial = Trial(study, self._trial_id)
+        trial = manager.get_trial(study, self._trial_id)
         try:
             frozen_trial = study.tell(trial, self._value_or_values, skip_if_finished=True)
 
@@ -70,10 +69,8 @@ class CompletedMessage(Message):
             f"{self._value_or_values} and parameters: {trial.params}."
         )
         if not is_multiobjective:
-            buffer.write(
-                f" Best is trial {study.best_trial.number} "
-                f"with value: {study.best_trial.value}."
-            )
+            best_trial = study.best_trial
+            buffer.write(f" Best is trial {best_trial.number} with value: {best_trial.value}.")
 
         _logger.info(buffer.getvalue())
         buffer.close()
@@ -3,7 +3,6 @@ from typing import Any
 from typing import TYPE_CHECKING
 
 from optuna.study import Study
-from optuna.trial import Trial
 from optuna.trial import TrialState
 
 from optuna_distributed.messages import Message
@@ -41,7 +40,7 @@ class FailedMessage(Message):
         self._exc_info = exc_info
 
     def process(self, study: Study, manager: "OptimizationManager") -> None:
-        trial = Trial(study, self._trial_id)
+        trial = manager.get_trial(study, self._trial_id)
         frozen_trial = study.tell(trial, state=TrialState.FAIL)
         manager.register_trial_exit(self._trial_id)
         _logger.warning(
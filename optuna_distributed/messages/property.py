@@ -2,7 +2,6 @@ from typing import Literal
 from typing import TYPE_CHECKING
 
 from optuna.study import Study
-from optuna.trial import Trial
 
 from optuna_distributed.messages import Message
 from optuna_distributed.messages.response import ResponseMessage
@@ -28,12 +27,13 @@ class TrialPropertyMessage(Message):
     """
 
     closing = False
+    blocking = True
 
     def __init__(self, trial_id: int, property: TrialProperty) -> None:
         self._trial_id = trial_id
         self._property = property
 
     def process(self, study: Study, manager: "OptimizationManager") -> None:
-        trial = Trial(study, self._trial_id)
+        trial = manager.get_trial(study, self._trial_id)
         conn = manager.get_connection(self._trial_id)
         conn.put(ResponseMessage(self._trial_id, getattr(trial, self._property)))
@@ -3,7 +3,6 @@ from typing import TYPE_CHECKING
 
 from optuna.exceptions import TrialPruned
 from optuna.study import Study
-from optuna.trial import Trial
 from optuna.trial import TrialState
 
 from optuna_distributed.messages import Message
@@ -36,7 +35,7 @@ class PrunedMessage(Message):
         self._exception = exception
 
     def process(self, study: Study, manager: "OptimizationManager") -> None:
-        trial = Trial(study, self._trial_id)
+        trial = manager.get_trial(study, self._trial_id)
         frozen_trial = study.tell(trial, state=TrialState.PRUNED)
         manager.register_trial_exit(self._trial_id)
         _logger.info(f"Trial {frozen_trial.number} pruned. {repr(self._exception)}")
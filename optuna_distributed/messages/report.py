@@ -1,7 +1,6 @@
 from typing import TYPE_CHECKING
 
 from optuna.study import Study
-from optuna.trial import Trial
 
 from optuna_distributed.messages import Message
 
@@ -33,5 +32,5 @@ class ReportMessage(Message):
         self._step = step
 
     def process(self, study: Study, manager: "OptimizationManager") -> None:
-        trial = Trial(study, self._trial_id)
+        trial = manager.get_trial(study, self._trial_id)
         trial.report(self._value, self._step)
@@ -37,9 +37,13 @@ class SetAttributeMessage(Message):
         self._value = value
 
     def process(self, study: Study, manager: "OptimizationManager") -> None:
+        trial = manager.get_trial(study, self._trial_id)
         if self._kind == "user":
-            study._storage.set_trial_user_attr(self._trial_id, self._key, self._value)
+            trial.set_user_attr(self._key, self._value)
         elif self._kind == "system":
+            # Trial object is reused by later messages, so its copy of attributes is kept
+            # up to date. Public setter of system attributes is deprecated in Optuna.
             study._storage.set_trial_system_attr(self._trial_id, self._key, self._value)
+            trial._cached_frozen_trial.system_attrs[self._key] = self._value
         else:
             assert False, "Should not reach."
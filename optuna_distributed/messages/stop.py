@@ -0,0 +1,36 @@
+import logging
+from typing import TYPE_CHECKING
+
+from optuna.study import Study
+
+from optuna_distributed.messages import Message
+
+
+if TYPE_CHECKING:
+    from optuna_distributed.managers import OptimizationManager
+
+
+_logger = logging.getLogger(__name__)
+
+
+class StopMessage(Message):
+    """A stop study message.
+
+    This message is sent by :class:`~optuna_distributed.trial.DistributedTrial` to
+    stop the study from within objective function. Main process stops dispatching new
+    trials right away, while trials that are already running finish normally.
+
+    Args:
+        trial_id:
+            Id of a trial to which the message is referring.
+    """
+
+    closing = False
+
+    def __init__(self, trial_id: int) -> None:
+        self._trial_id = trial_id
+
+    def process(self, study: Study, manager: "OptimizationManager") -> None:
+        manager.stop_dispatching(study)
+        number = study._storage.get_trial_number_from_id(self._trial_id)
+        _logger.info(f"Study stopped by trial {number}. Waiting for running trials to finish.")
@@ -35,6 +35,7 @@ class SuggestMessage(Message):
     """
 
     closing = False
+    blocking = True
 
     def __init__(self, trial_id: int, name: str, distribution: BaseDistribution) -> None:
         self._trial_id = trial_id
@@ -42,28 +43,35 @@ class SuggestMessage(Message):
         self._distribution = distribution
 
     def process(self, study: Study, manager: "OptimizationManager") -> None:
-        trial = Trial(study, self._trial_id)
-        value: float | int | CategoricalChoiceType
-        if isinstance(self._distribution, FloatDistribution):
-            value = trial.suggest_float(
-                name=self._name,
-                low=self._distribution.low,
-                high=self._distribution.high,
-                step=self._distribution.step,
-                log=self._distribution.log,
-            )
-        elif isinstance(self._distribution, IntDistribution):
-            value = trial.suggest_int(
-                name=self._name,
-                low=self._distribution.low,
-                high=self._distribution.high,
-                step=self._distribution.step,
-                log=self._distribution.log,
-            )
-        elif isinstance(self._distribution, CategoricalDistribution):
-            value = trial.suggest_categorical(name=self._name, choices=self._distribution.choices)
-        else:
-            assert False, "Should not reach."
-
+        trial = manager.get_trial(study, self._trial_id)
+        value = _suggest(trial, self._name, self._distribution)
         conn = manager.get_connection(self._trial_id)
         conn.put(ResponseMessage(self._trial_id, value))
+
+
+def _suggest(
+    trial: Trial, name: str, distribution: BaseDistribution
+) -> float | int | CategoricalChoiceType:
+    value: float | int | CategoricalChoiceType
+    if isinstance(distribution, FloatDistribution):
+        value = trial.suggest_float(
+            name=name,
+            low=distribution.low,
+            high=distribution.high,
+            step=distribution.step,
+            log=distribution.log,
+        )
+    elif isinstance(distribution, IntDistribution):
+        value = trial.suggest_int(
+            name=name,
+            low=distribution.low,
+            high=distribution.high,
+            step=distribution.step,
+            log=distribution.log,
+        )
+    elif isinstance(distribution, CategoricalDistribution):
+        value = trial.suggest_categorical(name=name, choices=distribution.choices)
+    else:
+        assert False, "Should not reach."
+
+    return value
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from typing import Any
+from typing import TYPE_CHECKING
+
+from optuna.distributions import BaseDistribution
+from optuna.study import Study
+
+from optuna_distributed.messages import Message
+from optuna_distributed.messages.response import ResponseMessage
+from optuna_distributed.messages.suggest import _suggest
+
+
+if TYPE_CHECKING:
+    from optuna_distributed.managers import OptimizationManager
+
+
+class SuggestAllMessage(Message):
+    """A request for suggestions of many values at once.
+
+    This message is sent by :class:`~optuna_distributed.trial.DistributedTrial` to
+    main process asking for value suggestions for the whole search space. All parameters
+    are sampled in a single pass and sent back in one response, which saves a round trip
+    per parameter compared to :class:`~optuna_distributed.messages.SuggestMessage`.
+
+    Args:
+        trial_id:
+            Id of a trial to which the message is referring.
+        search_space:
+            A mapping from parameter names to their distributions.
+    """
+
+    closing = False
+    blocking = True
+
+    def __init__(self, trial_id: int, search_space: dict[str, BaseDistribution]) -> None:
+        self._trial_id = trial_id
+        self._search_space = search_space
+
+    def process(self, study: Study, manager: "OptimizationManager") -> None:
+        trial = manager.get_trial(study, self._trial_id)
+        values: dict[str, Any] = {
+            name: _suggest(trial, name, distribution)
+            for name, distribution in self._search_space.items()
+        }
+        conn = manager.get_connection(self._trial_id)
+        conn.put(ResponseMessage(self._trial_id, values))
@@ -0,0 +1,48 @@
+import logging
+from typing import TYPE_CHECKING
+
+from optuna.study import Study
+from optuna.trial import TrialState
+
+from optuna_distributed.messages import Message
+
+
+if TYPE_CHECKING:
+    from optuna_distributed.managers import OptimizationManager
+
+
+_logger = logging.getLogger(__name__)
+
+
+class TimedOutMessage(Message):
+    """A timed out trial message.
+
+    This message is sent after objective function has been interrupted for running
+    longer than allowed, and tells study to fail associated trial. In contrast to
+    :class:`~optuna_distributed.messages.FailedMessage`, optimization continues.
+
+    Args:
+        trial_id:
+            Id of a trial to which the message is referring.
+        timeout:
+            Time (in seconds) trial was allowed to run for.
+    """
+
+    closing = True
+
+    def __init__(self, trial_id: int, timeout: float) -> None:
+        self._trial_id = trial_id
+        self._timeout = timeout
+
+    def process(self, study: Study, manager: "OptimizationManager") -> None:
+        trial = manager.get_trial(study, self._trial_id)
+        frozen_trial = study.tell(trial, state=TrialState.FAIL, skip_if_finished=True)
+        manager.register_trial_exit(self._trial_id)
+        if frozen_trial.state != TrialState.FAIL:
+            # Trial has finished before it was interrupted.
+            return
+
+        _logger.warning(
+            f"Trial {frozen_trial.number} failed with parameters: {frozen_trial.params} "
+            f"because it did not finish within {self._timeout} seconds."
+        )
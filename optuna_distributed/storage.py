@@ -0,0 +1,732 @@
+from __future__ import annotations
+
+import bisect
+from collections.abc import Container
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+import copy
+from datetime import datetime
+import json
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import Literal
+from typing import Tuple
+from typing import Union
+
+from optuna.distributions import BaseDistribution
+from optuna.storages import BaseStorage
+from optuna.storages import InMemoryStorage
+from optuna.storages import RDBStorage
+from optuna.storages._cached_storage import _CachedStorage
+from optuna.storages._rdb import models
+from optuna.storages._rdb.storage import _create_scoped_session
+from optuna.study import StudyDirection
+from optuna.study._frozen import FrozenStudy
+from optuna.trial import FrozenTrial
+from optuna.trial import TrialState
+
+
+_WriteKind = Literal["intermediate", "user", "system"]
+_PendingWrites = Dict[int, Dict[Tuple[_WriteKind, Union[int, str]], Any]]
+_FINISHED_STATES = (TrialState.COMPLETE, TrialState.PRUNED, TrialState.FAIL)
+_UNFINISHED_STATES = (TrialState.RUNNING, TrialState.WAITING)
+# Keeps number of bound parameters per statement within limits of all supported databases.
+_MAX_TRIALS_PER_STATEMENT = 500
+_SETTERS: dict[_WriteKind, str] = {
+    "intermediate": "set_trial_intermediate_value",
+    "user": "set_trial_user_attr",
+    "system": "set_trial_system_attr",
+}
+
+
+class _StorageWrapper(BaseStorage):
+    """Passes all calls through to the wrapped storage."""
+
+    def __init__(self, storage: BaseStorage) -> None:
+        self._storage = storage
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "_storage":
+            raise AttributeError(name)
+        return getattr(self._storage, name)
+
+    def create_new_study(
+        self, directions: Sequence[StudyDirection], study_name: str | None = None
+    ) -> int:
+        return self._storage.create_new_study(directions, study_name)
+
+    def delete_study(self, study_id: int) -> None:
+        self._storage.delete_study(study_id)
+
+    def set_study_user_attr(self, study_id: int, key: str, value: Any) -> None:
+        self._storage.set_study_user_attr(study_id, key, value)
+
+    def set_study_system_attr(self, study_id: int, key: str, value: Any) -> None:
+        self._storage.set_study_system_attr(study_id, key, value)
+
+    def get_study_id_from_name(self, study_name: str) -> int:
+        return self._storage.get_study_id_from_name(study_name)
+
+    def get_study_name_from_id(self, study_id: int) -> str:
+        return self._storage.get_study_name_from_id(study_id)
+
+    def get_study_directions(self, study_id: int) -> list[StudyDirection]:
+        return self._storage.get_study_directions(study_id)
+
+    def get_study_user_attrs(self, study_id: int) -> dict[str, Any]:
+        return self._storage.get_study_user_attrs(study_id)
+
+    def get_study_system_attrs(self, study_id: int) -> dict[str, Any]:
+        return self._storage.get_study_system_attrs(study_id)
+
+    def get_all_studies(self) -> list[FrozenStudy]:
+        return self._storage.get_all_studies()
+
+    def create_new_trial(self, study_id: int, template_trial: FrozenTrial | None = None) -> int:
+        return self._storage.create_new_trial(study_id, template_trial)
+
+    def set_trial_param(
+        self,
+        trial_id: int,
+        param_name: str,
+        param_value_internal: float,
+        distribution: BaseDistribution,
+    ) -> None:
+        self._storage.set_trial_param(trial_id, param_name, param_value_internal, distribution)
+
+    def set_trial_state_values(
+        self, trial_id: int, state: TrialState, values: Sequence[float] | None = None
+    ) -> bool:
+        return self._storage.set_trial_state_values(trial_id, state, values)
+
+    def get_trial_id_from_study_id_trial_number(self, study_id: int, trial_number: int) -> int:
+        return self._storage.get_trial_id_from_study_id_trial_number(study_id, trial_number)
+
+    def get_trial_number_from_id(self, trial_id: int) -> int:
+        return self._storage.get_trial_number_from_id(trial_id)
+
+    def get_trial_param(self, trial_id: int, param_name: str) -> float:
+        return self._storage.get_trial_param(trial_id, param_name)
+
+    def get_trial(self, trial_id: int) -> FrozenTrial:
+        return self._storage.get_trial(trial_id)
+
+    def get_all_trials(
+        self,
+        study_id: int,
+        deepcopy: bool = True,
+        states: Container[TrialState] | None = None,
+    ) -> list[FrozenTrial]:
+        return self._storage.get_all_trials(study_id, deepcopy, states)
+
+    def get_n_trials(
+        self, study_id: int, state: tuple[TrialState, ...] | TrialState | None = None
+    ) -> int:
+        return self._storage.get_n_trials(study_id, state)
+
+    def get_best_trial(self, study_id: int) -> FrozenTrial:
+        return self._storage.get_best_trial(study_id)
+
+    def get_trial_params(self, trial_id: int) -> dict[str, Any]:
+        return self._storage.get_trial_params(trial_id)
+
+    def get_trial_user_attrs(self, trial_id: int) -> dict[str, Any]:
+        return self._storage.get_trial_user_attrs(trial_id)
+
+    def get_trial_system_attrs(self, trial_id: int) -> dict[str, Any]:
+        return self._storage.get_trial_system_attrs(trial_id)
+
+    def remove_session(self) -> None:
+        self._storage.remove_session()
+
+    def check_trial_is_updatable(self, trial_id: int, trial_state: TrialState) -> None:
+        self._storage.check_trial_is_updatable(trial_id, trial_state)
+
+    def set_trial_intermediate_value(
+        self, trial_id: int, step: int, intermediate_value: float
+    ) -> None:
+        self._storage.set_trial_intermediate_value(trial_id, step, intermediate_value)
+
+    def set_trial_user_attr(self, trial_id: int, key: str, value: Any) -> None:
+        self._storage.set_trial_user_attr(trial_id, key, value)
+
+    def set_trial_system_attr(self, trial_id: int, key: str, value: Any) -> None:
+        self._storage.set_trial_system_attr(trial_id, key, value)
+
+    def fail_trials(self, trial_ids: Sequence[int]) -> None:
+        """Sets state of unfinished trials to failed, see :func:`fail_trials`.
+
+        Args:
+            trial_ids:
+                Ids of trials to fail.
+        """
+        fail_trials(self._storage, trial_ids)
+
+
+class WriteBehindStorage(_StorageWrapper):
+    """Storage wrapper which defers writes of intermediate values and trial attributes.
+
+    Reports and attribute writes are held in memory and written in batches, which with
+    :class:`~optuna.storages.RDBStorage` means a single transaction per batch instead of one
+    per write. Pending writes of a trial are flushed before anything else touches that trial
+    in the storage, e.g. a suggestion, pruning check or tell, and reads of whole study flush
+    all pending writes, so everything read from the storage is up to date. If pending writes
+    of a trial fail, the error is raised when that trial is flushed on its own.
+
+    Args:
+        storage:
+            Wrapped storage.
+        max_pending_writes:
+            Number of pending writes at which all of them are flushed.
+        max_write_delay:
+            Time (in seconds) after which pending writes are flushed with next write.
+    """
+
+    def __init__(
+        self, storage: BaseStorage, max_pending_writes: int = 100, max_write_delay: float = 1.0
+    ) -> None:
+        if max_pending_writes <= 0:
+            raise ValueError("At least one write has to be allowed to wait.")
+
+        super().__init__(storage)
+        self._max_pending_writes = max_pending_writes
+        self._max_write_delay = max_write_delay
+        self._lock = threading.RLock()
+        self._pending: _PendingWrites = {}
+        self._n_pending = 0
+        self._oldest_write_at = 0.0
+
+    def flush(self, trial_id: int | None = None) -> None:
+        """Writes pending writes to the wrapped storage.
+
+        Args:
+            trial_id:
+                Id of a trial to flush writes of. If :obj:`None`, writes of all trials
+                are flushed.
+        """
+        with self._lock:
+            if trial_id is None:
+                pending, self._pending = self._pending, {}
+            elif trial_id in self._pending:
+                pending = {trial_id: self._pending.pop(trial_id)}
+            else:
+                return
+
+            self._n_pending -= sum(len(writes) for writes in pending.values())
+            if trial_id is not None:
+                # Failure is reported to the trial which made the writes, like a direct write.
+                _write(self._storage, pending)
+                return
+
+            try:
+                _write(self._storage, pending)
+            except Exception:
+                # Writes are retried trial by trial, so that a failed write of one trial fails
+                # neither unrelated reads, nor writes of other trials. Failed writes are kept
+                # until the trial is flushed on its own, which reports the failure.
+                for failed_id, writes in pending.items():
+                    try:
+                        _write(self._storage, {failed_id: writes})
+                    except Exception:
+                        self._pending[failed_id] = writes
+                        self._n_pending += len(writes)
+
+    def _defer(self, trial_id: int, kind: _WriteKind, key: int | str, value: Any) -> None:
+        if kind != "intermediate" and supports_batched_writes(self._storage):
+            # Attributes are serialized only when written, so values that can't be
+            # are rejected upfront, instead of failing a batch of other writes later.
+            json.dumps(value)
+
+        with self._lock:
+            if not self._n_pending:
+                self._oldest_write_at = time.monotonic()
+
+            writes = self._pending.setdefault(trial_id, {})
+            if (kind, key) not in writes:
+                self._n_pending += 1
+            # Later write of the same value overwrites earlier one, just like in storage.
+            writes[(kind, key)] = value
+
+            stale = time.monotonic() - self._oldest_write_at >= self._max_write_delay
+            if self._n_pending >= self._max_pending_writes or stale:
+                self.flush()
+
+    def set_trial_intermediate_value(
+        self, trial_id: int, step: int, intermediate_value: float
+    ) -> None:
+        self._defer(trial_id, "intermediate", step, intermediate_value)
+
+    def set_trial_user_attr(self, trial_id: int, key: str, value: Any) -> None:
+        self._defer(trial_id, "user", key, value)
+
+    def set_trial_system_attr(self, trial_id: int, key: str, value: Any) -> None:
+        self._defer(trial_id, "system", key, value)
+
+    def delete_study(self, study_id: int) -> None:
+        self.flush()
+        super().delete_study(study_id)
+
+    def set_trial_param(
+        self,
+        trial_id: int,
+        param_name: str,
+        param_value_internal: float,
+        distribution: BaseDistribution,
+    ) -> None:
+        self.flush(trial_id)
+        super().set_trial_param(trial_id, param_name, param_value_internal, distribution)
+
+    def set_trial_state_values(
+        self, trial_id: int, state: TrialState, values: Sequence[float] | None = None
+    ) -> bool:
+        self.flush(trial_id)
+        return super().set_trial_state_values(trial_id, state, values)
+
+    def get_trial_param(self, trial_id: int, param_name: str) -> float:
+        self.flush(trial_id)
+        return super().get_trial_param(trial_id, param_name)
+
+    def get_trial(self, trial_id: int) -> FrozenTrial:
+        self.flush(trial_id)
+        return super().get_trial(trial_id)
+
+    def get_all_trials(
+        self,
+        study_id: int,
+        deepcopy: bool = True,
+        states: Container[TrialState] | None = None,
+    ) -> list[FrozenTrial]:
+        self.flush()
+        return super().get_all_trials(study_id, deepcopy, states)
+
+    def get_n_trials(
+        self, study_id: int, state: tuple[TrialState, ...] | TrialState | None = None
+    ) -> int:
+        self.flush()
+        return super().get_n_trials(study_id, state)
+
+    def get_best_trial(self, study_id: int) -> FrozenTrial:
+        self.flush()
+        return super().get_best_trial(study_id)
+
+    def get_trial_params(self, trial_id: int) -> dict[str, Any]:
+        self.flush(trial_id)
+        return super().get_trial_params(trial_id)
+
+    def get_trial_user_attrs(self, trial_id: int) -> dict[str, Any]:
+        self.flush(trial_id)
+        return super().get_trial_user_attrs(trial_id)
+
+    def get_trial_system_attrs(self, trial_id: int) -> dict[str, Any]:
+        self.flush(trial_id)
+        return super().get_trial_system_attrs(trial_id)
+
+    def remove_session(self) -> None:
+        self.flush()
+        super().remove_session()
+
+    def fail_trials(self, trial_ids: Sequence[int]) -> None:
+        self.flush()
+        super().fail_trials(trial_ids)
+
+
+class CachedHistoryStorage(_StorageWrapper):
+    """Storage wrapper which keeps finished trials in memory.
+
+    Finished trials can't change anymore, so after they are read once, they are served from
+    memory and only trials still running are read from the wrapped storage. Trials finished
+    through this wrapper are added to memory as they finish, so samplers and pruners which
+    look only at finished trials, e.g. TPE or CMA-ES, do not reach the wrapped storage at all.
+
+    Cached history is complete only if trials of the study are finished through this wrapper,
+    so it should not be used while other processes optimize the same study.
+
+    Args:
+        storage:
+            Wrapped storage.
+    """
+
+    def __init__(self, storage: BaseStorage) -> None:
+        super().__init__(storage)
+        self._lock = threading.RLock()
+        self._studies: dict[int, _FinishedTrials] = {}
+        self._study_ids: dict[int, int] = {}
+
+    def _finished_trials(self, study_id: int) -> _FinishedTrials:
+        finished = self._studies.get(study_id)
+        if finished is None:
+            finished = self._studies[study_id] = _FinishedTrials()
+            for trial in self._storage.get_all_trials(study_id, False, _FINISHED_STATES):
+                self._study_ids[trial._trial_id] = study_id
+                finished.add(trial)
+        return finished
+
+    def _trial_finished(self, trial_id: int) -> None:
+        study_id = self._study_ids.get(trial_id)
+        if study_id is None:
+            # Trial was not seen yet, so history of its study is read again on next use.
+            self._studies.clear()
+        elif study_id in self._studies:
+            self._studies[study_id].add(self._storage.get_trial(trial_id))
+
+    def delete_study(self, study_id: int) -> None:
+        with self._lock:
+            self._studies.pop(study_id, None)
+            super().delete_study(study_id)
+
+    def create_new_trial(self, study_id: int, template_trial: FrozenTrial | None = None) -> int:
+        with self._lock:
+            trial_id = super().create_new_trial(study_id, template_trial)
+            self._study_ids[trial_id] = study_id
+            if template_trial is not None and template_trial.state.is_finished():
+                self._trial_finished(trial_id)
+            return trial_id
+
+    def set_trial_state_values(
+        self, trial_id: int, state: TrialState, values: Sequence[float] | None = None
+    ) -> bool:
+        if not state.is_finished():
+            return super().set_trial_state_values(trial_id, state, values)
+
+        with self._lock:
+            updated = super().set_trial_state_values(trial_id, state, values)
+            if updated:
+                self._trial_finished(trial_id)
+            return updated
+
+    def fail_trials(self, trial_ids: Sequence[int]) -> None:
+        with self._lock:
+            super().fail_trials(trial_ids)
+            # Failed trials are read again with the rest of history on next use,
+            # instead of one by one.
+            for trial_id in trial_ids:
+                study_id = self._study_ids.get(trial_id)
+                if study_id is None:
+                    self._studies.clear()
+                    break
+                self._studies.pop(study_id, None)
+
+    def get_trial(self, trial_id: int) -> FrozenTrial:
+        with self._lock:
+            study_id = self._study_ids.get(trial_id)
+            finished = self._studies.get(study_id) if study_id is not None else None
+            trial = finished.get(trial_id) if finished is not None else None
+        return trial if trial is not None else super().get_trial(trial_id)
+
+    def get_all_trials(
+        self,
+        study_id: int,
+        deepcopy: bool = True,
+        states: Container[TrialState] | None = None,
+    ) -> list[FrozenTrial]:
+        with self._lock:
+            finished = self._finished_trials(study_id)
+            trials = finished.filter(states)
+            unfinished_states = tuple(
+                state
+                for state in TrialState
+                if not state.is_finished() and (states is None or state in states)
+            )
+            if unfinished_states:
+                for trial in super().get_all_trials(study_id, False, unfinished_states):
+                    self._study_ids[trial._trial_id] = study_id
+                    # Trial might have been finished by someone else in the meantime.
+                    if finished.get(trial._trial_id) is None:
+                        trials.append(trial)
+                trials.sort(key=lambda trial: trial.number)
+
+        return copy.deepcopy(trials) if deepcopy else trials
+
+    def get_n_trials(
+        self, study_id: int, state: tuple[TrialState, ...] | TrialState | None = None
+    ) -> int:
+        return BaseStorage.get_n_trials(self, study_id, state)
+
+    def get_best_trial(self, study_id: int) -> FrozenTrial:
+        return BaseStorage.get_best_trial(self, study_id)
+
+
+class BestTrialStorage(_StorageWrapper):
+    """Storage wrapper which keeps track of best trials as they complete.
+
+    Best trial of a single-objective study, or Pareto front of a multi-objective one, is found
+    once by reading completed trials from the wrapped storage. After that, it is updated with
+    every trial completed through this wrapper, so it can be fetched without going over all
+    trials again. Trials completed by other processes sharing the storage are not seen.
+
+    Args:
+        storage:
+            Wrapped storage.
+    """
+
+    def __init__(self, storage: BaseStorage) -> None:
+        super().__init__(storage)
+        self._lock = threading.RLock()
+        self._fronts: dict[int, _BestTrial | _ParetoFront] = {}
+        self._study_ids: dict[int, int] = {}
+
+    def _front(self, study_id: int) -> _BestTrial | _ParetoFront:
+        front = self._fronts.get(study_id)
+        if front is None:
+            directions = self.get_study_directions(study_id)
+            front = _BestTrial(directions[0]) if len(directions) == 1 else _ParetoFront(directions)
+            for trial in self._storage.get_all_trials(study_id, False, (TrialState.COMPLETE,)):
+                front.add(trial)
+            self._fronts[study_id] = front
+        return front
+
+    def _trial_completed(self, trial_id: int) -> None:
+        study_id = self._study_ids.get(trial_id)
+        if study_id not in self._fronts and (study_id is not None or not self._fronts):
+            # Best trials of the study are not tracked yet.
+            return
+
+        trial = self._storage.get_trial(trial_id)
+        if study_id is None:
+            study_id = self._find_study_id(trial)
+        if study_id is not None:
+            self._fronts[study_id].add(trial)
+
+    def _find_study_id(self, trial: FrozenTrial) -> int | None:
+        # Trial was created before storage was wrapped, e.g. when enqueued, so it's looked up
+        # by number in studies whose best trials are tracked. Other studies are not affected.
+        for study_id in self._fronts:
+            try:
+                trial_id = self._storage.get_trial_id_from_study_id_trial_number(
+                    study_id, trial.number
+                )
+            except KeyError:
+                continue
+
+            if trial_id == trial._trial_id:
+                self._study_ids[trial_id] = study_id
+                return study_id
+        return None
+
+    def delete_study(self, study_id: int) -> None:
+        with self._lock:
+            self._fronts.pop(study_id, None)
+            super().delete_study(study_id)
+
+    def create_new_trial(self, study_id: int, template_trial: FrozenTrial | None = None) -> int:
+        with self._lock:
+            trial_id = super().create_new_trial(study_id, template_trial)
+            self._study_ids[trial_id] = study_id
+            if template_trial is not None and template_trial.state == TrialState.COMPLETE:
+                self._trial_completed(trial_id)
+            return trial_id
+
+    def set_trial_state_values(
+        self, trial_id: int, state: TrialState, values: Sequence[float] | None = None
+    ) -> bool:
+        if state != TrialState.COMPLETE:
+            return super().set_trial_state_values(trial_id, state, values)
+
+        with self._lock:
+            updated = super().set_trial_state_values(trial_id, state, values)
+            if updated:
+                self._trial_completed(trial_id)
+            return updated
+
+    def get_best_trial(self, study_id: int) -> FrozenTrial:
+        with self._lock:
+            front = self._front(study_id)
+            if front.n_objectives > 1:
+                raise RuntimeError(
+                    "Best trial can be obtained only for single-objective optimization."
+                )
+
+            trials = front.trials()
+            if not trials:
+                raise ValueError("No trials are completed yet.")
+            # Out of trials with the same best value, the earliest one is picked.
+            return trials[0]
+
+    def get_best_trials(self, study_id: int) -> list[FrozenTrial]:
+        """Returns completed trials located at the Pareto front of a study.
+
+        Args:
+            study_id:
+                Id of a study.
+        """
+        with self._lock:
+            front = self._front(study_id)
+            if front.n_objectives > 1 or not front.trials():
+                return front.trials()
+
+            # Only one of trials tied for the best value is tracked, so the rest are looked up.
+            best = front.trials()[0]
+            trials = self._storage.get_all_trials(study_id, False, (TrialState.COMPLETE,))
+            return [trial for trial in trials if trial.values == best.values]
+
+
+class _BestTrial:
+    """Completed trial with the best value, the earliest one out of those tied for it."""
+
+    n_objectives = 1
+
+    def __init__(self, direction: StudyDirection) -> None:
+        self._sign = -1.0 if direction == StudyDirection.MAXIMIZE else 1.0
+        self._trial: FrozenTrial | None = None
+
+    def add(self, trial: FrozenTrial) -> None:
+        best = self._trial
+        if best is None or best._trial_id == trial._trial_id:
+            self._trial = trial
+            return
+
+        value = self._sign * trial.values[0]
+        best_value = self._sign * best.values[0]
+        if value < best_value or (value == best_value and trial.number < best.number):
+            self._trial = trial
+
+    def trials(self) -> list[FrozenTrial]:
+        return [] if self._trial is None else [self._trial]
+
+
+class _ParetoFront:
+    """Completed trials not dominated by any other, ordered by number."""
+
+    def __init__(self, directions: Sequence[StudyDirection]) -> None:
+        self.n_objectives = len(directions)
+        self._signs = [-1.0 if d == StudyDirection.MAXIMIZE else 1.0 for d in directions]
+        self._trials: list[FrozenTrial] = []
+
+    def _minimized(self, trial: FrozenTrial) -> list[float]:
+        return [sign * value for sign, value in zip(self._signs, trial.values)]
+
+    def add(self, trial: FrozenTrial) -> None:
+        values = self._minimized(trial)
+        front = []
+        for other in self._trials:
+            if other._trial_id == trial._trial_id:
+                continue
+            other_values = self._minimized(other)
+            if _dominates(other_values, values):
+                return
+            if not _dominates(values, other_values):
+                front.append(other)
+
+        front.append(trial)
+        self._trials = sorted(front, key=lambda trial: trial.number)
+
+    def trials(self) -> list[FrozenTrial]:
+        return list(self._trials)
+
+
+def _dominates(values: list[float], other: list[float]) -> bool:
+    return all(v <= o for v, o in zip(values, other)) and values != other
+
+
+class _FinishedTrials:
+    """Finished trials of a study, ordered by number."""
+
+    def __init__(self) -> None:
+        self._numbers: list[int] = []
+        self._trials: list[FrozenTrial] = []
+        self._by_id: dict[int, FrozenTrial] = {}
+
+    def add(self, trial: FrozenTrial) -> None:
+        if trial._trial_id in self._by_id:
+            position = self._trials.index(self._by_id[trial._trial_id])
+            self._trials[position] = trial
+        else:
+            position = bisect.bisect(self._numbers, trial.number)
+            self._numbers.insert(position, trial.number)
+            self._trials.insert(position, trial)
+        self._by_id[trial._trial_id] = trial
+
+    def get(self, trial_id: int) -> FrozenTrial | None:
+        return self._by_id.get(trial_id)
+
+    def filter(self, states: Container[TrialState] | None) -> list[FrozenTrial]:
+        if states is None or all(state in states for state in _FINISHED_STATES):
+            return list(self._trials)
+        return [trial for trial in self._trials if trial.state in states]
+
+
+def supports_batched_writes(storage: BaseStorage) -> bool:
+    """Indicates whether deferred writes to the storage are batched in a single transaction.
+
+    Args:
+        storage:
+            Checked storage.
+    """
+    return _transactional_backend(storage) is not None
+
+
+def fail_trials(storage: BaseStorage, trial_ids: Sequence[int]) -> None:
+    """Sets state of unfinished trials to failed.
+
+    With :class:`~optuna.storages.RDBStorage`, all trials are failed with a single update
+    in one transaction and trials which have finished in the meantime are left as they are.
+    Other storages are updated trial by trial, with updates running concurrently unless
+    the storage is kept in memory.
+
+    Args:
+        storage:
+            Storage holding the trials.
+        trial_ids:
+            Ids of trials to fail.
+    """
+    if isinstance(storage, _StorageWrapper):
+        storage.fail_trials(trial_ids)
+        return
+
+    if isinstance(storage, InMemoryStorage):
+        # Updates are serialized by storage lock, so running them in threads only adds overhead.
+        for trial_id in trial_ids:
+            _fail_trial(storage, trial_id)
+        return
+
+    backend = _transactional_backend(storage)
+    if backend is None:
+        # Exceptions raised by any of updates are re-raised here.
+        with ThreadPoolExecutor() as executor:
+            list(executor.map(lambda trial_id: _fail_trial(storage, trial_id), trial_ids))
+        return
+
+    now = datetime.now()
+    with _create_scoped_session(backend.scoped_session, True) as session:
+        for start in range(0, len(trial_ids), _MAX_TRIALS_PER_STATEMENT):
+            end = start + _MAX_TRIALS_PER_STATEMENT
+            chunk = trial_ids[start:end]
+            session.query(models.TrialModel).filter(
+                models.TrialModel.trial_id.in_(chunk),
+                models.TrialModel.state.in_(_UNFINISHED_STATES),
+            ).update(
+                {
+                    models.TrialModel.state: TrialState.FAIL,
+                    models.TrialModel.datetime_complete: now,
+                },
+                synchronize_session=False,
+            )
+
+
+def _fail_trial(storage: BaseStorage, trial_id: int) -> None:
+    storage.set_trial_state_values(trial_id, TrialState.FAIL)
+
+
+def _write(storage: BaseStorage, pending: _PendingWrites) -> None:
+    backend = _transactional_backend(storage)
+    if backend is None:
+        for trial_id, writes in pending.items():
+            for (kind, key), value in writes.items():
+                getattr(storage, _SETTERS[kind])(trial_id, key, value)
+        return
+
+    with _create_scoped_session(backend.scoped_session, True) as session:
+        for trial_id, writes in pending.items():
+            for (kind, key), value in writes.items():
+                setter = getattr(backend, f"_{_SETTERS[kind]}_without_commit")
+                setter(session, trial_id, key, value)
+
+
+def _transactional_backend(storage: BaseStorage) -> RDBStorage | None:
+    # Before Optuna 3.2, cached storage kept its own copies of running trials,
+    # so writes can only bypass it in later versions.
+    if isinstance(storage, _CachedStorage) and not hasattr(storage, "_check_trial_is_updatable"):
+        storage = storage._backend
+    return storage if isinstance(storage, RDBStorage) else None
@@ -4,6 +4,7 @@ from collections.abc import Callable
 from collections.abc import Container
 from collections.abc import Iterable
 from collections.abc import Sequence
+import copy
 import sys
 from typing import Any
 from typing import TYPE_CHECKING
@@ -17,10 +18,16 @@ from optuna.trial import FrozenTrial
 from optuna.trial import Trial
 from optuna.trial import TrialState
 
+from optuna_distributed.callbacks import CallbackExecutor
+from optuna_distributed.callbacks import OverflowPolicy
 from optuna_distributed.eventloop import EventLoop
+from optuna_distributed.instrumentation import EventLoopStats
 from optuna_distributed.managers import DistributedOptimizationManager
 from optuna_distributed.managers import LocalOptimizationManager
 from optuna_distributed.managers import ObjectiveFuncType
+from optuna_distributed.managers import Transport
+from optuna_distributed.storage import BestTrialStorage
+from optuna_distributed.storage import fail_trials
 from optuna_distributed.terminal import Terminal
 
 
@@ -63,6 +70,7 @@ class DistributedStudy:
     def __init__(self, study: Study, client: Client | None = None) -> None:
         self._study = study
         self._client = client
+        self._event_loop_stats = EventLoopStats()
 
     @property
     def best_params(self) -> dict[str, Any]:
@@ -76,12 +84,23 @@ class DistributedStudy:
 
     @property
     def best_trial(self) -> FrozenTrial:
-        """Return the best trial in the study."""
+        """Return the best trial in the study.
+
+        While optimization is running, best trial is kept up to date as trials complete,
+        so it's returned without going over all trials in the storage.
+        """
         return self._study.best_trial
 
     @property
     def best_trials(self) -> list[FrozenTrial]:
-        """Return trials located at the Pareto front in the study."""
+        """Return trials located at the Pareto front in the study.
+
+        While optimization is running, Pareto front is kept up to date as trials complete,
+        so it's returned without comparing all trials in the storage.
+        """
+        storage = self._study._storage
+        if isinstance(storage, BestTrialStorage):
+            return copy.deepcopy(storage.get_best_trials(self._study._study_id))
         return self._study.best_trials
 
     @property
@@ -109,6 +128,17 @@ class DistributedStudy:
         """Return system attributes."""
         return self._study.system_attrs
 
+    @property
+    def event_loop_stats(self) -> EventLoopStats:
+        """Return measurements of message processing in the latest optimization.
+
+        Stats are updated while :func:`~optuna_distributed.DistributedStudy.optimize` runs,
+        so they can be read e.g. from another thread to see whether main process keeps up
+        with workers. Use :func:`~optuna_distributed.instrumentation.EventLoopStats.to_json`
+        to dump them.
+        """
+        return self._event_loop_stats
+
     def into_study(self) -> Study:
         """Returns regular Optuna study."""
         return self._study
@@ -139,6 +169,21 @@ class DistributedStudy:
         callbacks: list[Callable[["Study", FrozenTrial], None]] | None = None,
         show_progress_bar: bool = False,
         *args: Any,
+        max_trials_per_worker: int | None = 1,
+        max_worker_memory: int | None = None,
+        start_method: str | None = None,
+        preload_modules: Sequence[str] | None = None,
+        message_buffer_size: int = 0,
+        message_buffer_timeout: float = 1.0,
+        transport: Transport = "queue",
+        shared_memory_size: int | None = None,
+        message_threads: int = 1,
+        trial_timeout: float | None = None,
+        callback_queue_size: int = 100,
+        callback_overflow: OverflowPolicy = "block",
+        max_concurrent_trials: int | None = None,
+        max_pending_writes: int = 100,
+        cache_finished_trials: bool = False,
         **kwargs: Any,
     ) -> None:
         """Optimize an objective function.
@@ -154,9 +199,14 @@ class DistributedStudy:
             func:
                 A callable that implements objective function.
             n_trials:
-                The number of trials to run in total.
+                The number of trials to run in total. If :obj:`None`, trials are run until
+                the study is stopped, either by :obj:`timeout`, by a call to
+                :func:`~optuna_distributed.study.DistributedStudy.stop` or
+                :func:`~optuna_distributed.trial.DistributedTrial.stop_study`, or by
+                a termination signal such as Ctrl+C.
             timeout:
-                Stop study after the given number of second(s).
+                Stop study after the given number of second(s). Running trials are interrupted
+                as soon as the deadline passes, without waiting for messages from workers.
             n_jobs:
                 The number of parallel jobs when using multiprocessing backend. Values less than
                 one or greater than :obj:`multiprocessing.cpu_count()` will default to number of
@@ -165,20 +215,113 @@ class DistributedStudy:
                 A study continues to run even when a trial raises one of the exceptions specified
                 in this argument.
             callbacks:
-                List of callback functions that are invoked at the end of each trial. Currently
-                not supported.
+                List of callback functions that are invoked at the end of each trial. Callbacks
+                run in a dedicated thread, so they do not hold up communication with workers.
+                Calling :func:`optuna.study.Study.stop` from a callback stops dispatching new
+                trials, and optimization returns once running trials and callbacks finish.
             show_progress_bar:
                 Flag to show progress bars or not. To disable progress bar, set this :obj:`False`.
+            max_trials_per_worker:
+                The number of trials each worker process evaluates before being replaced with
+                a fresh one when using multiprocessing backend. If :obj:`None`, worker processes
+                are reused for the whole optimization, which avoids paying process startup and
+                import costs for every trial.
+            max_worker_memory:
+                Resident memory size (in bytes) above which worker process is replaced with
+                a fresh one when using multiprocessing backend.
+            start_method:
+                Method used to start worker processes when using multiprocessing backend.
+                One of ``"fork"``, ``"forkserver"`` or ``"spawn"``. If :obj:`None`, platform
+                default is used.
+            preload_modules:
+                Names of modules to import once in the fork server, e.g. heavy ML libraries
+                or module with the objective function. Only valid with ``"forkserver"``
+                start method.
+            message_buffer_size:
+                Maximum number of :func:`~optuna_distributed.trial.DistributedTrial.report`
+                and attribute writes held by a trial before they are sent to the study in
+                a single batch. Buffer is always flushed before requests waiting for response,
+                such as suggestions or pruning checks. Buffering is disabled by default.
+            message_buffer_timeout:
+                Time (in seconds) after which buffered messages are flushed with next write.
+                Age is not checked in between, so messages buffered before a long computation
+                are held back until the trial calls the study again or exits.
+            transport:
+                Communication channel used in distributed mode. With ``"queue"``, messages
+                are passed through Dask queues hosted on the scheduler. With ``"pubsub"``,
+                messages are pushed to recipients with Dask Pub/Sub, which is not available
+                in distributed 2025.5.0 and newer. With ``"stream"``,
+                each trial opens a direct TCP connection to the client, so the scheduler
+                does not carry trial traffic. This requires workers to be able to reach
+                client machine over network.
+            shared_memory_size:
+                Size (in bytes) of shared memory ring buffers used to exchange messages with
+                each worker process when using multiprocessing backend. This avoids copying
+                message payloads, e.g. large intermediate arrays, through the kernel.
+                If :obj:`None`, messages are sent over pipes.
+            message_threads:
+                Number of threads processing messages from trials in main process. With more
+                than one, messages from different trials are processed in parallel, so e.g.
+                storage writes and pruning checks do not wait for a slow suggestion made for
+                another trial. Messages from each trial are still processed in order, and
+                sampler is used by one thread at a time.
+            trial_timeout:
+                Time (in seconds) after which a single running trial is interrupted and failed.
+                In contrast to :obj:`timeout`, optimization continues with remaining trials.
+                If :obj:`None`, trials can run for any amount of time.
+            callback_queue_size:
+                Maximum number of finished trials waiting for callbacks to run.
+            callback_overflow:
+                What to do when callback queue is full. With ``"block"``, processing of
+                messages waits for callbacks to catch up. With ``"drop_oldest"``, callbacks
+                are not run for the longest waiting trial. With ``"coalesce"``, callbacks
+                are run only for the latest finished trial out of all waiting ones.
+            max_concurrent_trials:
+                Maximum number of trials dispatched to Dask cluster at the same time. Trials
+                are then created one by one as others finish, so sampler can take results
+                of finished trials into account. If :obj:`None` and :obj:`n_trials` is set,
+                all trials are created and dispatched upfront. If both are :obj:`None`,
+                defaults to the number of threads in the cluster. With multiprocessing
+                backend, trials are always created as they are dispatched, and
+                :obj:`n_jobs` limits how many run at the same time.
+            max_pending_writes:
+                Maximum number of intermediate values and trial attributes held in main
+                process before they are written to the storage in a single transaction.
+                Writes of a trial are flushed before its state is read, e.g. to check if it
+                should be pruned, so results are not affected. Writes are deferred only with
+                storages backed by a relational database. If 0, every write is made at once.
+            cache_finished_trials:
+                If :obj:`True`, finished trials are kept in main process memory during
+                optimization, so that samplers do not reload study history from the storage
+                for every suggestion. Only trials still running are read from the storage.
+                This is safe only when no other process optimizes the same study at the same
+                time, as trials finished elsewhere would not be seen.
         """
-        if n_trials is None:
-            raise ValueError("Only finite number of trials supported at the moment.")
-
         terminal = Terminal(show_progress_bar, n_trials, timeout)
         catch = tuple(catch) if isinstance(catch, Iterable) else (catch,)
         manager = (
-            DistributedOptimizationManager(self._client, n_trials)
+            DistributedOptimizationManager(
+                self._client,
+                n_trials,
+                message_buffer_size=message_buffer_size,
+                message_buffer_timeout=message_buffer_timeout,
+                transport=transport,
+                trial_timeout=trial_timeout,
+                max_concurrent_trials=max_concurrent_trials,
+            )
             if self._client is not None and not isinstance(self._client.cluster, LocalCluster)
-            else LocalOptimizationManager(n_trials, n_jobs)
+            else LocalOptimizationManager(
+                n_trials,
+                n_jobs,
+                max_trials_per_worker,
+                max_worker_memory,
+                start_method,
+                preload_modules,
+                message_buffer_size,
+                message_buffer_timeout,
+                shared_memory_size,
+                trial_timeout,
+            )
         )
 
         if isinstance(manager, LocalOptimizationManager) and sys.platform == "win32":
@@ -187,8 +330,21 @@ class DistributedStudy:
                 "Please specify Dask client to continue in distributed mode."
             )
 
+        self._event_loop_stats = EventLoopStats()
         try:
-            event_loop = EventLoop(self._study, manager, objective=func, interrupt_patience=10.0)
+            event_loop = EventLoop(
+                self._study,
+                manager,
+                objective=func,
+                interrupt_patience=10.0,
+                message_threads=message_threads,
+                stats=self._event_loop_stats,
+                callbacks=CallbackExecutor(
+                    callbacks or [], callback_queue_size, callback_overflow
+                ),
+                max_pending_writes=max_pending_writes,
+                cache_finished_trials=cache_finished_trials,
+            )
             event_loop.run(terminal, timeout, catch)
 
         except KeyboardInterrupt:
@@ -197,8 +353,7 @@ class DistributedStudy:
 
             states = (TrialState.RUNNING, TrialState.WAITING)
             trials = self._study.get_trials(deepcopy=False, states=states)
-            for trial in trials:
-                self._study._storage.set_trial_state_values(trial._trial_id, TrialState.FAIL)
+            fail_trials(self._study._storage, [trial._trial_id for trial in trials])
             raise
 
         finally:
@@ -298,8 +453,10 @@ class DistributedStudy:
     def stop(self) -> None:
         """Exit from the current optimization loop after the running trials finish.
 
-        This method is effectively a noop, sice there is no way to reach study from the
-        objective function at the moment. TODO(xadrianzetx) Implement this.
+        This method can be called from callbacks passed to
+        :func:`~optuna_distributed.DistributedStudy.optimize`. Objective functions, which
+        can't reach the study, should call
+        :func:`~optuna_distributed.trial.DistributedTrial.stop_study` instead.
         """
         self._study.stop()
 
@@ -16,13 +16,14 @@ class Terminal:
         show_progress_bar:
             Enables progress bar.
         n_trials:
-            The number of trials to run in total.
+            The number of trials to run in total. If :obj:`None`, progress bar
+            only counts finished trials.
         timeout:
             Stops study after the given number of second(s).
     """
 
     def __init__(
-        self, show_progress_bar: bool, n_trials: int, timeout: float | None = None
+        self, show_progress_bar: bool, n_trials: int | None, timeout: float | None = None
     ) -> None:
         self._timeout = timeout
         self._progbar = Progress(
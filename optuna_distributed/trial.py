@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 from collections.abc import Sequence
+import copy
 import datetime
+import time
 from typing import Any
 from typing import TypeVar
 
@@ -10,12 +12,16 @@ from optuna.distributions import CategoricalChoiceType
 from optuna.distributions import CategoricalDistribution
 from optuna.distributions import FloatDistribution
 from optuna.distributions import IntDistribution
+from optuna.trial import FrozenTrial
 
 from optuna_distributed.ipc import IPCPrimitive
+from optuna_distributed.messages import BatchMessage
 from optuna_distributed.messages import ReportMessage
 from optuna_distributed.messages import ResponseMessage
 from optuna_distributed.messages import SetAttributeMessage
 from optuna_distributed.messages import ShouldPruneMessage
+from optuna_distributed.messages import StopMessage
+from optuna_distributed.messages import SuggestAllMessage
 from optuna_distributed.messages import SuggestMessage
 from optuna_distributed.messages import TrialProperty
 from optuna_distributed.messages import TrialPropertyMessage
@@ -35,26 +41,110 @@ class DistributedTrial:
     For complete documentation, please refer to:
     https://optuna.readthedocs.io/en/stable/reference/generated/optuna.trial.Trial.html#optuna-trial-trial
 
+    Messages which do not expect a response (reports and attribute writes) can be buffered
+    and sent to the study in batches. Buffer is flushed once it holds ``buffer_size``
+    messages, when a message older than ``buffer_timeout`` is found in it while buffering
+    another one, and always before any request waiting for response or trial exit,
+    so the study observes messages in the same order as they were issued. There is no
+    timer, so age of buffered messages is checked only on the next call to trial. Messages
+    buffered right before a long computation are held back until trial is called again.
+
+    When trial snapshot is provided, trial keeps a local mirror of its properties, updated
+    with every suggestion and user attribute write. Reads of these properties are then
+    served without contacting the study. System attributes are always fetched from
+    the study, since samplers can write them on the study side.
+
     Args:
         trial_id:
             A trial ID that is automatically generated.
         connection:
             An instance of :class:`~optuna_distributed.ipc.IPCPrimitive`.
+        buffer_size:
+            Maximum number of messages held in buffer. If less than two,
+            buffering is disabled and every message is sent immediately.
+        buffer_timeout:
+            Time (in seconds) after which buffered messages are considered stale,
+            and flushed once the next message is buffered.
+        frozen_trial:
+            A snapshot of the trial taken when it was dispatched to worker. If :obj:`None`,
+            all properties are fetched from the study.
     """
 
-    def __init__(self, trial_id: int, connection: IPCPrimitive) -> None:
+    def __init__(
+        self,
+        trial_id: int,
+        connection: IPCPrimitive,
+        buffer_size: int = 0,
+        buffer_timeout: float = 1.0,
+        frozen_trial: FrozenTrial | None = None,
+    ) -> None:
         self.trial_id = trial_id
         self.connection = connection
+        self._buffer_size = buffer_size
+        self._buffer_timeout = buffer_timeout
+        self._buffer: list[Message] = []
+        self._buffered_at = 0.0
+        self._mirror: dict[TrialProperty, Any] | None = None
+        if frozen_trial is not None:
+            # Mirror is updated in place, so it must not share state with the frozen trial.
+            self._mirror = {
+                "params": dict(frozen_trial.params),
+                "distributions": dict(frozen_trial.distributions),
+                "user_attrs": dict(frozen_trial.user_attrs),
+                "datetime_start": frozen_trial.datetime_start,
+                "number": frozen_trial.number,
+            }
+
+    def _send_buffered(self, message: Message) -> None:
+        if self._buffer_size < 2:
+            self.connection.put(message)
+            return
+
+        if not self._buffer:
+            self._buffered_at = time.monotonic()
+
+        self._buffer.append(message)
+        is_full = len(self._buffer) >= self._buffer_size
+        if is_full or time.monotonic() - self._buffered_at >= self._buffer_timeout:
+            self.flush()
+
+    def flush(self) -> None:
+        """Sends all buffered messages to the study."""
+        if not self._buffer:
+            return
+
+        # Buffer is swapped before sending, so that messages which failed
+        # to serialize are dropped instead of being retried on every flush.
+        messages, self._buffer = self._buffer, []
+        self.connection.put(BatchMessage(self.trial_id, messages))
 
     def _suggest(self, name: str, distribution: BaseDistribution) -> Any:
         message = SuggestMessage(self.trial_id, name, distribution)
-        return self._send_message_and_wait_response(message)
+        value = self._send_message_and_wait_response(message)
+        self._update_mirror_params({name: value}, {name: distribution})
+        return value
+
+    def _update_mirror_params(
+        self, params: dict[str, Any], distributions: dict[str, BaseDistribution]
+    ) -> None:
+        if self._mirror is None:
+            return
+
+        # Study keeps distribution from the first suggestion of a parameter,
+        # later (compatible) suggestions just return already stored value.
+        for name, value in params.items():
+            self._mirror["params"].setdefault(name, value)
+            self._mirror["distributions"].setdefault(name, distributions[name])
 
     def _get_property(self, property: TrialProperty) -> Any:
+        if self._mirror is not None and property in self._mirror:
+            return copy.deepcopy(self._mirror[property])
+
         message = TrialPropertyMessage(self.trial_id, property)
         return self._send_message_and_wait_response(message)
 
     def _send_message_and_wait_response(self, message: Message) -> Any:
+        self.flush()
         self.connection.put(message)
         response = self.connection.get()
         assert isinstance(response, ResponseMessage)
@@ -183,6 +273,25 @@ class DistributedTrial:
         distribution = CategoricalDistribution(choices)
         return self._suggest(name, distribution)
 
+    def suggest_all(self, search_space: dict[str, BaseDistribution]) -> dict[str, Any]:
+        """Suggest values for all parameters in the search space at once.
+
+        Compared to calling ``suggest_*`` APIs one by one, all values are sampled
+        with a single request to the main process.
+
+        Args:
+            search_space:
+                A mapping from parameter names to their distributions, e.g.
+                ``{"x": FloatDistribution(-10, 10), "y": CategoricalDistribution([0, 1])}``.
+
+        Returns:
+            A mapping from parameter names to suggested values.
+        """
+        message = SuggestAllMessage(self.trial_id, search_space)
+        values = self._send_message_and_wait_response(message)
+        self._update_mirror_params(values, search_space)
+        return values
+
     def report(self, value: float, step: int) -> None:
         """Report an objective function value for a given step.
 
@@ -196,7 +305,7 @@ class DistributedTrial:
                 Step of the trial (e.g., Epoch of neural network training).
         """
         message = ReportMessage(self.trial_id, value, step)
-        self.connection.put(message)
+        self._send_buffered(message)
 
     def should_prune(self) -> bool:
         """Suggest whether the trial should be pruned or not.
@@ -207,6 +316,16 @@ class DistributedTrial:
         message = ShouldPruneMessage(self.trial_id)
         return self._send_message_and_wait_response(message)
 
+    def stop_study(self) -> None:
+        """Stop the study after running trials finish.
+
+        No new trials are started once main process recieves this request, while this and
+        other running trials are allowed to finish normally. This is a distributed
+        counterpart of calling ``trial.study.stop()`` in regular Optuna objective function.
+        """
+        self.flush()
+        self.connection.put(StopMessage(self.trial_id))
+
     def set_user_attr(self, key: str, value: Any) -> None:
         """Set user attributes to the trial.
 
@@ -220,7 +339,9 @@ class DistributedTrial:
                 A value of the attribute. The value should be able to serialize with pickle.
         """
         message = SetAttributeMessage(self.trial_id, key, value, kind="user")
-        self.connection.put(message)
+        self._send_buffered(message)
+        if self._mirror is not None:
+            self._mirror["user_attrs"][key] = value
 
     def set_system_attr(self, key: str, value: Any) -> None:
         """set system attributes to the trial.
@@ -235,7 +356,7 @@ class DistributedTrial:
                 A value of the attribute. The value should be able to serialize with pickle.
         """
         message = SetAttributeMessage(self.trial_id, key, value, kind="system")
-        self.connection.put(message)
+        self._send_buffered(message)
 
     @property
     def params(self) -> dict[str, Any]:
@@ -1,10 +1,26 @@
+from __future__ import annotations
+
+import asyncio
+import json
 import sys
+import threading
 import time
+from typing import Any
+from unittest.mock import Mock
 
+from dask.distributed import Client
 import optuna
+from optuna.trial import FrozenTrial
+from optuna.trial import TrialState
 import pytest
 
+from optuna_distributed.callbacks import CallbackExecutor
+from optuna_distributed.callbacks import CallbackFuncType
+from optuna_distributed.callbacks import OverflowPolicy
 from optuna_distributed.eventloop import EventLoop
+from optuna_distributed.instrumentation import EventLoopStats
+from optuna_distributed.instrumentation import Histogram
+from optuna_distributed.managers import DistributedOptimizationManager
 from optuna_distributed.managers import LocalOptimizationManager
 from optuna_distributed.terminal import Terminal
 from optuna_distributed.trial import DistributedTrial
@@ -54,3 +70,470 @@ def test_stops_optimization_after_timeout() -> None:
     event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials), timeout=1.0)
     interrupted_execution_time = time.time() - started_at
     assert interrupted_execution_time < uninterrupted_execution_time
+
+
+def _objective_returns_zero(trial: DistributedTrial) -> float:
+    return 0.0
+
+
+def test_runs_within_event_loop() -> None:
+    n_trials = 5
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials, n_jobs=2)
+    event_loop = EventLoop(study, manager, _objective_returns_zero, interrupt_patience=10.0)
+    terminal = Terminal(show_progress_bar=False, n_trials=n_trials)
+    asyncio.run(event_loop.run_async(terminal))
+    assert len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))) == n_trials
+
+
+def test_runs_from_running_event_loop() -> None:
+    n_trials = 5
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials, n_jobs=2)
+    event_loop = EventLoop(study, manager, _objective_returns_zero, interrupt_patience=10.0)
+
+    async def _run() -> None:
+        event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+
+    asyncio.run(_run())
+    assert len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))) == n_trials
+
+
+def test_runs_with_distributed_manager(client: Client) -> None:
+    n_trials = 5
+    study = optuna.create_study()
+    manager = DistributedOptimizationManager(client, n_trials)
+    event_loop = EventLoop(study, manager, _objective_returns_zero, interrupt_patience=10.0)
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    assert len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))) == n_trials
+
+
+class _ConcurrencyTrackingSampler(optuna.samplers.RandomSampler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.active = 0
+        self.max_active = 0
+
+    def sample_independent(self, *args: Any, **kwargs: Any) -> Any:
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        self.active -= 1
+        return super().sample_independent(*args, **kwargs)
+
+
+def _objective_suggests_and_reports(trial: DistributedTrial) -> float:
+    x = trial.suggest_float("x", -1.0, 1.0)
+    for step in range(10):
+        trial.report(float(step), step)
+    y = trial.suggest_int("y", 0, 10)
+    return x + y
+
+
+def test_processes_messages_concurrently() -> None:
+    n_trials = 8
+    sampler = _ConcurrencyTrackingSampler()
+    study = optuna.create_study(sampler=sampler)
+    manager = LocalOptimizationManager(n_trials, n_jobs=4)
+    event_loop = EventLoop(
+        study, manager, _objective_suggests_and_reports, interrupt_patience=10.0, message_threads=4
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    assert study.sampler is sampler
+    assert sampler.max_active == 1
+    trials = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    assert len(trials) == n_trials
+    for trial in trials:
+        assert trial.intermediate_values == {step: float(step) for step in range(10)}
+        assert trial.value == trial.params["x"] + trial.params["y"]
+
+
+def test_processes_messages_concurrently_with_exception() -> None:
+    n_trials = 5
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials, n_jobs=2)
+    event_loop = EventLoop(
+        study, manager, _objective_raises, interrupt_patience=10.0, message_threads=2
+    )
+    with pytest.raises(ValueError):
+        event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+
+
+def test_raises_on_invalid_message_threads() -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(1, n_jobs=1)
+    with pytest.raises(ValueError):
+        EventLoop(study, manager, _objective_raises, interrupt_patience=10.0, message_threads=0)
+
+
+@pytest.mark.parametrize("message_threads", [1, 2])
+def test_records_stats(message_threads: int) -> None:
+    n_trials = 4
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials, n_jobs=2)
+    stats = EventLoopStats()
+    event_loop = EventLoop(
+        study,
+        manager,
+        _objective_suggests_and_reports,
+        interrupt_patience=10.0,
+        message_threads=message_threads,
+        stats=stats,
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    recorded = json.loads(stats.to_json())
+    assert recorded["messages"]["SuggestMessage"] == 2 * n_trials
+    assert recorded["messages"]["ReportMessage"] == 10 * n_trials
+    assert recorded["messages"]["CompletedMessage"] == n_trials
+    assert recorded["processing_time"]["SuggestMessage"]["count"] == 2 * n_trials
+    assert recorded["queue_wait"]["ReportMessage"]["count"] == 10 * n_trials
+    assert recorded["worker_wait"]["SuggestMessage"]["count"] == 2 * n_trials
+    assert "ReportMessage" not in recorded["worker_wait"]
+    assert recorded["idle_time"] > 0.0
+
+
+def test_histogram_buckets() -> None:
+    histogram = Histogram()
+    for seconds in (0.0, 1.5e-6, 3e-6, 3.5e-6, 1.0):
+        histogram.record(seconds)
+
+    summary = histogram.to_dict()
+    assert summary["count"] == 5
+    assert summary["max"] == 1.0
+    assert summary["buckets"] == [[1e-6, 1], [2e-6, 1], [4e-6, 2], [2**20 / 1e6, 1]]
+
+
+def _objective_sleeps_on_odd_trials(trial: DistributedTrial) -> float:
+    if trial.number % 2:
+        time.sleep(60.0)
+    return 0.0
+
+
+def test_interrupts_trials_after_trial_timeout() -> None:
+    n_trials = 4
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials, n_jobs=2, trial_timeout=1.0)
+    event_loop = EventLoop(study, manager, _objective_sleeps_on_odd_trials, interrupt_patience=5.0)
+    started_at = time.time()
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    assert time.time() - started_at < 30.0
+    assert len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))) == 2
+    assert len(study.get_trials(deepcopy=False, states=(TrialState.FAIL,))) == 2
+
+
+def _objective_suggests_until_interrupted(trial: DistributedTrial) -> float:
+    try:
+        while True:
+            trial.suggest_float("x", 0.0, 1.0)
+    except Exception:
+        return 0.0
+
+
+def test_replaces_workers_interrupted_while_communicating() -> None:
+    n_trials = 3
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(
+        n_trials, n_jobs=1, max_trials_per_worker=None, trial_timeout=0.5
+    )
+    event_loop = EventLoop(
+        study, manager, _objective_suggests_until_interrupted, interrupt_patience=5.0
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    assert len(study.get_trials(deepcopy=False, states=(TrialState.FAIL,))) == n_trials
+    assert not manager._processes
+
+
+def _objective_naps_on_odd_trials(trial: DistributedTrial) -> float:
+    # Worker threads are interrupted between Python instructions, not within a long sleep.
+    if trial.number % 2:
+        for _ in range(600):
+            time.sleep(0.1)
+    return 0.0
+
+
+def test_interrupts_distributed_trials_after_trial_timeout(client: Client) -> None:
+    n_trials = 4
+    study = optuna.create_study()
+    manager = DistributedOptimizationManager(client, n_trials, trial_timeout=1.0)
+    event_loop = EventLoop(study, manager, _objective_naps_on_odd_trials, interrupt_patience=10.0)
+    started_at = time.time()
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    assert time.time() - started_at < 30.0
+    assert len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))) == 2
+    assert len(study.get_trials(deepcopy=False, states=(TrialState.FAIL,))) == 2
+
+
+def _collect_trial_numbers(numbers: list[int]) -> CallbackFuncType:
+    def _callback(study: optuna.Study, trial: FrozenTrial) -> None:
+        numbers.append(trial.number)
+
+    return _callback
+
+
+@pytest.mark.parametrize("message_threads", [1, 2])
+def test_runs_callbacks(message_threads: int) -> None:
+    n_trials = 5
+    numbers: list[int] = []
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials, n_jobs=2)
+    callbacks = CallbackExecutor([_collect_trial_numbers(numbers)])
+    event_loop = EventLoop(
+        study,
+        manager,
+        _objective_returns_zero,
+        interrupt_patience=10.0,
+        message_threads=message_threads,
+        callbacks=callbacks,
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    assert sorted(numbers) == list(range(n_trials))
+
+
+def test_skips_fetching_trials_without_callbacks(monkeypatch: pytest.MonkeyPatch) -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials=1, n_jobs=1)
+    event_loop = EventLoop(study, manager, _objective_returns_zero, interrupt_patience=10.0)
+    get_trial = Mock()
+    monkeypatch.setattr(event_loop.study._storage, "get_trial", get_trial)
+    event_loop._submit_callbacks(0, Terminal(show_progress_bar=False, n_trials=1))
+    get_trial.assert_not_called()
+
+
+def _stop_after_second_trial(study: optuna.Study, trial: FrozenTrial) -> None:
+    if trial.number == 1:
+        study.stop()
+
+
+def _objective_naps(trial: DistributedTrial) -> float:
+    time.sleep(0.1)
+    return 0.0
+
+
+def test_stops_from_callback() -> None:
+    n_trials = 50
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials, n_jobs=1)
+    callbacks = CallbackExecutor([_stop_after_second_trial])
+    event_loop = EventLoop(
+        study, manager, _objective_naps, interrupt_patience=10.0, callbacks=callbacks
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    trials = study.get_trials(deepcopy=False)
+    assert 2 <= len(trials) < n_trials
+    assert all(trial.state == TrialState.COMPLETE for trial in trials)
+
+
+def test_stops_distributed_optimization_from_callback(client: Client) -> None:
+    n_trials = 50
+    study = optuna.create_study()
+    manager = DistributedOptimizationManager(client, n_trials)
+    callbacks = CallbackExecutor([_stop_after_second_trial])
+    event_loop = EventLoop(
+        study, manager, _objective_naps, interrupt_patience=10.0, callbacks=callbacks
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    completed = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    assert 2 <= len(completed) < n_trials
+    assert not study.get_trials(deepcopy=False, states=(TrialState.RUNNING,))
+
+
+def _callback_raises(study: optuna.Study, trial: FrozenTrial) -> None:
+    raise ValueError()
+
+
+def test_raises_on_callback_exception() -> None:
+    n_trials = 5
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials, n_jobs=1)
+    callbacks = CallbackExecutor([_callback_raises])
+    event_loop = EventLoop(
+        study, manager, _objective_returns_zero, interrupt_patience=10.0, callbacks=callbacks
+    )
+    with pytest.raises(ValueError):
+        event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+
+
+@pytest.mark.parametrize(
+    "overflow,expected",
+    [("block", [0, 1, 2, 3, 4, 5]), ("drop_oldest", [0, 4, 5]), ("coalesce", [0, 5])],
+)
+def test_callback_overflow(overflow: OverflowPolicy, expected: list[int]) -> None:
+    numbers: list[int] = []
+    released = threading.Event()
+
+    def _callback(study: optuna.Study, trial: FrozenTrial) -> None:
+        released.wait()
+        numbers.append(trial.number)
+
+    study = optuna.create_study()
+    callbacks = CallbackExecutor([_callback], max_queue_size=2, overflow=overflow)
+    callbacks.start(study)
+    trials = [study.ask() for _ in range(6)]
+    for trial in trials:
+        if overflow == "block" and trial.number == 3:
+            released.set()
+        callbacks.submit(study._storage.get_trial(trial._trial_id))
+        # Let the callback thread pick up the first trial.
+        time.sleep(0.05)
+
+    released.set()
+    callbacks.close()
+    assert numbers == expected
+
+
+def test_callback_executor_raises_on_invalid_arguments() -> None:
+    with pytest.raises(ValueError):
+        CallbackExecutor([], max_queue_size=0)
+
+    with pytest.raises(ValueError):
+        CallbackExecutor([], overflow="foo")  # type: ignore
+
+
+def _objective_stops_study(trial: DistributedTrial) -> float:
+    if trial.number == 1:
+        trial.stop_study()
+    time.sleep(0.1)
+    return 0.0
+
+
+@pytest.mark.parametrize("message_threads", [1, 2])
+def test_stops_from_trial(message_threads: int) -> None:
+    n_trials = 50
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials, n_jobs=2)
+    event_loop = EventLoop(
+        study,
+        manager,
+        _objective_stops_study,
+        interrupt_patience=10.0,
+        message_threads=message_threads,
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    trials = study.get_trials(deepcopy=False)
+    assert 2 <= len(trials) < n_trials
+    assert all(trial.state == TrialState.COMPLETE for trial in trials)
+
+
+def test_stops_distributed_optimization_from_trial(client: Client) -> None:
+    n_trials = 50
+    study = optuna.create_study()
+    manager = DistributedOptimizationManager(client, n_trials)
+    event_loop = EventLoop(study, manager, _objective_stops_study, interrupt_patience=10.0)
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    completed = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    assert 2 <= len(completed) < n_trials
+    assert not study.get_trials(deepcopy=False, states=(TrialState.RUNNING,))
+    assert not manager._futures
+
+
+@pytest.mark.parametrize("message_threads", [1, 2])
+def test_runs_until_stopped_without_trial_budget(message_threads: int) -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(None, n_jobs=2)
+    event_loop = EventLoop(
+        study,
+        manager,
+        _objective_stops_study,
+        interrupt_patience=10.0,
+        message_threads=message_threads,
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=None))
+    trials = study.get_trials(deepcopy=False)
+    assert len(trials) >= 2
+    assert all(trial.state == TrialState.COMPLETE for trial in trials)
+
+
+def test_runs_until_timeout_without_trial_budget() -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(None, n_jobs=2)
+    event_loop = EventLoop(study, manager, _objective_naps, interrupt_patience=10.0)
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=None), timeout=2.0)
+    assert study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    assert not study.get_trials(deepcopy=False, states=(TrialState.RUNNING,))
+
+
+def test_runs_distributed_optimization_until_stopped_without_trial_budget(
+    client: Client,
+) -> None:
+    study = optuna.create_study()
+    manager = DistributedOptimizationManager(client, None)
+    event_loop = EventLoop(study, manager, _objective_stops_study, interrupt_patience=10.0)
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=None))
+    completed = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    assert len(completed) >= 2
+    assert not study.get_trials(deepcopy=False, states=(TrialState.RUNNING,))
+    assert not manager._futures
+
+
+def test_runs_distributed_optimization_with_limited_concurrency(client: Client) -> None:
+    n_trials = 6
+    study = optuna.create_study()
+    manager = DistributedOptimizationManager(client, n_trials, max_concurrent_trials=2)
+    manager.create_futures(study, _objective_naps)
+    assert len(study.get_trials(deepcopy=False)) == 2
+
+    event_loop = EventLoop(study, manager, _objective_naps, interrupt_patience=10.0)
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    completed = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    assert len(completed) == n_trials
+
+
+class _TrialCountingSampler(optuna.samplers.RandomSampler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.trials_started = 0
+
+    def before_trial(self, study: optuna.Study, trial: FrozenTrial) -> None:
+        self.trials_started += 1
+
+
+@pytest.mark.parametrize("message_threads", [1, 2])
+def test_reuses_trial_objects(message_threads: int) -> None:
+    n_trials = 5
+    sampler = _TrialCountingSampler()
+    study = optuna.create_study(sampler=sampler)
+    manager = LocalOptimizationManager(n_trials, n_jobs=2)
+    event_loop = EventLoop(
+        study,
+        manager,
+        _objective_suggests_and_reports,
+        interrupt_patience=10.0,
+        message_threads=message_threads,
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    assert len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))) == n_trials
+    assert sampler.trials_started == n_trials
+    assert len(manager._trials) == 0
+
+
+def test_reuses_distributed_trial_objects(client: Client) -> None:
+    n_trials = 5
+    sampler = _TrialCountingSampler()
+    study = optuna.create_study(sampler=sampler)
+    manager = DistributedOptimizationManager(client, n_trials)
+    event_loop = EventLoop(
+        study, manager, _objective_suggests_and_reports, interrupt_patience=10.0
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    assert len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))) == n_trials
+    assert sampler.trials_started == n_trials
+    assert len(manager._trials) == 0
+
+
+def test_runs_enqueued_distributed_trials(client: Client) -> None:
+    study = optuna.create_study()
+    study.enqueue_trial({"x": 0.5, "y": 3})
+    manager = DistributedOptimizationManager(client, n_trials=1)
+    event_loop = EventLoop(
+        study, manager, _objective_suggests_and_reports, interrupt_patience=10.0
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=1))
+    assert study.trials[0].params == {"x": 0.5, "y": 3}
+    assert study.trials[0].state == TrialState.COMPLETE
+
+
+def test_raises_on_invalid_max_pending_writes() -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(1, n_jobs=1)
+    with pytest.raises(ValueError):
+        EventLoop(study, manager, _objective_returns_zero, 10.0, max_pending_writes=-1)
@@ -1,16 +1,46 @@
+from __future__ import annotations
+
 import asyncio
+import gc
+from multiprocessing import AuthenticationError
 from multiprocessing import Process
+from multiprocessing import resource_tracker
 from multiprocessing.connection import Pipe as MultiprocessingPipe
+from multiprocessing.reduction import ForkingPickler
+from multiprocessing.shared_memory import SharedMemory
+import os
+import pickle
+import socket
 import time
+from typing import Callable
+import uuid
 
 from dask.distributed import Client
 from dask.distributed import wait
+from optuna.distributions import CategoricalDistribution
+from optuna.distributions import FloatDistribution
+from optuna.distributions import IntDistribution
 import pytest
 
 from optuna_distributed.ipc import IPCPrimitive
+from optuna_distributed.ipc import IPCServer
 from optuna_distributed.ipc import Pipe
+from optuna_distributed.ipc import PubSub
+from optuna_distributed.ipc import PubSubServer
 from optuna_distributed.ipc import Queue
+from optuna_distributed.ipc import QueueServer
+from optuna_distributed.ipc import SharedMemoryPipe
+from optuna_distributed.ipc import Stream
+from optuna_distributed.ipc import StreamServer
+from optuna_distributed.ipc.codec import decode
+from optuna_distributed.ipc.codec import encode
+from optuna_distributed.ipc.pubsub import _imported as _pubsub_imported
+from optuna_distributed.messages import CompletedMessage
+from optuna_distributed.messages import Message
+from optuna_distributed.messages import ReportMessage
 from optuna_distributed.messages import ResponseMessage
+from optuna_distributed.messages import ShouldPruneMessage
+from optuna_distributed.messages import SuggestMessage
 
 
 def _ping_pong(conn: IPCPrimitive) -> None:
@@ -34,6 +64,60 @@ def test_pipe_ping_pong() -> None:
     assert p.exitcode == 0
 
 
+@pytest.mark.parametrize("capacity", [1024, 1])
+def test_shared_memory_pipe_ping_pong(capacity: int) -> None:
+    a, b = MultiprocessingPipe()
+    memory = SharedMemoryPipe.allocate(capacity)
+    p = Process(target=_ping_pong, args=(SharedMemoryPipe(b, memory, capacity, master=False),))
+    p.start()
+
+    master = SharedMemoryPipe(a, memory, capacity, master=True)
+    master.put(ResponseMessage(0, "ping"))
+    response = master.get()
+    assert isinstance(response, ResponseMessage)
+    assert response.data == "pong"
+    p.join()
+    assert p.exitcode == 0
+    master.close()
+
+
+def test_shared_memory_pipe_wraps_around() -> None:
+    a, b = MultiprocessingPipe()
+    memory = SharedMemoryPipe.allocate(256)
+    master = SharedMemoryPipe(a, memory, 256, master=True)
+    worker = SharedMemoryPipe(b, SharedMemory(memory.name), 256, master=False)
+    for payload in range(100):
+        master.put(ResponseMessage(0, payload))
+        master.put(ResponseMessage(0, "x" * 300))
+        response = worker.get()
+        assert isinstance(response, ResponseMessage)
+        assert response.data == payload
+        response = worker.get()
+        assert isinstance(response, ResponseMessage)
+        assert response.data == "x" * 300
+
+    worker.close()
+    master.close()
+
+
+def test_shared_memory_pipe_attached_untracked(monkeypatch: pytest.MonkeyPatch) -> None:
+    a, b = MultiprocessingPipe()
+    memory = SharedMemoryPipe.allocate(1024)
+    master = SharedMemoryPipe(a, memory, 1024, master=True)
+    registered: list[str] = []
+    monkeypatch.setattr(resource_tracker, "register", lambda name, _: registered.append(name))
+
+    worker = pickle.loads(ForkingPickler.dumps(SharedMemoryPipe(b, memory, 1024, master=False)))
+    master.put(ResponseMessage(0, "ping"))
+    response = worker.get()
+    assert isinstance(response, ResponseMessage)
+    assert response.data == "ping"
+    assert not registered
+
+    worker.close()
+    master.close()
+
+
 def test_queue_ping_pong(client: Client) -> None:
     public = "public"
     private = "private"
@@ -87,3 +171,273 @@ def test_queue_get_delayed_message(client: Client) -> None:
     wait(future)
     assert future.done()
     assert future.status == "finished"
+
+
+def _pong_ping(conn: IPCPrimitive) -> None:
+    conn.put(ResponseMessage(0, "ping"))
+    msg = conn.get()
+    assert isinstance(msg, ResponseMessage)
+    assert msg.data == "pong"
+    conn.close()
+
+
+def test_stream_ping_pong(client: Client) -> None:
+    server = StreamServer(timeout=10)
+    future = client.submit(_pong_ping, server.assign(0))
+    request = server.get()
+    assert isinstance(request, ResponseMessage)
+    assert request.data == "ping"
+    server.get_connection(0).put(ResponseMessage(0, "pong"))
+    wait(future)
+    assert future.status == "finished"
+    server.close()
+
+
+def test_stream_server_loopback() -> None:
+    server = StreamServer(host="127.0.0.1", timeout=1)
+    server.put(ResponseMessage(0, "foo"))
+    msg = server.get()
+    assert isinstance(msg, ResponseMessage)
+    assert msg.data == "foo"
+    server.close()
+
+
+def test_stream_server_raises_after_timeout() -> None:
+    server = StreamServer(host="127.0.0.1", timeout=1)
+    with pytest.raises(asyncio.TimeoutError):
+        server.get()
+    server.close()
+
+
+def test_stream_rejects_wrong_authkey() -> None:
+    server = StreamServer(host="127.0.0.1", timeout=1)
+    stream = Stream(server.address, authkey=b"foo", trial_id=0)
+    with pytest.raises(AuthenticationError):
+        stream.put(ResponseMessage(0, "foo"))
+    server.close()
+
+
+def test_stream_server_accepts_past_stalled_client() -> None:
+    server = StreamServer(host="127.0.0.1", timeout=5)
+    stalled = socket.create_connection(server.address)
+    stream = server.assign(0)
+    stream.put(ResponseMessage(0, "foo"))
+    msg = server.get()
+    assert isinstance(msg, ResponseMessage)
+    assert msg.data == "foo"
+
+    stream.close()
+    stalled.close()
+    server.close()
+    assert server._loopback_reader.closed
+    assert server._loopback_writer.closed
+
+
+def test_queue_server_ping_pong(client: Client) -> None:
+    server = QueueServer(timeout=10)
+    future = client.submit(_pong_ping, server.assign(0))
+    request = server.get()
+    assert isinstance(request, ResponseMessage)
+    assert request.data == "ping"
+    server.get_connection(0).put(ResponseMessage(0, "pong"))
+    wait(future)
+    assert future.status == "finished"
+
+
+_requires_pubsub = pytest.mark.skipif(not _pubsub_imported, reason="Pub/Sub not available.")
+
+
+@pytest.mark.parametrize(
+    "make_server",
+    [
+        lambda: QueueServer(timeout=10),
+        pytest.param(lambda: PubSubServer(timeout=10), marks=_requires_pubsub),
+        lambda: StreamServer(host="127.0.0.1", timeout=10),
+    ],
+    ids=["queue", "pubsub", "stream"],
+)
+def test_server_get_available(client: Client, make_server: Callable[[], IPCServer]) -> None:
+    server = make_server()
+    assert server.get_available() == []
+    for step in range(3):
+        server.put(ReportMessage(0, 0.0, step))
+
+    received = [server.get()]
+    deadline = time.time() + 10
+    while len(received) < 3 and time.time() < deadline:
+        received.extend(server.get_available())
+
+    steps = [message._step for message in received if isinstance(message, ReportMessage)]
+    assert steps == [0, 1, 2]
+    server.close()
+
+
+@pytest.mark.parametrize(
+    "make_server",
+    [
+        lambda: QueueServer(timeout=10),
+        pytest.param(lambda: PubSubServer(timeout=10), marks=_requires_pubsub),
+        lambda: StreamServer(host="127.0.0.1", timeout=10),
+    ],
+    ids=["queue", "pubsub", "stream"],
+)
+def test_server_get_batch(client: Client, make_server: Callable[[], IPCServer]) -> None:
+    server = make_server()
+    for step in range(3):
+        server.put(ReportMessage(0, 0.0, step))
+
+    received: list[Message] = []
+    deadline = time.time() + 10
+    while len(received) < 3 and time.time() < deadline:
+        batch = server.get_batch()
+        assert batch
+        received.extend(batch)
+
+    steps = [message._step for message in received if isinstance(message, ReportMessage)]
+    assert steps == [0, 1, 2]
+    server.close()
+
+
+@_requires_pubsub
+def test_pubsub_server_ping_pong(client: Client) -> None:
+    server = PubSubServer(timeout=10)
+    future = client.submit(_pong_ping, server.assign(0))
+    request = server.get()
+    assert isinstance(request, ResponseMessage)
+    assert request.data == "ping"
+    server.get_connection(0).put(ResponseMessage(0, "pong"))
+    wait(future)
+    assert future.status == "finished"
+    server.close()
+
+
+@_requires_pubsub
+def test_pubsub_server_reuses_response_connection(client: Client) -> None:
+    server = PubSubServer(timeout=10)
+    server.assign(0)
+    connection = server.get_connection(0)
+    assert server.get_connection(0) is connection
+    server.release(0)
+    with pytest.raises(KeyError):
+        server.get_connection(0)
+    server.close()
+
+
+@_requires_pubsub
+def test_pubsub_server_loopback(client: Client) -> None:
+    server = PubSubServer(timeout=10)
+    server.put(ResponseMessage(0, "foo"))
+    msg = server.get()
+    assert isinstance(msg, ResponseMessage)
+    assert msg.data == "foo"
+    server.close()
+
+
+@_requires_pubsub
+def test_pubsub_publishing_only(client: Client) -> None:
+    pubsub = PubSub("foo")
+    with pytest.raises(RuntimeError):
+        pubsub.get()
+
+
+@_requires_pubsub
+def test_pubsub_raises_after_timeout(client: Client) -> None:
+    pubsub = PubSub("foo", "bar", timeout=1)
+    with pytest.raises(asyncio.TimeoutError):
+        pubsub.get()
+    pubsub.close()
+
+
+@_requires_pubsub
+def test_pubsub_unsubscribes_on_close(client: Client) -> None:
+    names = [str(uuid.uuid4()) for _ in range(10)]
+    for name in names:
+        pubsub = PubSub("foo", name, timeout=1)
+        pubsub._initialize()
+        pubsub.close()
+
+    # Cleanup of client side extension must not remove topics again.
+    gc.collect()
+    extension = client.extensions["pubsub"]
+    client.sync(asyncio.sleep, 0.5)
+    assert not set(names) & set(extension.subscribers)
+    assert client.submit(lambda: 1).result() == 1
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        ShouldPruneMessage(0),
+        ReportMessage(1, 0.5, 2),
+        ResponseMessage(2, None),
+        ResponseMessage(3, True),
+        ResponseMessage(4, -1),
+        ResponseMessage(5, 1.5),
+        ResponseMessage(6, "foo"),
+        SuggestMessage(7, "x", FloatDistribution(-1.0, 1.0)),
+        SuggestMessage(8, "x", FloatDistribution(1e-5, 1.0, log=True)),
+        SuggestMessage(9, "x", FloatDistribution(0.0, 1.0, step=0.1)),
+        SuggestMessage(10, "x", IntDistribution(0, 10, step=2)),
+        SuggestMessage(11, "x", IntDistribution(1, 2**10, log=True)),
+        ResponseMessage(12, "\ud800"),
+        SuggestMessage(13, "\udcff", FloatDistribution(-1.0, 1.0)),
+        SuggestMessage(14, "\udcff", IntDistribution(0, 10)),
+    ],
+)
+def test_codec_encodes_hot_messages(message: Message) -> None:
+    encoded = encode(message)
+    assert encoded[0] != 0
+    decoded = decode(encoded)
+    assert type(decoded) is type(message)
+    assert vars(decoded) == vars(message)
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        CompletedMessage(0, 1.0),
+        ReportMessage(1, 1, 2),
+        ResponseMessage(2, [1, 2]),
+        ResponseMessage(3, 2**64),
+        SuggestMessage(4, "x", CategoricalDistribution(["a", "b"])),
+    ],
+)
+def test_codec_falls_back_to_pickle(message: Message) -> None:
+    encoded = encode(message)
+    assert encoded[0] == 0
+    decoded = decode(encoded)
+    assert type(decoded) is type(message)
+    assert vars(decoded) == vars(message)
+
+
+def test_codec_compresses_large_messages() -> None:
+    message = ResponseMessage(0, {"importances": [0.0] * 10_000})
+    encoded = encode(message, compression_threshold=1024)
+    assert encoded[0] & 0x80
+    assert len(encoded) < len(encode(message))
+    decoded = decode(encoded)
+    assert isinstance(decoded, ResponseMessage)
+    assert decoded.data == message.data
+
+
+@pytest.mark.parametrize("compression_threshold", [None, 1024])
+def test_codec_skips_compression(compression_threshold: int | None) -> None:
+    message = SuggestMessage(0, "x", FloatDistribution(-1.0, 1.0))
+    assert encode(message, compression_threshold) == encode(message)
+
+
+def test_codec_skips_incompressible_messages() -> None:
+    message = ResponseMessage(0, os.urandom(10_000))
+    encoded = encode(message, compression_threshold=1024)
+    assert not encoded[0] & 0x80
+    decoded = decode(encoded)
+    assert isinstance(decoded, ResponseMessage)
+    assert decoded.data == message.data
+
+
+def test_queue_compressed_message(client: Client) -> None:
+    q = Queue("compressed", "compressed", timeout=10, compression_threshold=1024)
+    q.put(ResponseMessage(0, "x" * 10_000))
+    msg = q.get()
+    assert isinstance(msg, ResponseMessage)
+    assert msg.data == "x" * 10_000
@@ -1,26 +1,43 @@
+import asyncio
+from collections.abc import Generator
 from dataclasses import dataclass
 import multiprocessing
+import os
 import sys
+import threading
 import time
 from unittest.mock import Mock
-import uuid
 
 from dask.distributed import Client
+from dask.distributed import Event
 from dask.distributed import Variable
 from dask.distributed import wait
 import optuna
+from optuna.distributions import FloatDistribution
 import pytest
 
+from optuna_distributed.ipc.pubsub import _imported as _pubsub_imported
 from optuna_distributed.managers import DistributedOptimizationManager
 from optuna_distributed.managers import LocalOptimizationManager
 from optuna_distributed.managers import ObjectiveFuncType
+from optuna_distributed.managers import Transport
+from optuna_distributed.managers.base import prioritize
+from optuna_distributed.managers.distributed import WorkerInterrupted
+from optuna_distributed.managers.distributed import _InterruptListener
+from optuna_distributed.managers.distributed import _MAX_EXITED_TASKS
 from optuna_distributed.managers.distributed import _StateSynchronizer
 from optuna_distributed.managers.distributed import _TaskContext
 from optuna_distributed.managers.distributed import _TaskState
 from optuna_distributed.managers.distributed import _distributable
+from optuna_distributed.managers.distributed import _listeners
+from optuna_distributed.managers.local import _Worker
 from optuna_distributed.messages import CompletedMessage
 from optuna_distributed.messages import HeartbeatMessage
+from optuna_distributed.messages import Message
+from optuna_distributed.messages import ReportMessage
 from optuna_distributed.messages import ResponseMessage
+from optuna_distributed.messages import ShouldPruneMessage
+from optuna_distributed.messages import SuggestMessage
 from optuna_distributed.trial import DistributedTrial
 
 
@@ -37,6 +54,57 @@ def test_distributed_get_message(client: Client) -> None:
             break
 
 
+def test_distributed_creates_trial_objects_lazily(client: Client) -> None:
+    n_trials = 5
+    study = optuna.create_study()
+    manager = DistributedOptimizationManager(client, n_trials)
+    manager.create_futures(study, lambda trial: 0.0)
+    assert len(manager._trials) == 0
+
+    for message in manager.get_message():
+        assert isinstance(message, CompletedMessage)
+        trial = manager.get_trial(study, message._trial_id)
+        assert manager.get_trial(study, message._trial_id) is trial
+        break
+
+    assert len(manager._trials) == 1
+    wait(list(manager._futures.values()))
+
+
+@pytest.mark.parametrize(
+    "transport",
+    [
+        "queue",
+        pytest.param(
+            "pubsub",
+            marks=pytest.mark.skipif(not _pubsub_imported, reason="Pub/Sub not available."),
+        ),
+        "stream",
+    ],
+)
+def test_distributed_transports(client: Client, transport: Transport) -> None:
+    def _objective(trial: DistributedTrial) -> float:
+        return trial.suggest_float("x", 0.0, 1.0)
+
+    n_trials = 5
+    study = optuna.create_study()
+    manager = DistributedOptimizationManager(client, n_trials, transport=transport)
+    manager.create_futures(study, _objective)
+    for message in manager.get_message():
+        message.process(study, manager)
+        if manager.should_end_optimization():
+            break
+
+    completed = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+    assert len(completed) == n_trials
+    assert all(trial.value == trial.params["x"] for trial in completed)
+
+
+def test_distributed_raises_on_unknown_transport(client: Client) -> None:
+    with pytest.raises(ValueError):
+        DistributedOptimizationManager(client, n_trials=1, transport="foo")  # type: ignore
+
+
 def test_distributed_heartbeat_on_timeout(client: Client) -> None:
     def _objective(trial: DistributedTrial) -> float:
         time.sleep(2.0)
@@ -51,7 +119,44 @@ def test_distributed_heartbeat_on_timeout(client: Client) -> None:
         assert 0.8 < time.time() - start < 1.2
         break
 
-    wait(manager._futures)
+    wait(list(manager._futures.values()))
+
+
+def test_distributed_keeps_messages_pumped_after_stop(client: Client) -> None:
+    fetching = threading.Event()
+    released = threading.Event()
+
+    def _get_message() -> Generator[Message, None, None]:
+        yield HeartbeatMessage()
+        fetching.set()
+        released.wait()
+        yield CompletedMessage(0, 0.0)
+
+    def _no_messages() -> Generator[Message, None, None]:
+        fetching.set()
+        yield from ()
+
+    async def _first(manager: DistributedOptimizationManager) -> Message:
+        messages = manager.get_message_async()
+        message = await messages.__anext__()
+        await asyncio.get_running_loop().run_in_executor(None, fetching.wait)
+        await messages.aclose()
+        return message
+
+    manager = DistributedOptimizationManager(client, n_trials=1)
+    manager.get_message = _get_message  # type: ignore[method-assign]
+    assert isinstance(asyncio.run(_first(manager)), HeartbeatMessage)
+
+    # Message arriving after event loop stopped listening is kept for the next one.
+    released.set()
+    deadline = time.time() + 5.0
+    while not manager._pumped and time.time() < deadline:
+        time.sleep(0.01)
+
+    manager.get_message = _no_messages  # type: ignore[method-assign]
+    message = asyncio.run(_first(manager))
+    assert isinstance(message, CompletedMessage)
+    assert message._trial_id == 0
 
 
 def test_distributed_should_end_optimization(client: Client) -> None:
@@ -72,6 +177,24 @@ def test_distributed_should_end_optimization(client: Client) -> None:
     assert closing_messages_recieved == n_trials
 
 
+def test_distributed_registers_cancelled_tasks_in_event_loop(client: Client) -> None:
+    def _objective(trial: DistributedTrial) -> float:
+        time.sleep(0.5)
+        return 0.0
+
+    study = optuna.create_study()
+    manager = DistributedOptimizationManager(client, n_trials=1)
+    manager.create_futures(study, _objective)
+    client.cancel(list(manager._futures.values()))
+    assert isinstance(next(manager.get_message()), HeartbeatMessage)
+
+    # Exit of a cancelled task is registered only after message is processed.
+    assert manager._futures
+    manager.after_message(Mock(study=study, objective=_objective))
+    assert not manager._futures
+    assert manager.should_end_optimization()
+
+
 def test_distributed_stops_optimization(client: Client) -> None:
     uninterrupted_execution_time = 100
 
@@ -88,7 +211,7 @@ def test_distributed_stops_optimization(client: Client) -> None:
     manager.stop_optimization(patience=10.0)
     interrupted_execution_time = time.time() - stopped_at
     assert interrupted_execution_time < uninterrupted_execution_time
-    for future in manager._futures:
+    for future in manager._futures.values():
         assert future.cancelled()
 
 
@@ -125,46 +248,125 @@ def test_distributed_task_deduped(client: Client) -> None:
 
     run_count = Variable("run_count")
     run_count.set(0)
-    state_id = uuid.uuid4().hex
-    Variable(state_id).set(_TaskState.WAITING)
+    synchronizer = _StateSynchronizer(client)
 
     # Simulate scenario where task run was repeated.
     # https://stackoverflow.com/a/41965766
     func = _distributable(_objective)
-    context = _TaskContext(DistributedTrial(0, Mock()), stop_flag="foo", state_id=state_id)
+    context = _TaskContext(
+        DistributedTrial(0, Mock()),
+        stop_flag=synchronizer.stop_flag,
+        task_states=synchronizer.task_states,
+    )
     for _ in range(5):
         client.submit(func, context).result()
 
     assert run_count.get() == 1
+    assert synchronizer.task_states.get().result() == {0: _TaskState.FINISHED}
 
 
-def test_synchronizer_optimization_enabled() -> None:
-    synchronizer = _StateSynchronizer()
-    optimization_enabled = Variable(synchronizer.stop_flag)
-    assert optimization_enabled.get()
+def test_synchronizer_optimization_enabled(client: Client) -> None:
+    synchronizer = _StateSynchronizer(client)
+    optimization_stopped = Event(synchronizer.stop_flag)
+    assert not optimization_stopped.is_set()
 
 
-def test_synchronizer_emits_stop() -> None:
-    synchronizer = _StateSynchronizer()
+def test_synchronizer_emits_stop(client: Client) -> None:
+    synchronizer = _StateSynchronizer(client)
     synchronizer.emit_stop_and_wait(1)
-    optimization_enabled = Variable(synchronizer.stop_flag)
-    assert not optimization_enabled.get()
+    optimization_stopped = Event(synchronizer.stop_flag)
+    assert optimization_stopped.is_set()
+
 
+def test_synchronizer_skips_waiting_tasks(client: Client) -> None:
+    synchronizer = _StateSynchronizer(client)
+    assert synchronizer.task_states.start(0).result()
+    assert synchronizer.skip_waiting(range(3)) == [1, 2]
+    assert not synchronizer.task_states.start(1).result()
+    task_states = synchronizer.task_states.get().result()
+    assert task_states == {0: _TaskState.RUNNING, 1: _TaskState.FINISHED, 2: _TaskState.FINISHED}
 
-def test_synchronizer_states_created() -> None:
-    synchronizer = _StateSynchronizer()
-    states = [Variable(synchronizer.set_initial_state()) for _ in range(10)]
-    assert all(_TaskState(state.get()) is _TaskState.WAITING for state in states)
 
+def test_synchronizer_removes_exited_tasks(client: Client) -> None:
+    synchronizer = _StateSynchronizer(client)
+    for trial_id in range(_MAX_EXITED_TASKS + 1):
+        synchronizer.task_states.start(trial_id).result()
+        synchronizer.register_exit(trial_id)
+    task_states = synchronizer.task_states.get().result()
+    assert task_states == {_MAX_EXITED_TASKS: _TaskState.RUNNING}
 
-def test_synchronizer_timeout() -> None:
-    synchronizer = _StateSynchronizer()
-    task_state = Variable(synchronizer.set_initial_state())
-    task_state.set(_TaskState.RUNNING)
+
+def test_synchronizer_deletes_state(client: Client) -> None:
+    synchronizer = _StateSynchronizer(client)
+    task_states = synchronizer.task_states
+    synchronizer.close()
+    assert task_states.get().result() is None
+    assert not synchronizer.skip_waiting([0])
+    assert not task_states.start(0).result()
+    synchronizer.emit_stop_and_wait(0)
+
+
+def test_synchronizer_states_kept_separately(client: Client) -> None:
+    synchronizers = [_StateSynchronizer(client) for _ in range(2)]
+    assert all(synchronizer.task_states.start(0).result() for synchronizer in synchronizers)
+    for synchronizer in synchronizers:
+        assert synchronizer.task_states.get().result() == {0: _TaskState.RUNNING}
+
+
+def test_synchronizer_timeout(client: Client) -> None:
+    synchronizer = _StateSynchronizer(client)
+    synchronizer.task_states.start(0).result()
     with pytest.raises(TimeoutError):
         synchronizer.emit_stop_and_wait(0)
 
 
+def test_listener_interrupts_all_tasks_in_process(client: Client) -> None:
+    synchronizer = _StateSynchronizer(client)
+    context = _TaskContext(
+        DistributedTrial(0, Mock()),
+        stop_flag=synchronizer.stop_flag,
+        task_states=synchronizer.task_states,
+    )
+    registered = threading.Barrier(4)
+    interrupted: list[int] = []
+
+    def _task() -> None:
+        _InterruptListener.register(context)
+        try:
+            registered.wait()
+            while True:
+                time.sleep(0.01)
+        except WorkerInterrupted:
+            interrupted.append(threading.get_ident())
+        finally:
+            _InterruptListener.unregister(context)
+
+    threads = [threading.Thread(target=_task) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    registered.wait()
+    assert list(_listeners) == [synchronizer.stop_flag]
+
+    synchronizer.emit_stop_and_wait(1)
+    for thread in threads:
+        thread.join(5.0)
+    assert len(set(interrupted)) == len(threads)
+
+
+def test_prioritize_serves_blocking_messages_first() -> None:
+    messages = [
+        ReportMessage(0, 0.0, 0),
+        ReportMessage(1, 0.0, 0),
+        HeartbeatMessage(),
+        ShouldPruneMessage(1),
+        ReportMessage(2, 0.0, 0),
+        SuggestMessage(2, "x", FloatDistribution(0.0, 1.0)),
+        ReportMessage(2, 0.0, 1),
+    ]
+    expected = [messages[i] for i in (1, 3, 4, 5, 0, 2, 6)]
+    assert prioritize(messages) == expected
+
+
 def _objective_local_get_message(trial: DistributedTrial) -> float:
     trial.connection.put(ResponseMessage(0, data=None))
     return 0.0
@@ -276,3 +478,173 @@ def test_local_worker_pool_management() -> None:
             assert 0 < len(manager._pool) <= multiprocessing.cpu_count()
         else:
             break
+
+
+def _objective_local_returns_pid(trial: DistributedTrial) -> float:
+    return float(os.getpid())
+
+
+def _run_local_manager(manager: LocalOptimizationManager, study: optuna.Study) -> None:
+    @dataclass
+    class _MockEventLoop:
+        study: optuna.Study
+        objective: ObjectiveFuncType
+
+    eventloop = _MockEventLoop(study, _objective_local_returns_pid)
+    manager.create_futures(study, _objective_local_returns_pid)
+    for message in manager.get_message():
+        message.process(study, manager)
+        manager.after_message(eventloop)  # type: ignore
+        if manager.should_end_optimization():
+            break
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Local optimization not supported on Windows.")
+def test_local_worker_reused() -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials=5, n_jobs=1, max_trials_per_worker=None)
+    _run_local_manager(manager, study)
+    assert len(study.trials) == 5
+    assert len({trial.value for trial in study.trials}) == 1
+    # Retired workers are joined.
+    assert not manager._processes
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Local optimization not supported on Windows.")
+def test_local_worker_recycled_after_max_trials() -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials=4, n_jobs=1, max_trials_per_worker=2)
+    _run_local_manager(manager, study)
+    assert len(study.trials) == 4
+    assert len({trial.value for trial in study.trials}) == 2
+    assert not manager._processes
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Local optimization not supported on Windows.")
+def test_local_recycled_workers_exit() -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials=10, n_jobs=1)
+    eventloop = Mock(study=study, objective=_objective_local_returns_pid)
+    manager.create_futures(study, _objective_local_returns_pid)
+    processes = set(manager._processes)
+    for message in manager.get_message():
+        message.process(study, manager)
+        manager.after_message(eventloop)
+        processes.update(manager._processes)
+        if manager.should_end_optimization():
+            break
+
+    assert len({trial.value for trial in study.trials}) == 10
+    assert not any(process.is_alive() for process in processes)
+    assert not manager._processes
+
+
+def test_local_retires_workers_without_waiting(monkeypatch: pytest.MonkeyPatch) -> None:
+    manager = LocalOptimizationManager(n_trials=1, n_jobs=1)
+    process = Mock()
+    process.is_alive.return_value = True
+    manager._processes.append(process)
+    manager._retire_worker(_Worker(process, Mock(), Mock()))
+    manager._reap_workers()
+    process.join.assert_called_once_with(timeout=0.0)
+    process.kill.assert_not_called()
+    assert manager._processes == [process]
+
+    # Workers which did not exit in time are killed.
+    monkeypatch.setattr("optuna_distributed.managers.local._SHUTDOWN_TIMEOUT", 0.0)
+    manager._reap_workers()
+    process.kill.assert_called_once()
+    assert not manager._processes
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Local optimization not supported on Windows.")
+def test_local_worker_recycled_after_max_memory() -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(
+        n_trials=3, n_jobs=1, max_trials_per_worker=None, max_worker_memory=0
+    )
+    _run_local_manager(manager, study)
+    assert len({trial.value for trial in study.trials}) == 3
+
+
+def test_local_raises_on_invalid_max_trials_per_worker() -> None:
+    with pytest.raises(ValueError):
+        LocalOptimizationManager(n_trials=1, n_jobs=1, max_trials_per_worker=0)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Local optimization not supported on Windows.")
+@pytest.mark.parametrize("start_method", ["fork", "forkserver", "spawn"])
+def test_local_start_methods(start_method: str) -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials=2, n_jobs=1, start_method=start_method)
+    _run_local_manager(manager, study)
+    assert len(study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))) == 2
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Local optimization not supported on Windows.")
+def test_local_forkserver_preload() -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(
+        n_trials=2, n_jobs=1, start_method="forkserver", preload_modules=["optuna"]
+    )
+    _run_local_manager(manager, study)
+    assert len(study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))) == 2
+
+
+def test_local_raises_on_preload_without_forkserver() -> None:
+    with pytest.raises(ValueError):
+        LocalOptimizationManager(n_trials=1, n_jobs=1, start_method="spawn", preload_modules=[])
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Local optimization not supported on Windows.")
+@pytest.mark.parametrize("start_method", ["fork", "spawn"])
+def test_local_shared_memory(start_method: str) -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(
+        n_trials=5,
+        n_jobs=2,
+        max_trials_per_worker=None,
+        start_method=start_method,
+        shared_memory_size=1024,
+    )
+    _run_local_manager(manager, study)
+    assert len(study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))) == 5
+
+
+def test_local_raises_on_invalid_shared_memory_size() -> None:
+    with pytest.raises(ValueError):
+        LocalOptimizationManager(n_trials=1, n_jobs=1, shared_memory_size=0)
+
+
+def _objective_local_buffered_reports(trial: DistributedTrial) -> float:
+    for step in range(5):
+        trial.report(float(step), step)
+    return 0.0
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Local optimization not supported on Windows.")
+def test_local_buffered_messages_flushed_on_exit() -> None:
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials=1, n_jobs=1, message_buffer_size=100)
+    manager.create_futures(study, _objective_local_buffered_reports)
+    for message in manager.get_message():
+        message.process(study, manager)
+        if manager.should_end_optimization():
+            break
+
+    assert study.trials[0].intermediate_values == {step: float(step) for step in range(5)}
+
+
+def test_local_raises_on_invalid_trial_timeout() -> None:
+    with pytest.raises(ValueError):
+        LocalOptimizationManager(1, n_jobs=1, trial_timeout=0.0)
+
+
+def test_distributed_raises_on_invalid_trial_timeout(client: Client) -> None:
+    with pytest.raises(ValueError):
+        DistributedOptimizationManager(client, 1, trial_timeout=-1.0)
+
+
+def test_distributed_raises_on_invalid_max_concurrent_trials(client: Client) -> None:
+    with pytest.raises(ValueError):
+        DistributedOptimizationManager(client, 1, max_concurrent_trials=0)
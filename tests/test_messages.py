@@ -10,6 +10,7 @@ from optuna.distributions import FloatDistribution
 from optuna.distributions import IntDistribution
 from optuna.exceptions import TrialPruned
 from optuna.study import Study
+from optuna.trial import Trial
 from optuna.trial import TrialState
 import pytest
 
@@ -18,6 +19,8 @@ from optuna_distributed.eventloop import EventLoop
 from optuna_distributed.ipc import IPCPrimitive
 from optuna_distributed.managers import ObjectiveFuncType
 from optuna_distributed.managers import OptimizationManager
+from optuna_distributed.managers.base import TrialCache
+from optuna_distributed.messages import BatchMessage
 from optuna_distributed.messages import CompletedMessage
 from optuna_distributed.messages import FailedMessage
 from optuna_distributed.messages import HeartbeatMessage
@@ -27,7 +30,10 @@ from optuna_distributed.messages import ReportMessage
 from optuna_distributed.messages import ResponseMessage
 from optuna_distributed.messages import SetAttributeMessage
 from optuna_distributed.messages import ShouldPruneMessage
+from optuna_distributed.messages import StopMessage
+from optuna_distributed.messages import SuggestAllMessage
 from optuna_distributed.messages import SuggestMessage
+from optuna_distributed.messages import TimedOutMessage
 from optuna_distributed.messages import TrialProperty
 from optuna_distributed.messages import TrialPropertyMessage
 
@@ -50,7 +56,9 @@ class MockConnection(IPCPrimitive):
 class MockOptimizationManager(OptimizationManager):
     def __init__(self) -> None:
         self.trial_exit_called = False
+        self.stop_dispatching_called = False
         self.message_response = None
+        self.trials = TrialCache()
 
     def create_futures(self, study: "Study", objective: ObjectiveFuncType) -> None:
         ...
@@ -67,9 +75,15 @@ class MockOptimizationManager(OptimizationManager):
     def get_connection(self, trial_id: int) -> "IPCPrimitive":
         return MockConnection(self)
 
+    def get_trial(self, study: Study, trial_id: int) -> Trial:
+        return self.trials.get(study, trial_id)
+
     def stop_optimization(self, patience: float) -> None:
         ...
 
+    def stop_dispatching(self, study: Study) -> None:
+        self.stop_dispatching_called = True
+
     def should_end_optimization(self) -> bool:
         return True
 
@@ -201,6 +215,23 @@ def test_report_intermediate(study: Study, manager: MockOptimizationManager) ->
     assert trial.intermediate_values[1] == 0.0
 
 
+def test_batch(study: Study, manager: MockOptimizationManager) -> None:
+    msg = BatchMessage(
+        0,
+        [
+            ReportMessage(0, value=0.0, step=1),
+            ReportMessage(0, value=1.0, step=2),
+            SetAttributeMessage(0, key="foo", value=0, kind="user"),
+        ],
+    )
+    assert not msg.closing
+
+    msg.process(study, manager)
+    trial = study.get_trials(deepcopy=False)[0]
+    assert trial.intermediate_values == {1: 0.0, 2: 1.0}
+    assert trial.user_attrs["foo"] == 0
+
+
 def test_set_user_attributes(study: Study, manager: MockOptimizationManager) -> None:
     msg = SetAttributeMessage(0, key="foo", value=0, kind="user")
     assert not msg.closing
@@ -239,3 +270,65 @@ def test_suggest(
     assert trial.distributions["x"] == distribution
     assert "x" in trial.params
     assert _message_responds_with(trial.params["x"], manager=manager)
+
+
+def test_suggest_all(study: Study, manager: MockOptimizationManager) -> None:
+    search_space: dict[str, BaseDistribution] = {
+        "x": FloatDistribution(low=0.0, high=1.0),
+        "y": IntDistribution(low=0, high=1),
+        "z": CategoricalDistribution(choices=["foo", "bar"]),
+    }
+    msg = SuggestAllMessage(0, search_space)
+    assert not msg.closing
+
+    msg.process(study, manager)
+    trial = study.get_trials(deepcopy=False)[0]
+    assert trial.distributions == search_space
+    assert _message_responds_with(trial.params, manager=manager)
+
+
+def test_timed_out(
+    study: Study, manager: MockOptimizationManager, caplog: pytest.LogCaptureFixture
+) -> None:
+    msg = TimedOutMessage(0, timeout=1.0)
+    assert msg.closing
+    with _forced_log_propagation(logger_name=optuna_distributed.__name__):
+        msg.process(study, manager)
+    assert manager.trial_exit_called
+    assert len(caplog.records) == 1
+    assert caplog.records[0].levelno == logging.WARNING
+    trial = study.get_trials(deepcopy=False, states=(TrialState.FAIL,))
+    assert len(trial) == 1
+
+
+def test_timed_out_ignores_finished_trial(
+    study: Study, manager: MockOptimizationManager, caplog: pytest.LogCaptureFixture
+) -> None:
+    CompletedMessage(0, 0.0).process(study, manager)
+    msg = TimedOutMessage(0, timeout=1.0)
+    with _forced_log_propagation(logger_name=optuna_distributed.__name__):
+        msg.process(study, manager)
+    assert not [record for record in caplog.records if record.levelno >= logging.WARNING]
+    trial = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    assert len(trial) == 1
+
+
+def test_stop(study: Study, manager: MockOptimizationManager) -> None:
+    msg = StopMessage(0)
+    assert not msg.closing
+    assert not msg.blocking
+    msg.process(study, manager)
+    assert manager.stop_dispatching_called
+
+
+def test_trial_property_reflects_attributes_set_earlier(
+    study: Study, manager: MockOptimizationManager
+) -> None:
+    trial = study._storage.get_trial(0)
+    TrialPropertyMessage(0, "user_attrs").process(study, manager)
+    SetAttributeMessage(0, key="foo", value=0, kind="user").process(study, manager)
+    SetAttributeMessage(0, key="bar", value=1, kind="system").process(study, manager)
+    TrialPropertyMessage(0, "user_attrs").process(study, manager)
+    assert _message_responds_with({**trial.user_attrs, "foo": 0}, manager=manager)
+    TrialPropertyMessage(0, "system_attrs").process(study, manager)
+    assert _message_responds_with({**trial.system_attrs, "bar": 1}, manager=manager)
@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+from typing import Any
+
+import optuna
+from optuna.storages import InMemoryStorage
+from optuna.storages import RDBStorage
+from optuna.trial import TrialState
+from optuna.trial import create_trial
+import pytest
+
+from optuna_distributed.eventloop import EventLoop
+from optuna_distributed.managers import LocalOptimizationManager
+from optuna_distributed.storage import BestTrialStorage
+from optuna_distributed.storage import CachedHistoryStorage
+from optuna_distributed.storage import WriteBehindStorage
+from optuna_distributed.storage import fail_trials
+from optuna_distributed.storage import supports_batched_writes
+from optuna_distributed.terminal import Terminal
+from optuna_distributed.trial import DistributedTrial
+
+
+@pytest.fixture
+def storage(tmp_path: Path) -> RDBStorage:
+    return RDBStorage(f"sqlite:///{tmp_path / 'study.db'}")
+
+
+def test_defers_writes_until_trial_is_read(storage: RDBStorage) -> None:
+    study = optuna.create_study(storage=storage)
+    trial_id = study.ask()._trial_id
+    write_behind = WriteBehindStorage(storage)
+    write_behind.set_trial_intermediate_value(trial_id, 0, 1.0)
+    write_behind.set_trial_user_attr(trial_id, "foo", "bar")
+    write_behind.set_trial_system_attr(trial_id, "baz", 0)
+    assert not storage.get_trial(trial_id).intermediate_values
+
+    trial = write_behind.get_trial(trial_id)
+    assert trial.intermediate_values == {0: 1.0}
+    assert trial.user_attrs == {"foo": "bar"}
+    assert trial.system_attrs["baz"] == 0
+
+
+def test_flushes_writes_of_a_single_trial(storage: RDBStorage) -> None:
+    study = optuna.create_study(storage=storage)
+    trial_ids = [study.ask()._trial_id for _ in range(2)]
+    write_behind = WriteBehindStorage(storage)
+    for trial_id in trial_ids:
+        write_behind.set_trial_intermediate_value(trial_id, 0, 1.0)
+
+    write_behind.set_trial_state_values(trial_ids[0], TrialState.COMPLETE, [0.0])
+    assert storage.get_trial(trial_ids[0]).intermediate_values == {0: 1.0}
+    assert not storage.get_trial(trial_ids[1]).intermediate_values
+
+    assert len(write_behind.get_all_trials(study._study_id)) == 2
+    assert storage.get_trial(trial_ids[1]).intermediate_values == {0: 1.0}
+
+
+def test_flushes_when_too_many_writes_pending(storage: RDBStorage) -> None:
+    study = optuna.create_study(storage=storage)
+    trial_id = study.ask()._trial_id
+    write_behind = WriteBehindStorage(storage, max_pending_writes=3)
+    for step in range(2):
+        write_behind.set_trial_intermediate_value(trial_id, step, 1.0)
+    # Overwritten value is written only once.
+    write_behind.set_trial_intermediate_value(trial_id, 1, 2.0)
+    assert not storage.get_trial(trial_id).intermediate_values
+
+    write_behind.set_trial_intermediate_value(trial_id, 2, 3.0)
+    assert storage.get_trial(trial_id).intermediate_values == {0: 1.0, 1: 2.0, 2: 3.0}
+
+
+def test_writes_through_unbatched_storage() -> None:
+    storage = InMemoryStorage()
+    study = optuna.create_study(storage=storage)
+    trial_id = study.ask()._trial_id
+    write_behind = WriteBehindStorage(storage)
+    write_behind.set_trial_intermediate_value(trial_id, 0, 1.0)
+    write_behind.flush()
+    assert storage.get_trial(trial_id).intermediate_values == {0: 1.0}
+
+
+def test_rejects_unserializable_attrs_when_deferred(storage: RDBStorage) -> None:
+    study = optuna.create_study(storage=storage)
+    trial_id = study.ask()._trial_id
+    write_behind = WriteBehindStorage(storage)
+    write_behind.set_trial_user_attr(trial_id, "foo", "bar")
+    with pytest.raises(TypeError):
+        write_behind.set_trial_user_attr(trial_id, "baz", object())
+
+    assert write_behind.get_trial(trial_id).user_attrs == {"foo": "bar"}
+
+
+class _FailingStorage(InMemoryStorage):
+    def set_trial_user_attr(self, trial_id: int, key: str, value: Any) -> None:
+        if value == "fail":
+            raise ValueError(value)
+        super().set_trial_user_attr(trial_id, key, value)
+
+
+def test_reports_failed_writes_against_trial() -> None:
+    storage = _FailingStorage()
+    study = optuna.create_study(storage=storage)
+    failing_id, trial_id = study.ask()._trial_id, study.ask()._trial_id
+    write_behind = WriteBehindStorage(storage)
+    write_behind.set_trial_user_attr(failing_id, "foo", "fail")
+    write_behind.set_trial_user_attr(trial_id, "foo", "bar")
+
+    assert len(write_behind.get_all_trials(study._study_id)) == 2
+    assert storage.get_trial(trial_id).user_attrs == {"foo": "bar"}
+    with pytest.raises(ValueError):
+        write_behind.get_trial(failing_id)
+    assert write_behind.get_trial(failing_id).user_attrs == {}
+
+
+def test_supports_batched_writes(storage: RDBStorage) -> None:
+    assert supports_batched_writes(storage)
+    assert supports_batched_writes(optuna.create_study(storage=storage)._storage)
+    assert not supports_batched_writes(InMemoryStorage())
+
+
+def test_raises_on_invalid_max_pending_writes(storage: RDBStorage) -> None:
+    with pytest.raises(ValueError):
+        WriteBehindStorage(storage, max_pending_writes=0)
+
+
+class _ReadCountingStorage(InMemoryStorage):
+    def __init__(self) -> None:
+        super().__init__()
+        self.reads: list[tuple[TrialState, ...] | None] = []
+
+    def get_all_trials(self, study_id: int, deepcopy: bool = True, states: Any = None) -> Any:
+        self.reads.append(None if states is None else tuple(states))
+        return super().get_all_trials(study_id, deepcopy, states)
+
+
+def test_serves_finished_trials_from_memory() -> None:
+    storage = _ReadCountingStorage()
+    study = optuna.create_study(storage=storage)
+    study.add_trial(create_trial(value=1.0))
+    cached = CachedHistoryStorage(storage)
+    study._storage = cached
+    study.optimize(lambda trial: trial.suggest_float("x", 0.0, 1.0), n_trials=2)
+
+    expected = storage.get_all_trials(study._study_id)
+    storage.reads.clear()
+    trials = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    assert [trial.number for trial in trials] == [0, 1, 2]
+    assert [trial.value for trial in trials] == [trial.value for trial in expected]
+    assert cached.get_trial(trials[1]._trial_id) is trials[1]
+    assert study.best_trial.number == min(expected, key=lambda trial: trial.values[0]).number
+    assert not storage.reads
+
+
+def test_reads_unfinished_trials_from_storage() -> None:
+    storage = _ReadCountingStorage()
+    study = optuna.create_study(storage=CachedHistoryStorage(storage))
+    study.tell(study.ask(), 1.0)
+    running = study.ask()
+    storage.reads.clear()
+
+    trials = study.get_trials(deepcopy=False)
+    assert [trial.state for trial in trials] == [TrialState.COMPLETE, TrialState.RUNNING]
+    assert storage.reads == [(TrialState.RUNNING, TrialState.WAITING)]
+
+    study.tell(running, 2.0)
+    storage.reads.clear()
+    trials = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    assert [trial.value for trial in trials] == [1.0, 2.0]
+    assert not storage.reads
+
+
+def test_reloads_history_after_trial_finished_elsewhere() -> None:
+    storage = InMemoryStorage()
+    study = optuna.create_study(storage=storage)
+    trial = study.ask()
+    cached = CachedHistoryStorage(storage)
+    assert not cached.get_all_trials(study._study_id, states=(TrialState.COMPLETE,))
+
+    # Trial was created before the wrapper, so its study is not known yet.
+    cached.set_trial_state_values(trial._trial_id, TrialState.COMPLETE, [1.0])
+    trials = cached.get_all_trials(study._study_id, states=(TrialState.COMPLETE,))
+    assert [t._trial_id for t in trials] == [trial._trial_id]
+
+
+def test_tracks_best_trial() -> None:
+    storage = _ReadCountingStorage()
+    study = optuna.create_study(storage=storage, direction="maximize")
+    study.add_trial(create_trial(value=1.0))
+    tracked = BestTrialStorage(storage)
+    study._storage = tracked
+    assert study.best_trial.value == 1.0
+
+    storage.reads.clear()
+    for value in [0.0, 3.0, 3.0, 2.0]:
+        study.tell(study.ask(), value)
+        assert study.best_trial.number == optuna.load_study(
+            study_name=study.study_name, storage=storage
+        ).best_trial.number
+    assert study.best_trial.number == 2
+    assert (TrialState.COMPLETE,) not in storage.reads
+
+
+def test_tracks_single_best_trial_out_of_tied() -> None:
+    storage = InMemoryStorage()
+    study = optuna.create_study(storage=storage)
+    tracked = BestTrialStorage(storage)
+    study._storage = tracked
+    for value in [1.0, 0.0, 0.0, 0.0]:
+        study.tell(study.ask(), value)
+
+    assert tracked._front(study._study_id).trials() == [study.best_trial]
+    assert study.best_trial.number == 1
+    expected = optuna.load_study(study_name=study.study_name, storage=storage).best_trials
+    assert [t.number for t in tracked.get_best_trials(study._study_id)] == [1, 2, 3]
+    assert [t.number for t in expected] == [1, 2, 3]
+
+
+def test_tracks_pareto_front() -> None:
+    storage = InMemoryStorage()
+    study = optuna.create_study(storage=storage, directions=["minimize", "maximize"])
+    study.add_trial(create_trial(values=[1.0, 1.0]))
+    tracked = BestTrialStorage(storage)
+    study._storage = tracked
+    for values in [[0.0, 0.0], [2.0, 2.0], [2.0, 2.0], [0.0, 1.0], [1.0, 3.0], [2.0, 0.0]]:
+        study.tell(study.ask(), values)
+        expected = optuna.load_study(study_name=study.study_name, storage=storage).best_trials
+        assert [t.number for t in study.best_trials] == [t.number for t in expected]
+
+    assert [t.number for t in tracked.get_best_trials(study._study_id)] == [4, 5]
+    with pytest.raises(RuntimeError):
+        tracked.get_best_trial(study._study_id)
+
+
+def test_raises_without_completed_trials() -> None:
+    study = optuna.create_study(storage=BestTrialStorage(InMemoryStorage()))
+    study.tell(study.ask(), state=TrialState.PRUNED)
+    with pytest.raises(ValueError):
+        study.best_trial
+
+
+def test_finds_best_trial_again_after_trial_completed_elsewhere() -> None:
+    storage = InMemoryStorage()
+    study = optuna.create_study(storage=storage)
+    trial = study.ask()
+    tracked = BestTrialStorage(storage)
+    study.tell(study.ask(), 1.0)
+    assert tracked.get_best_trial(study._study_id).value == 1.0
+
+    # Trial was created before the wrapper, so its study is not known yet.
+    tracked.set_trial_state_values(trial._trial_id, TrialState.COMPLETE, [0.0])
+    assert tracked.get_best_trial(study._study_id).number == trial.number
+
+
+def test_keeps_best_trials_of_other_studies_on_unseen_trial() -> None:
+    storage = _ReadCountingStorage()
+    study = optuna.create_study(storage=storage)
+    other = optuna.create_study(storage=storage)
+    trial = other.ask()
+    tracked = BestTrialStorage(storage)
+    study.tell(study.ask(), 1.0)
+    other.tell(other.ask(), 1.0)
+    assert tracked.get_best_trial(study._study_id).value == 1.0
+    assert tracked.get_best_trial(other._study_id).value == 1.0
+
+    storage.reads.clear()
+    tracked.set_trial_state_values(trial._trial_id, TrialState.COMPLETE, [0.0])
+    assert tracked.get_best_trial(other._study_id).number == trial.number
+    assert tracked.get_best_trial(study._study_id).value == 1.0
+    assert not storage.reads
+
+
+@pytest.mark.parametrize("batched", [True, False])
+def test_fails_unfinished_trials(storage: RDBStorage, batched: bool) -> None:
+    study = optuna.create_study(storage=storage if batched else InMemoryStorage())
+    running = [study.ask() for _ in range(3)]
+    study.tell(running[0], 1.0)
+    study.enqueue_trial({"x": 1.0})
+    waiting = study.get_trials(deepcopy=False, states=(TrialState.WAITING,))[0]
+
+    trial_ids = [trial._trial_id for trial in running[1:]] + [waiting._trial_id]
+    fail_trials(study._storage, trial_ids)
+    states = [trial.state for trial in study.get_trials(deepcopy=False)]
+    assert states == [TrialState.COMPLETE, TrialState.FAIL, TrialState.FAIL, TrialState.FAIL]
+    assert all(trial.datetime_complete is not None for trial in study.get_trials())
+
+
+def test_fails_in_memory_trials_sequentially(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("optuna_distributed.storage.ThreadPoolExecutor", None)
+    study = optuna.create_study()
+    trial_ids = [study.ask()._trial_id for _ in range(3)]
+    fail_trials(study._storage, trial_ids)
+    assert all(trial.state == TrialState.FAIL for trial in study.get_trials(deepcopy=False))
+
+
+def test_fails_trials_in_batches(storage: RDBStorage) -> None:
+    study = optuna.create_study(storage=storage)
+    n_trials = 600
+    for _ in range(n_trials):
+        study._storage.create_new_trial(study._study_id)
+
+    trials = study.get_trials(deepcopy=False)
+    fail_trials(study._storage, [trial._trial_id for trial in trials])
+    assert len(study.get_trials(deepcopy=False, states=(TrialState.FAIL,))) == n_trials
+
+
+def test_fails_trials_through_wrappers(storage: RDBStorage) -> None:
+    study = optuna.create_study(storage=storage)
+    study.tell(study.ask(), 1.0)
+    write_behind = WriteBehindStorage(storage)
+    study._storage = CachedHistoryStorage(write_behind)
+    trial = study.ask()
+    assert len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))) == 1
+    write_behind.set_trial_intermediate_value(trial._trial_id, 0, 1.0)
+
+    fail_trials(study._storage, [trial._trial_id])
+    trials = study.get_trials(deepcopy=False, states=(TrialState.FAIL,))
+    assert [t.number for t in trials] == [trial.number]
+    assert trials[0].intermediate_values == {0: 1.0}
+
+
+def _objective_reports(trial: DistributedTrial) -> float:
+    for step in range(10):
+        trial.report(float(step), step)
+        trial.set_user_attr(f"step_{step}", step)
+    trial.should_prune()
+    return trial.suggest_float("x", 0.0, 1.0)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Local optimization not supported on Windows.")
+@pytest.mark.parametrize("message_threads", [1, 2])
+def test_optimizes_with_deferred_writes(storage: RDBStorage, message_threads: int) -> None:
+    n_trials = 5
+    study = optuna.create_study(storage=storage)
+    manager = LocalOptimizationManager(n_trials, n_jobs=2)
+    event_loop = EventLoop(
+        study,
+        manager,
+        _objective_reports,
+        interrupt_patience=10.0,
+        message_threads=message_threads,
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    assert not isinstance(study._storage, WriteBehindStorage)
+    trials = study.get_trials(deepcopy=False)
+    assert len(trials) == n_trials
+    for trial in trials:
+        assert trial.state == TrialState.COMPLETE
+        assert trial.intermediate_values == {step: float(step) for step in range(10)}
+        assert trial.user_attrs == {f"step_{step}": step for step in range(10)}
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Local optimization not supported on Windows.")
+def test_optimizes_with_cached_history(storage: RDBStorage) -> None:
+    n_trials = 5
+    study = optuna.create_study(storage=storage, sampler=optuna.samplers.TPESampler())
+    manager = LocalOptimizationManager(n_trials, n_jobs=2)
+    event_loop = EventLoop(
+        study, manager, _objective_reports, interrupt_patience=10.0, cache_finished_trials=True
+    )
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    assert not isinstance(study._storage, CachedHistoryStorage)
+    trials = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    assert len(trials) == n_trials
+    assert all("x" in trial.params for trial in trials)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Local optimization not supported on Windows.")
+def test_optimizes_with_best_trial_tracking() -> None:
+    n_trials = 5
+    study = optuna.create_study()
+    manager = LocalOptimizationManager(n_trials, n_jobs=2)
+    event_loop = EventLoop(study, manager, _objective_reports, interrupt_patience=10.0)
+    event_loop.run(terminal=Terminal(show_progress_bar=False, n_trials=n_trials))
+    assert not isinstance(study._storage, BestTrialStorage)
+    trials = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    assert study.best_trial.number == min(trials, key=lambda trial: trial.values[0]).number
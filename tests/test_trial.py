@@ -2,17 +2,24 @@ from __future__ import annotations
 
 from collections import deque
 
+from optuna.distributions import BaseDistribution
 from optuna.distributions import CategoricalDistribution
 from optuna.distributions import FloatDistribution
 from optuna.distributions import IntDistribution
+from optuna.trial import FrozenTrial
+from optuna.trial import TrialState
+from optuna.trial import create_trial
 import pytest
 
 from optuna_distributed.ipc import IPCPrimitive
+from optuna_distributed.messages import BatchMessage
 from optuna_distributed.messages import Message
 from optuna_distributed.messages import ReportMessage
 from optuna_distributed.messages import ResponseMessage
 from optuna_distributed.messages import SetAttributeMessage
 from optuna_distributed.messages import ShouldPruneMessage
+from optuna_distributed.messages import StopMessage
+from optuna_distributed.messages import SuggestAllMessage
 from optuna_distributed.messages import SuggestMessage
 from optuna_distributed.messages import TrialPropertyMessage
 from optuna_distributed.trial import DistributedTrial
@@ -92,6 +99,22 @@ def test_suggest_categorical(connection: MockIPC) -> None:
     assert distribution.choices == ("foo", "bar", "baz")
 
 
+def test_suggest_all(connection: MockIPC) -> None:
+    connection.enqueue_response(ResponseMessage(0, data={"x": 0.0, "y": "foo"}))
+    trial = DistributedTrial(0, connection)
+    search_space: dict[str, BaseDistribution] = {
+        "x": FloatDistribution(low=0.0, high=1.0),
+        "y": CategoricalDistribution(choices=["foo", "bar"]),
+    }
+    params = trial.suggest_all(search_space)
+    assert params == {"x": 0.0, "y": "foo"}
+    assert len(connection.captured) == 1
+    captured = connection.captured[0]
+    assert isinstance(captured, SuggestAllMessage)
+    assert captured._trial_id == 0
+    assert captured._search_space == search_space
+
+
 def test_report(connection: MockIPC) -> None:
     trial = DistributedTrial(0, connection)
     trial.report(value=0.0, step=1)
@@ -144,3 +167,115 @@ def test_get_properties(connection: MockIPC, property: str) -> None:
     captured = connection.captured[0]
     assert isinstance(captured, TrialPropertyMessage)
     assert captured._property == property
+
+
+def test_buffered_messages_flushed_before_request(connection: MockIPC) -> None:
+    connection.enqueue_response(ResponseMessage(0, data=False))
+    trial = DistributedTrial(0, connection, buffer_size=10)
+    trial.report(value=0.0, step=1)
+    trial.set_user_attr(key="foo", value="bar")
+    assert len(connection.captured) == 0
+
+    assert not trial.should_prune()
+    assert len(connection.captured) == 2
+    batch, request = connection.captured
+    assert isinstance(batch, BatchMessage)
+    assert isinstance(request, ShouldPruneMessage)
+    assert isinstance(batch._messages[0], ReportMessage)
+    assert isinstance(batch._messages[1], SetAttributeMessage)
+
+
+def test_stop_study(connection: MockIPC) -> None:
+    trial = DistributedTrial(0, connection, buffer_size=10)
+    trial.report(value=0.0, step=1)
+    trial.stop_study()
+    assert len(connection.captured) == 2
+    batch, request = connection.captured
+    assert isinstance(batch, BatchMessage)
+    assert isinstance(request, StopMessage)
+    assert request._trial_id == 0
+
+
+def test_buffered_messages_flushed_when_full(connection: MockIPC) -> None:
+    trial = DistributedTrial(0, connection, buffer_size=2)
+    trial.report(value=0.0, step=1)
+    assert len(connection.captured) == 0
+    trial.report(value=0.0, step=2)
+    assert len(connection.captured) == 1
+    captured = connection.captured[0]
+    assert isinstance(captured, BatchMessage)
+    assert len(captured._messages) == 2
+
+
+def test_buffered_messages_flushed_when_stale(connection: MockIPC) -> None:
+    trial = DistributedTrial(0, connection, buffer_size=10, buffer_timeout=0.0)
+    trial.report(value=0.0, step=1)
+    assert len(connection.captured) == 1
+    assert isinstance(connection.captured[0], BatchMessage)
+
+
+def test_flush_with_empty_buffer(connection: MockIPC) -> None:
+    trial = DistributedTrial(0, connection, buffer_size=10)
+    trial.flush()
+    assert len(connection.captured) == 0
+
+
+@pytest.fixture
+def frozen_trial() -> FrozenTrial:
+    frozen_trial = create_trial(state=TrialState.RUNNING, user_attrs={"foo": "bar"})
+    frozen_trial.number = 3
+    return frozen_trial
+
+
+@pytest.mark.parametrize("property", ["params", "distributions", "user_attrs", "number"])
+def test_mirrored_properties_served_locally(
+    connection: MockIPC, frozen_trial: FrozenTrial, property: str
+) -> None:
+    trial = DistributedTrial(0, connection, frozen_trial=frozen_trial)
+    assert getattr(trial, property) == getattr(frozen_trial, property)
+    assert len(connection.captured) == 0
+
+
+def test_mirrored_datetime_start(connection: MockIPC, frozen_trial: FrozenTrial) -> None:
+    trial = DistributedTrial(0, connection, frozen_trial=frozen_trial)
+    assert trial.datetime_start == frozen_trial.datetime_start
+    assert trial.datetime_start is not None
+    assert len(connection.captured) == 0
+
+
+def test_mirror_updated_after_suggest(connection: MockIPC, frozen_trial: FrozenTrial) -> None:
+    connection.enqueue_response(ResponseMessage(0, data=0.5))
+    connection.enqueue_response(ResponseMessage(0, data={"y": "foo"}))
+    trial = DistributedTrial(0, connection, frozen_trial=frozen_trial)
+    trial.suggest_float("x", low=0.0, high=1.0)
+    trial.suggest_all({"y": CategoricalDistribution(choices=["foo", "bar"])})
+    assert trial.params == {"x": 0.5, "y": "foo"}
+    assert trial.distributions == {
+        "x": FloatDistribution(low=0.0, high=1.0),
+        "y": CategoricalDistribution(choices=["foo", "bar"]),
+    }
+    assert len(connection.captured) == 2
+
+
+def test_mirror_updated_after_set_user_attr(
+    connection: MockIPC, frozen_trial: FrozenTrial
+) -> None:
+    trial = DistributedTrial(0, connection, frozen_trial=frozen_trial)
+    trial.set_user_attr("baz", 1)
+    assert trial.user_attrs == {"foo": "bar", "baz": 1}
+    assert len(connection.captured) == 1
+
+
+def test_mirror_returns_copies(connection: MockIPC, frozen_trial: FrozenTrial) -> None:
+    trial = DistributedTrial(0, connection, frozen_trial=frozen_trial)
+    trial.user_attrs["foo"] = "baz"
+    assert trial.user_attrs == {"foo": "bar"}
+
+
+def test_system_attrs_not_mirrored(connection: MockIPC, frozen_trial: FrozenTrial) -> None:
+    connection.enqueue_response(ResponseMessage(0, data={"foo": "bar"}))
+    trial = DistributedTrial(0, connection, frozen_trial=frozen_trial)
+    assert trial.system_attrs == {"foo": "bar"}
+    captured = connection.captured[0]
+    assert isinstance(captured, TrialPropertyMessage)
+    assert captured._property == "system_attrs"